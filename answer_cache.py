@@ -0,0 +1,211 @@
+"""Local semantic answer cache for the AI Coach: TF-IDF similarity over previously answered questions
+
+Questions are bucketed by sport, position and age band plus every personal detail the coach prompt
+sends (injury, limitations, allergies, diet, gender, BMI category), so a cached answer is only reused
+for athletes in the same situation and never shows one athlete's health details to another. Free-text
+details are reduced to their set of words, and the least recently used buckets are evicted past
+max_buckets. nltk and NumPy are imported on first use.
+"""
+import math
+import re
+import threading
+from collections import OrderedDict
+
+# Kept deliberately small: words like "before"/"after" or "not" change what is being asked
+STOPWORDS = {
+    "a", "an", "the", "i", "me", "my", "we", "our", "you", "your", "is", "are", "am", "was", "be", "do", "does",
+    "did", "can", "could", "should", "would", "will", "to", "of", "for", "in", "on", "and", "or", "so", "what",
+    "whats", "how", "which", "when", "s", "t", "please", "coach", "hi", "hey",
+}
+# Follow-ups lean on earlier messages, so a context-free cached answer would be wrong
+FOLLOW_UP_WORDS = {"it", "that", "this", "those", "these", "them", "above", "previous", "again", "more", "else"}
+
+AGE_BANDS = [(12, "under-12"), (15, "12-14"), (18, "15-17")]
+# Details an answer can be tailored to (and mention); athletes must match on all of them to share answers
+PERSONAL_FIELDS = ("gender", "bmi_category", "diet", "injury", "limitations", "allergies")
+NO_VALUE = {"", "none", "no", "n/a", "na", "nil", "-"}
+MIN_TERMS = 2
+
+
+def age_band(age):
+    try:
+        age = float(age)
+    except (TypeError, ValueError):
+        return "any-age"
+    for upper, label in AGE_BANDS:
+        if age < upper:
+            return label
+    return "18+"
+
+
+def _personal(value):
+    """A detail's distinct words in sorted order, so "Peanuts, shellfish" and "shellfish and peanuts" match"""
+    value = " ".join(str(value or "").lower().split()).strip(".")
+    if value in NO_VALUE:
+        return "none"
+    words = sorted(set(re.findall(r"[a-z0-9]+", value)) - STOPWORDS - {"with", "but"})
+    return " ".join(words) or "none"
+
+
+def bucket_key(profile):
+    """(sport, position, age band, *personal details) for a profile; missing fields share a catch-all bucket"""
+    profile = profile or {}
+    return (
+        str(profile.get("sport") or "any-sport").lower(),
+        str(profile.get("position") or "any-position").lower(),
+        age_band(profile.get("age")),
+    ) + tuple(_personal(profile.get(field)) for field in PERSONAL_FIELDS)
+
+
+_stemmer = None
+
+
+def _words(text):
+    from nltk.tokenize import wordpunct_tokenize
+
+    return [token.lower() for token in wordpunct_tokenize(text) if token.isalnum()]
+
+
+def _stem(word):
+    global _stemmer
+    if _stemmer is None:
+        from nltk.stem import PorterStemmer
+        _stemmer = PorterStemmer()
+    return _stemmer.stem(word)
+
+
+def terms(text):
+    """Stemmed unigrams plus bigrams (so word order like 'eat before' vs 'before eat' counts a little)"""
+    stems = [_stem(word) for word in _words(text) if word not in STOPWORDS]
+    return stems + [f"{a} {b}" for a, b in zip(stems, stems[1:])]
+
+
+def is_cacheable(question):
+    """Standalone questions with enough content; follow-ups and one-word messages always go to the model"""
+    words = _words(question)
+    if FOLLOW_UP_WORDS.intersection(words):
+        return False
+    return sum(1 for word in words if word not in STOPWORDS) >= MIN_TERMS
+
+
+class _Bucket:
+    """Answered questions for one bucket with a lazily rebuilt TF-IDF matrix"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # normalized question -> (term list, answer)
+        self._matrix = None
+        self._vocab = None
+        self._idf = None
+        self._keys = None
+
+    def add(self, key, question_terms, answer):
+        self.entries[key] = (question_terms, answer)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        self._matrix = None
+
+    def _rebuild(self):
+        import numpy as np
+
+        self._keys = list(self.entries)
+        documents = [self.entries[key][0] for key in self._keys]
+        self._vocab = {}
+        for doc in documents:
+            for term in doc:
+                self._vocab.setdefault(term, len(self._vocab))
+        counts = np.zeros((len(documents), len(self._vocab)))
+        for row, doc in enumerate(documents):
+            for term in doc:
+                counts[row, self._vocab[term]] += 1
+        document_frequency = (counts > 0).sum(axis=0)
+        self._idf = np.log((1 + len(documents)) / (1 + document_frequency)) + 1
+        weights = counts * self._idf
+        norms = np.linalg.norm(weights, axis=1, keepdims=True)
+        self._matrix = weights / np.where(norms == 0, 1, norms)
+
+    def best_match(self, question_terms):
+        """(similarity, answer) of the closest stored question"""
+        import numpy as np
+
+        if not self.entries or not question_terms:
+            return 0.0, None
+        if self._matrix is None:
+            self._rebuild()
+        query = np.zeros(len(self._vocab))
+        # Terms never seen in this bucket still count towards the query's length
+        unseen_weight = math.log(1 + len(self._keys)) + 1
+        unseen = 0.0
+        for term in question_terms:
+            index = self._vocab.get(term)
+            if index is None:
+                unseen += unseen_weight ** 2
+            else:
+                query[index] += self._idf[index]
+        norm = math.sqrt(float(query @ query) + unseen)
+        if norm == 0:
+            return 0.0, None
+        scores = self._matrix @ (query / norm)
+        best = int(scores.argmax())
+        return float(scores[best]), self.entries[self._keys[best]][1]
+
+
+class AnswerCache:
+    """Serves a stored answer when a new question is similar enough to one already answered"""
+
+    def __init__(self, threshold=0.85, max_entries_per_bucket=500, max_buckets=2000):
+        self.threshold = threshold
+        self.max_entries_per_bucket = max_entries_per_bucket
+        # Free-text details make most athletes a bucket of their own: keep the most recently used ones
+        self.max_buckets = max_buckets
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, profile, question):
+        """(answer, similarity) for the best match at or above the threshold, else (None, similarity)
+
+        similarity is None when the question isn't eligible for caching at all.
+        """
+        if not is_cacheable(question):
+            return None, None
+        question_terms = terms(question)
+        with self._lock:
+            key = bucket_key(profile)
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                self._buckets.move_to_end(key)
+            similarity, answer = bucket.best_match(question_terms) if bucket else (0.0, None)
+            if answer is not None and similarity >= self.threshold:
+                self.hits += 1
+                return answer, similarity
+            self.misses += 1
+            return None, similarity
+
+    def store(self, profile, question, answer):
+        if not answer or not is_cacheable(question):
+            return
+        question_terms = terms(question)
+        with self._lock:
+            key = bucket_key(profile)
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = _Bucket(self.max_entries_per_bucket)
+                while len(self._buckets) > self.max_buckets:
+                    self._buckets.popitem(last=False)
+            self._buckets.move_to_end(key)
+            bucket.add(" ".join(question_terms), question_terms, answer)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "entries": sum(len(bucket.entries) for bucket in self._buckets.values()),
+                "buckets": len(self._buckets),
+                "threshold": self.threshold,
+            }
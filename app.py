@@ -1,22 +1,44 @@
+# Heavy libraries (pandas, reportlab, google.generativeai) are imported lazily on the
+# code paths that need them, so a cold start only pays for Streamlit and SQLAlchemy.
 import streamlit as st
-import google.generativeai as genai
-import pandas as pd
-from gtts import gTTS
+from streamlit.errors import StreamlitAPIException
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import os
-from io import BytesIO
 import hashlib
 import json
 import re
-
-import plotly.express as px
+from io import BytesIO
+import time
+import uuid
+from functools import partial, wraps
 from datetime import datetime
-import os
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib.enums import TA_CENTER, TA_LEFT
-from reportlab.lib import colors
+
+from coachbot import (
+    CACHE_DIR, DB_PATH, SPORT_CONFIG, PLAN_LABELS, calculate_bmi, get_bmi_category, compute_nutrition,
+    plan_cache_key, plan_schema, render_plan_response
+)
+from prompts import (
+    TEMPLATES, estimate_tokens, field_label, get_template, output_words, plan_types_reading, render_prompt,
+    render_section_prompt
+)
+from workout_plan import DAY_SCHEMA, SECTION_SCHEMA, SECTIONS, PlanValidationError, WorkoutPlan, parse_json, section_name
+from pdf_export import cached_pdf, create_pdf
+from llm_backend import create_backend
+from plan_cache import PlanCache, changed_fields
+from health import HealthProbe
+from storage import Store
+from singleflight import InterruptedFlight, SingleFlight
+from jobs import DONE, FAILED, QUEUED, JobCancelled, JobQueue, QueueFull
+from resilience import BackendUnavailable, ResilientBackend
+from metrics import REGISTRY, RENDER_BUCKETS, SIMILARITY_BUCKETS, SIZE_BUCKETS, TOKEN_BUCKETS, WORD_BUCKETS, InstrumentedBackend, MetricsExporter, call_kind, session_state_bytes
+from chat_memory import ConversationMemory
+from chat_view import BUBBLE_CACHE_BYTES, bubble_cache_stats, bubble_html, window_html
+from answer_cache import AnswerCache
+from tts import AudioCache, SpeechSynthesizer, create_tts_backend
+from session_memory import ChatHistory, PlanTexts, SpillStore, spill_cold_state
+
+# Start of this script run, for per-page rerun durations (see main)
+RERUN_STARTED = time.perf_counter()
 
 st.set_page_config(
     page_title="CoachBot AI",
@@ -57,11 +79,68 @@ def load_custom_css():
 
 load_custom_css()
 
+# Background plan generation: worker threads per server (the cap on simultaneous plan generations),
+# how many plans may wait for a worker, and how often the sidebar polls their status
+MAX_CONCURRENT_PLANS = int(os.environ.get("COACHBOT_PLAN_WORKERS", 5))
+PLAN_QUEUE_LIMIT = int(os.environ.get("COACHBOT_PLAN_QUEUE", 50))
+JOB_POLL_SECONDS = 1.0
+# The plan panel redraws a generating plan's partial text more often, so it reads as streaming
+PROGRESS_POLL_SECONDS = 0.5
+# Whether plans a profile edit makes stale are regenerated in the background straight away
+# (the default for the toggle on the Profile Setup page)
+AUTO_REFRESH_PLANS = os.environ.get("COACHBOT_AUTO_REFRESH_PLANS", "0") == "1"
+
+# End-to-end deadlines (retries and backoff included) for a user action
+PLAN_DEADLINE_SECONDS = 120
+SECTION_DEADLINE_SECONDS = 45
+CHAT_DEADLINE_SECONDS = 45
+
+# Prometheus-style text export, rewritten every METRICS_EXPORT_INTERVAL seconds
+METRICS_PATH = os.environ.get("COACHBOT_METRICS_PATH", os.path.join(CACHE_DIR, "metrics.prom"))
+METRICS_EXPORT_INTERVAL = 15
+
+# How long a request waits on an identical in-flight generation from another session
+SINGLE_FLIGHT_TIMEOUT = 180
+
+# AI Coach memory: input-token budget per request and number of verbatim messages kept
+COACH_MAX_INPUT_TOKENS = 2000
+COACH_RECENT_TURNS = 6
+
+# Reuse a stored AI Coach answer when a question is at least this similar (TF-IDF cosine)
+# to one already answered in the same bucket (see answer_cache.bucket_key)
+ANSWER_CACHE_THRESHOLD = float(os.environ.get("COACHBOT_ANSWER_CACHE_THRESHOLD", 0.8))
+
+# AI Coach view: messages rendered per page, and messages kept in session state
+# (older ones stay in the SQLite store and load on demand)
+CHAT_WINDOW = 20
+CHAT_HISTORY_LIMIT = 200
+
+# Per-session memory cap: chat turns older than the visible window and all plans are kept compressed,
+# and past this budget the coldest of them are spilled to disk until they're read again
+SESSION_MEMORY_BUDGET = int(os.environ.get("COACHBOT_SESSION_BUDGET_KB", 256)) * 1024
+
+# Render model output token-by-token instead of waiting behind a spinner
+STREAM_RESPONSES = True
+
+# Spoken plans and answers: gTTS by default, COACHBOT_TTS_BACKEND=offline for a silent offline stand-in.
+# Chunks are synthesized TTS_WORKERS at a time; each may take up to TTS_CHUNK_TIMEOUT seconds
+TTS_BACKEND = os.environ.get("COACHBOT_TTS_BACKEND", "gtts")
+TTS_WORKERS = 4
+TTS_CHUNK_TIMEOUT = 30
+
 
 @st.cache_resource
-def initialize_gemini():
-    """Initialize Gemini API with Streamlit secrets"""
+def initialize_backend():
+    """Initialize the LLM backend (no network calls; see get_health_probe)
+    
+    COACHBOT_LLM_BACKEND=fake selects the offline fake backend for benchmarks and load tests.
+    Every backend is instrumented for metrics and wrapped with retries and a process-wide circuit breaker.
+    """
     try:
+        backend_name = os.environ.get("COACHBOT_LLM_BACKEND", "gemini")
+        if backend_name != "gemini":
+            return ResilientBackend(InstrumentedBackend(create_backend(backend_name)))
+        
         api_key = st.secrets.get("GEMINI_API_KEY", None)
         if not api_key:
             api_key = st.secrets.get("GOOGLE_API_KEY", None)
@@ -74,29 +153,33 @@ def initialize_gemini():
             st.info("Go to: Settings → Secrets → Add: GEMINI_API_KEY = 'your-key'")
             return None
         
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel(
-            model_name="gemini-2.5-flash",
-            generation_config={
-                "temperature": 0.7,
-                "top_p": 0.8,
-                "top_k": 40,
-                "max_output_tokens": 8192  # Increased from 4000 to prevent truncation
-            }
-        )
-        
-        test_response = model.generate_content("Test")
-        return model
+        return ResilientBackend(InstrumentedBackend(create_backend("gemini", api_key)))
         
     except Exception as e:
         st.error(f"❌ **API Initialization Error:** {str(e)}")
         st.error("Please check your API key configuration.")
         return None
 
-model = initialize_gemini()
+backend = initialize_backend()
+
+@st.cache_resource
+def get_health_probe():
+    """Background health probe for the backend; count_tokens avoids spending generation quota"""
+    return HealthProbe(lambda: backend.count_tokens("ping"))
 
+if backend:
+    # Starts the first probe in a background thread; page rendering never waits on it
+    get_health_probe()
 
-if not model:
+@st.cache_resource
+def get_metrics_exporter():
+    """Background writer for the Prometheus text export"""
+    return MetricsExporter(METRICS_PATH, METRICS_EXPORT_INTERVAL)
+
+get_metrics_exporter()
+
+
+if not backend:
     st.error("⚠️ **AI Features Not Available**")
     st.error("The app requires a valid Google Generative AI API key to function.")
     st.info("Please add your GEMINI_API_KEY to Streamlit secrets and restart the app.")
@@ -109,68 +192,134 @@ if 'user_profile' not in st.session_state:
 if 'workouts_generated' not in st.session_state:
     st.session_state.workouts_generated = 0
 if 'chat_history' not in st.session_state:
-    st.session_state.chat_history = []
+    st.session_state.chat_history = ChatHistory(hot_messages=CHAT_WINDOW)
+if 'chat_archived' not in st.session_state:
+    st.session_state.chat_archived = 0
+if 'chat_window' not in st.session_state:
+    st.session_state.chat_window = CHAT_WINDOW
 if 'generated_plan' not in st.session_state:
     st.session_state.generated_plan = None
+if 'generated_plans' not in st.session_state:
+    st.session_state.generated_plans = PlanTexts()
+if 'listening' not in st.session_state:
+    st.session_state.listening = {}
+if 'structured_plans' not in st.session_state:
+    st.session_state.structured_plans = PlanTexts()
+if 'plan_jobs' not in st.session_state:
+    st.session_state.plan_jobs = {}
+if 'plan_job_errors' not in st.session_state:
+    st.session_state.plan_job_errors = {}
+if 'plan_basis' not in st.session_state:
+    st.session_state.plan_basis = {}
+if 'auto_refresh_plans' not in st.session_state:
+    st.session_state.auto_refresh_plans = AUTO_REFRESH_PLANS
 
-SPORT_CONFIG = {
-    "Football": {
-        "icon": "⚽",
-        "positions": ["Forward", "Midfielder", "Defender", "Goalkeeper"],
-        "skills": ["Ball Control", "Passing", "Shooting", "Dribbling", "Defense", "Speed"],
-        "injuries": ["Ankle Sprain", "Knee Injury", "Hamstring", "Concussion", "Groin Strain"]
-    },
-    "Cricket": {
-        "icon": "🏏",
-        "positions": ["Batsman", "Bowler", "All-rounder", "Wicket-keeper"],
-        "skills": ["Batting", "Bowling", "Fielding", "Catching", "Running"],
-        "injuries": ["Shoulder Injury", "Back Pain", "Ankle Sprain", "Elbow Injury"]
-    },
-    "Basketball": {
-        "icon": "🏀",
-        "positions": ["Point Guard", "Shooting Guard", "Small Forward", "Power Forward", "Center"],
-        "skills": ["Shooting", "Dribbling", "Passing", "Rebounding", "Defense"],
-        "injuries": ["Knee Injury", "Ankle Sprain", "Wrist Injury", "Back Pain"]
-    },
-    "Athletics": {
-        "icon": "🏃‍♂️",
-        "positions": ["Sprinter", "Distance Runner", "Jumper", "Thrower"],
-        "skills": ["Speed", "Endurance", "Power", "Technique", "Strength"],
-        "injuries": ["Hamstring", "Shin Splints", "Knee Pain", "Stress Fracture"]
-    }
-}
-
-def calculate_bmi(weight, height_cm):
-    """Calculate BMI from weight (kg) and height (cm)"""
-    height_m = height_cm / 100
-    bmi = weight / (height_m ** 2)
-    return round(bmi, 1)
-
-def get_bmi_category(bmi):
-    """Get BMI category and color class"""
-    if bmi < 18.5:
-        return "Underweight", "bmi-underweight"
-    elif 18.5 <= bmi < 25:
-        return "Normal Weight", "bmi-normal"
-    elif 25 <= bmi < 30:
-        return "Overweight", "bmi-overweight"
-    else:
-        return "Obese", "bmi-obese"
+@st.cache_resource
+def get_spill_store():
+    """Process-wide on-disk store for session state spilled over the memory budget"""
+    store = SpillStore(os.path.join(CACHE_DIR, "spill"))
+    store.prune()
+    return store
+
+def enforce_memory_budget():
+    """Spill this session's coldest compressed state to disk once it's over budget; returns its resident bytes"""
+    used = session_state_bytes(st.session_state)
+    if used > SESSION_MEMORY_BUDGET:
+        containers = [st.session_state.get(key) for key in ('chat_history', 'generated_plans', 'structured_plans')]
+        freed = spill_cold_state([c for c in containers if hasattr(c, 'spill')], used - SESSION_MEMORY_BUDGET,
+                                 get_spill_store())
+        REGISTRY.inc("coachbot_session_spilled_bytes_total", value=freed)
+        used -= freed
+        if used > SESSION_MEMORY_BUDGET:
+            # Only hot state is left: the visible chat window, the current plan and small values
+            REGISTRY.inc("coachbot_session_over_budget_total")
+    return used
+
+@st.cache_resource
+def get_store():
+    """Process-wide SQLite store for profiles, plans and chat history"""
+    return Store(DB_PATH)
 
+def restore_session():
+    """Bind this browser session to an athlete id (kept in the URL) and reload anything saved"""
+    athlete_id = st.query_params.get("athlete")
+    if not athlete_id:
+        athlete_id = uuid.uuid4().hex[:16]
+        st.query_params["athlete"] = athlete_id
+    st.session_state.athlete_id = athlete_id
+    
+    saved = get_store().load_session(athlete_id, chat_limit=CHAT_HISTORY_LIMIT)
+    if saved:
+        st.session_state.user_profile = saved['profile']
+        st.session_state.workouts_generated = saved['workouts_generated']
+        st.session_state.generated_plans = PlanTexts(saved['plans'])
+        st.session_state.structured_plans = PlanTexts(saved['structured_plans'])
+        st.session_state.chat_history = ChatHistory(saved['chat_history'], hot_messages=CHAT_WINDOW)
+        st.session_state.chat_archived = saved['chat_total'] - len(saved['chat_history'])
+        if saved['latest_plan']:
+            st.session_state.plan_type, st.session_state.generated_plan = saved['latest_plan']
+        # Each plan's basis is saved with it: a plan left stale before the reload is still stale
+        st.session_state.plan_basis = saved['plan_basis']
+
+def plan_basis(profile, plan_type):
+    """The profile values plan_type's prompt reads (its template's declared fields), as of profile"""
+    return {field: profile.get(field) for field in get_template(plan_type).fields}
+
+def persist_profile():
+    """Queue the current profile and stats for saving"""
+    get_store().save_profile(st.session_state.athlete_id, st.session_state.user_profile,
+                             st.session_state.workouts_generated)
+
+if 'athlete_id' not in st.session_state:
+    restore_session()
+
+def go_to_page(page):
+    st.session_state.page = page
+
+def rerun_fragment():
+    """Rerun just the enclosing @st.fragment; falls back to a full rerun during a full-script run"""
+    try:
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        st.rerun()
+
+def fragment_rerun():
+    """True when only fragments are rerunning, i.e. main() and its end-of-run bookkeeping are skipped"""
+    ctx = get_script_run_ctx()
+    return bool(ctx and ctx.fragment_ids_this_run)
+
+def timed_fragment(region, run_every=None):
+    """st.fragment that records its own duration and, on fragment-only reruns, applies the memory budget
+    (fragment reruns skip main(), its page timer and its budget check)"""
+    def decorate(fn):
+        @wraps(fn)
+        def run():
+            try:
+                with REGISTRY.timer("coachbot_fragment_render_seconds", {"region": region}, RENDER_BUCKETS):
+                    fn()
+            finally:
+                if fragment_rerun():
+                    enforce_memory_budget()
+        return st.fragment(run, run_every=run_every)
+    return decorate
+
+@timed_fragment("bmi_calculator")
 def display_bmi_calculator():
-    """Display BMI Calculator interface"""
+    """Display BMI Calculator interface (a fragment: calculating reruns only this form)"""
     st.subheader("📊 BMI Calculator")
     
+    profile = st.session_state.user_profile
     col1, col2, col3 = st.columns([1, 1, 1])
     
     with col1:
-        weight = st.number_input("Weight (kg)", min_value=20.0, max_value=200.0, value=70.0, step=0.5)
+        weight = st.number_input("Weight (kg)", min_value=20.0, max_value=200.0,
+                                 value=float(profile.get('weight', 70.0)), step=0.5)
     
     with col2:
-        height = st.number_input("Height (cm)", min_value=100, max_value=250, value=170, step=1)
+        height = st.number_input("Height (cm)", min_value=100, max_value=250, value=int(profile.get('height', 170)), step=1)
     
     with col3:
-        age = st.number_input("Age", min_value=10, max_value=70, value=15, step=1)
+        age = st.number_input("Age", min_value=10, max_value=70, value=int(profile.get('age', 15)), step=1)
     
     if st.button("Calculate BMI", use_container_width=True):
         bmi = calculate_bmi(weight, height)
@@ -217,7 +366,8 @@ def display_bmi_calculator():
             - Prioritize nutrition education and portion control
             """)
       
-        st.session_state.user_profile.update({
+        update_profile({
+            **st.session_state.user_profile,
             'weight': weight,
             'height': height,
             'age': age,
@@ -232,17 +382,18 @@ def sidebar_navigation():
         st.markdown("---")
         
         st.subheader("📊 Navigation")
-        pages = ["Dashboard", "BMI Calculator", "Profile Setup", "Training Plan", "Nutrition", "AI Coach"]
+        pages = ["Dashboard", "BMI Calculator", "Profile Setup", "Training Plan", "Nutrition", "AI Coach", "Team Roster", "Admin"]
         
         for page in pages:
-            icon = "🏠" if page == "Dashboard" else "⚖️" if page == "BMI Calculator" else "👤" if page == "Profile Setup" else "💪" if page == "Training Plan" else "🥗" if page == "Nutrition" else "💬"
-            if st.button(f"{icon} {page}", key=f"nav_{page}"):
-                st.session_state.page = page
-                st.rerun()
+            icon = "🏠" if page == "Dashboard" else "⚖️" if page == "BMI Calculator" else "👤" if page == "Profile Setup" else "💪" if page == "Training Plan" else "🥗" if page == "Nutrition" else "👥" if page == "Team Roster" else "🛠️" if page == "Admin" else "💬"
+            # on_click runs before the rerun the click triggers, so no second full run is needed
+            st.button(f"{icon} {page}", key=f"nav_{page}", on_click=go_to_page, args=(page,))
         
         st.markdown("---")
         
-      
+        # Polls while plans are generating, so progress and results follow the athlete across pages
+        plan_jobs_panel()
+        
         st.subheader("📈 Your Stats")
         st.metric("Plans Generated", st.session_state.workouts_generated)
         if 'bmi' in st.session_state.user_profile:
@@ -251,248 +402,254 @@ def sidebar_navigation():
         st.markdown("---")
         st.markdown("💡 *Your AI-powered fitness coach for youth athletes!*")
 
-sidebar_navigation()
-
-def create_training_prompt(user_data, focus_area="general"):
-    """Create specialized prompt based on focus area"""
-    
-    prompts = {
-        "workout": f"""
-        You are an elite youth sports coach specializing in {user_data['sport']}.
-        
-        ATHLETE PROFILE:
-        - Age: {user_data['age']} years
-        - Sport: {user_data['sport']}
-        - Position: {user_data['position']}
-        - Fitness Level: {user_data.get('fitness_level', 'Beginner')}
-        - Experience: {user_data.get('experience', '0-6 months')}
-        - BMI: {user_data.get('bmi', 'N/A')} ({user_data.get('bmi_category', 'N/A')})
-        - Training Goal: {user_data.get('goal', 'Improve overall fitness')}
-        - Injury History: {user_data.get('injury', 'None')}
-        - Training Frequency: {user_data.get('frequency', '3 days/week')}
-        - Session Duration: {user_data.get('duration', '60 minutes')}
-        
-        TASK: Generate a comprehensive workout plan including:
-        1. Warm-up routine (10-15 minutes)
-        2. Main workout exercises with sets, reps, and rest periods
-        3. Cool-down and stretching (10 minutes)
-        4. Safety precautions and form tips
-        5. Intensity guidelines (1-10 scale)
-        8. Response should be around 250-300 words
-        9.Table is must in the workout plan
-        
-        Make it age-appropriate, safe, and motivating. Use emojis and bullet points.provide all day workout plan.. And also give it kinda short, dont give essays
-        """,
-        
-        "nutrition": f"""
-        You are a certified sports nutritionist for young athletes.
-        
-        ATHLETE PROFILE:
-        - Age: {user_data['age']} years
-        - Sport: {user_data['sport']}
-        - Position: {user_data['position']}
-        - Weight: {user_data.get('weight', 65)} kg
-        - Height: {user_data.get('height', 170)} cm
-        - BMI: {user_data.get('bmi', 'N/A')} ({user_data.get('bmi_category', 'N/A')})
-        - Diet Type: {user_data.get('diet', 'Balanced')}
-        - Allergies: {user_data.get('allergies', 'None')}
-        - Training Goal: {user_data.get('goal', 'Improve performance')}
-        
-        TASK: Create a personalized nutrition plan including:
-        1. Daily caloric needs estimation
-        2. Macronutrient breakdown (protein, carbs, fats)
-        3. Pre-workout meal suggestions
-        4. Post-workout recovery nutrition
-        5. Hydration guidelines
-        6. Sample one-day meal plan
-        7. Healthy snack options
-        8. Response should be around 250-300 words
-        9.Table is must in the nutition
-        
-        Consider age-appropriate nutritional needs and BMI status. And also give it kinda short, dont give essays
-        """,
-        
-        "recovery": f"""
-        You are a sports rehabilitation specialist.
-        
-        ATHLETE PROFILE:
-        - Age: {user_data['age']} years
-        - Sport: {user_data['sport']}
-        - Position: {user_data['position']}
-        - Injury History: {user_data.get('injury', 'None')}
-        - Current Limitations: {user_data.get('limitations', 'None')}
-        
-        TASK: Provide recovery and injury prevention strategies including:
-        1. Pre-training injury prevention exercises
-        2. Proper warm-up sequences
-        3. Recovery techniques after workouts
-        4. Stretching routines for {user_data['sport']}
-        5. Warning signs to watch for
-        6. When to seek medical attention
-        7. Active recovery activities
-
-        
-        Prioritize safety and proper technique. Provide detailed and comprehensive information.And also give it kinda short, dont give essays
-        """,
-        
-        "tactical": f"""
-        You are an expert {user_data['sport']} coach with tactical expertise.
-        
-        ATHLETE PROFILE:
-        - Age: {user_data['age']} years
-        - Sport: {user_data['sport']}
-        - Position: {user_data['position']}
-        - Experience: {user_data.get('experience', 'Beginner')}
-        - Skill Level: {user_data.get('fitness_level', 'Beginner')}
-        
-        TASK: Provide tactical coaching tips including:
-        1. Position-specific responsibilities
-        2. Decision-making drills
-        3. Game intelligence tips
-        4. Communication strategies
-        5. Reading the game
-        6. Mental preparation for competition
-        
-        Make it practical and easy to understand for young athletes. Provide detailed and comprehensive information.And also give it kinda short, dont give essays
-        """,
-        
-        "mental": f"""
-        You are a sports psychologist specializing in youth athletics.
-        
-        ATHLETE PROFILE:
-        - Age: {user_data['age']} years
-        - Sport: {user_data['sport']}
-        - Position: {user_data['position']}
-        - Experience: {user_data.get('experience', 'Beginner')}
-        
-        TASK: Provide mental training techniques including:
-        1. Goal-setting strategies
-        2. Visualization techniques
-        3. Pre-competition routines
-        4. Stress management tips
-        5. Motivation and focus exercises
-        6. Building confidence
-        7. Handling pressure situations
-        
-        Make it age-appropriate and practical. Provide detailed and comprehensive information.And also give it kinda short, dont give essays
-        """
-    }
-    
-    return prompts.get(focus_area, prompts["workout"])
-
-def create_pdf(plan_text, plan_type):
-    """Create PDF from generated plan text"""
-    pdf_buffer = BytesIO()
-    doc = SimpleDocTemplate(pdf_buffer, pagesize=letter)
-    styles = getSampleStyleSheet()
-    
-    # Custom styles
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#667eea'),
-        alignment=TA_CENTER,
-        spaceAfter=30
-    )
-    
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=16,
-        textColor=colors.HexColor('#764ba2'),
-        spaceAfter=12,
-        spaceBefore=20
-    )
-    
-    body_style = ParagraphStyle(
-        'CustomBody',
-        parent=styles['BodyText'],
-        fontSize=11,
-        spaceAfter=12,
-        leading=14
-    )
-    
-    story = []
-    
-    # Title
-    story.append(Paragraph(f"CoachBot AI - {plan_type} Plan", title_style))
-    story.append(Spacer(1, 20))
-    
-    # Profile information
-    profile = st.session_state.user_profile
-    if profile:
-        profile_data = [
-            ["Sport", profile.get('sport', 'N/A')],
-            ["Position", profile.get('position', 'N/A')],
-            ["Age", f"{profile.get('age', 'N/A')} years"],
-            ["Fitness Level", profile.get('fitness_level', 'N/A')],
-            ["Goal", profile.get('goal', 'N/A')],
-            ["BMI", f"{profile.get('bmi', 'N/A')} ({profile.get('bmi_category', 'N/A')})"],
-        ]
-        
-        profile_table = Table(profile_data, colWidths=[2*inch, 4*inch])
-        profile_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#667eea')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        
-        story.append(Paragraph("Athlete Profile", heading_style))
-        story.append(profile_table)
-        story.append(Spacer(1, 30))
-    
-    # Plan content - Process markdown-style formatting
-    story.append(Paragraph("Your Personalized Plan", heading_style))
-    
-    # Split text into paragraphs
-    lines = plan_text.split('\n')
-    for line in lines:
-        line = line.strip()
-        if line:
-            # Convert markdown headers to PDF paragraphs
-            if line.startswith('###'):
-                text = line.replace('###', '').strip()
-                story.append(Paragraph(text, heading_style))
-            elif line.startswith('##'):
-                text = line.replace('##', '').strip()
-                story.append(Paragraph(text, heading_style))
-            elif line.startswith('#'):
-                text = line.replace('#', '').strip()
-                story.append(Paragraph(text, title_style))
-            elif line.startswith('-') or line.startswith('*'):
-                # Bullet points
-                text = line.replace('-', '').replace('*', '').strip()
-                story.append(Paragraph(f"• {text}", body_style))
-            elif line.startswith('|'):
-                # Table row - skip for now, would need more complex parsing
-                continue
-            else:
-                # Regular paragraph
-                story.append(Paragraph(line, body_style))
-    
-    # Footer
-    story.append(Spacer(1, 40))
-    story.append(Paragraph("Generated by CoachBot AI", ParagraphStyle(
-        'Footer',
-        parent=styles['Normal'],
-        fontSize=9,
-        textColor=colors.gray,
-        alignment=TA_CENTER
-    )))
-    
-    doc.build(story)
-    pdf_buffer.seek(0)
-    return pdf_buffer
-
-def generate_ai_plan(plan_type):
-    """Generate AI-powered plan based on type"""
-    if not model:
+@st.cache_resource
+def get_plan_cache():
+    """Process-wide cache of generated plans, persisted under CACHE_DIR"""
+    return PlanCache(os.path.join(CACHE_DIR, "plans"))
+
+def stream_to_placeholder(prompt, placeholder, render=None, timeout=None):
+    """Stream model output into a placeholder as it arrives and return the full text"""
+    render = render or (lambda text: text)
+    text = ""
+    for piece in backend.stream(prompt, timeout=timeout):
+        text += piece
+        placeholder.markdown(render(text + " ▌"), unsafe_allow_html=True)
+    placeholder.markdown(render(text), unsafe_allow_html=True)
+    return text
+
+@st.cache_resource
+def get_single_flight():
+    """Process-wide coalescing of identical concurrent generations"""
+    return SingleFlight()
+
+def flight_key(prompt):
+    """Canonical key for a prompt: whitespace-normalized text + backend config"""
+    canonical = json.dumps(backend.config, sort_keys=True, default=str) + " ".join(prompt.split())
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def record_plan_generation(plan_type, generate):
+    """Run a plan generation callable, recording its latency and outcome by plan type"""
+    started = time.perf_counter()
+    try:
+        with call_kind(plan_type):
+            result = generate()
+    except JobCancelled:
+        REGISTRY.inc("coachbot_plan_requests_total", {"plan_type": plan_type, "outcome": "cancelled"})
+        raise
+    except Exception:
+        REGISTRY.inc("coachbot_plan_requests_total", {"plan_type": plan_type, "outcome": "error"})
+        raise
+    REGISTRY.observe("coachbot_plan_seconds", time.perf_counter() - started, {"plan_type": plan_type})
+    REGISTRY.inc("coachbot_plan_requests_total", {"plan_type": plan_type, "outcome": "ok"})
+    return result
+
+def render_plan_prompt(profile, plan_type):
+    """Render the plan prompt from its template and record its size against the token budget"""
+    rendered = render_prompt(plan_type, profile)
+    REGISTRY.observe("coachbot_prompt_tokens", rendered.tokens, {"plan_type": plan_type}, TOKEN_BUCKETS)
+    if rendered.over_budget:
+        REGISTRY.inc("coachbot_prompt_over_budget_total", {"plan_type": plan_type})
+    return rendered.text
+
+def record_plan_output(plan_type, plan_text):
+    REGISTRY.observe("coachbot_plan_output_words", output_words(plan_text), {"plan_type": plan_type}, WORD_BUCKETS)
+
+def store_plan(plan_type, plan_text, make_current=True, structured=None, basis=None):
+    """Add plan_text to this session's plans (as the current plan unless make_current=False) and persist it
+
+    structured is the plan's JSON for plan types requested with a schema (see workout_plan). basis is the
+    profile the plan was generated from (see plan_basis), defaulting to the current one.
+    """
+    if make_current:
+        st.session_state.generated_plan = plan_text
+        st.session_state.plan_type = plan_type
+    st.session_state.generated_plans[plan_type] = plan_text
+    if structured:
+        st.session_state.structured_plans[plan_type] = structured
+    else:
+        st.session_state.structured_plans.pop(plan_type, None)
+    st.session_state.plan_job_errors.pop(plan_type, None)
+    st.session_state.plan_basis[plan_type] = basis or plan_basis(st.session_state.user_profile, plan_type)
+    st.session_state.workouts_generated += 1
+    get_store().save_plan(st.session_state.athlete_id, plan_type, plan_text, structured,
+                          st.session_state.plan_basis[plan_type])
+    persist_profile()
+
+def cached_plan(plan_type, cache_key):
+    """(markdown, structured JSON or None) for a cached plan, or None on a miss"""
+    raw = get_plan_cache().get(cache_key)
+    if not raw:
+        return None
+    try:
+        plan_text, structured = render_plan_response(plan_type, raw)
+    except PlanValidationError:
+        # Cached before the plan type became structured; generate a fresh one
+        return None
+    return plan_text, structured.to_json() if structured else None
+
+@st.cache_resource
+def get_job_queue():
+    """Process-wide worker pool for plan generation; bounds concurrent generations per server"""
+    return JobQueue(max_workers=MAX_CONCURRENT_PLANS, max_pending=PLAN_QUEUE_LIMIT)
+
+def run_plan_job(job, plan_type, prompt, cache_key, plan_cache, flight):
+    """Worker-thread body of a plan job: generate (sharing identical in-flight requests) and cache the plan
+
+    Returns (markdown, structured JSON or None).
+    """
+    REGISTRY.observe("coachbot_plan_queue_seconds", job.started_at - job.created_at, {"plan_type": plan_type})
+    schema = plan_schema(plan_type)
+    
+    def generate():
+        # Cancelled while it waited for a worker: don't spend quota on it
+        job.check_cancelled()
+        if not STREAM_RESPONSES:
+            return backend.generate(prompt, timeout=PLAN_DEADLINE_SECONDS, response_schema=schema)
+        text = ""
+        # Structured plans stream too: every piece is shown as progress and is a point where Cancel takes effect
+        for piece in backend.stream(prompt, timeout=PLAN_DEADLINE_SECONDS, response_schema=schema):
+            text += piece
+            job.report(text)
+        return text
+    
+    while True:
+        try:
+            plan_text, shared = record_plan_generation(plan_type, partial(
+                flight.do, flight_key(prompt), generate, SINGLE_FLIGHT_TIMEOUT
+            ))
+            break
+        except (JobCancelled, InterruptedFlight):
+            if job.cancelled:
+                raise
+            # The generation we were sharing was cancelled or interrupted in its own session; run our own
+    
+    if not plan_text:
+        raise ValueError("The AI did not return any content. Please try again.")
+    markdown, structured = render_plan_response(plan_type, plan_text)
+    if shared or structured:
+        job.progress = markdown
+    record_plan_output(plan_type, markdown)
+    plan_cache.set(cache_key, plan_text, plan_type)
+    return markdown, structured.to_json() if structured else None
+
+def submit_plan_job(profile, plan_type, cache_key, kind):
+    """Queue a background generation for plan_type unless this session already has one running for this profile"""
+    basis = plan_basis(profile, plan_type)
+    job = get_job_queue().get(st.session_state.plan_jobs.get(plan_type))
+    if job and not job.done:
+        if not changed_fields(job.meta.get("basis"), basis):
+            return job
+        # The profile changed under a running job; its plan would already be out of date
+        get_job_queue().cancel(job.id)
+    job = get_job_queue().submit(kind, st.session_state.athlete_id, PLAN_LABELS.get(plan_type, plan_type), partial(
+        run_plan_job, plan_type=plan_type, prompt=render_plan_prompt(profile, plan_type), cache_key=cache_key,
+        plan_cache=get_plan_cache(), flight=get_single_flight()
+    ), meta={"basis": basis})
+    st.session_state.plan_jobs[plan_type] = job.id
+    st.session_state.plan_job_errors.pop(plan_type, None)
+    return job
+
+def describe_plan_error(error):
+    """(level, message) shown for a failed plan job"""
+    if isinstance(error, BackendUnavailable):
+        # Breaker is open: fail fast instead of adding load to a struggling provider
+        return "warning", f"⏳ **AI Coach is busy right now.** {str(error)}"
+    if isinstance(error, TimeoutError):
+        return "error", "❌ **AI Generation Timed Out** — the AI service took too long to respond. Please try again in a moment."
+    return "error", f"❌ **AI Generation Error:** {str(error)} ({type(error).__name__})"
+
+def collect_plan_jobs():
+    """Move finished background plans into this session; returns True if any finished since the last check"""
+    queue = get_job_queue()
+    finished = False
+    for plan_type, job_id in list(st.session_state.plan_jobs.items()):
+        job = queue.get(job_id)
+        if job is not None and not job.done:
+            continue
+        del st.session_state.plan_jobs[plan_type]
+        finished = True
+        if job is None:
+            # Pruned or lost with a server restart; a finished plan is still in the plan cache
+            continue
+        if job.status == DONE:
+            plan_text, structured = job.result
+            store_plan(plan_type, plan_text, make_current=job.kind == "plan", structured=structured,
+                       basis=job.meta.get("basis"))
+            st.toast(f"✅ {job.label} plan ready")
+        elif job.status == FAILED:
+            st.session_state.plan_job_errors[plan_type] = describe_plan_error(job.error)
+            st.toast(f"❌ {job.label} plan failed")
+        else:
+            st.toast(f"🛑 {job.label} plan cancelled")
+    return finished
+
+def cancel_plan_job(plan_type):
+    job_id = st.session_state.plan_jobs.get(plan_type)
+    if job_id:
+        get_job_queue().cancel(job_id)
+
+def render_plan_jobs():
+    """Status, progress and a cancel button for each plan this session is generating"""
+    if collect_plan_jobs():
+        # Full rerun so the plan panel shows the new plan and polling stops once nothing is left
+        st.rerun()
+    if not st.session_state.plan_jobs:
+        return
+    queue = get_job_queue()
+    st.subheader("⏳ Generating Plans")
+    for plan_type, job_id in st.session_state.plan_jobs.items():
+        job = queue.get(job_id)
+        if job.status == QUEUED:
+            position = queue.position(job_id)
+            st.caption(f"{job.label}: waiting for a free AI slot (#{position or 1} in line)")
+        elif job.cancelled:
+            st.caption(f"{job.label}: cancelling...")
+        elif job.progress:
+            st.caption(f"{job.label}: ✍️ {len(job.progress.split())} words · {job.elapsed():.0f}s")
+        else:
+            st.caption(f"{job.label}: 🧠 working · {job.elapsed():.0f}s")
+        st.button("✖️ Cancel", key=f"cancel_job_{plan_type}", on_click=cancel_plan_job, args=(plan_type,),
+                  disabled=job.cancelled)
+    st.markdown("---")
+
+def job_progress_markdown(plan_type, progress):
+    """What to show of a running job's partial output: the markdown so far, or how far a JSON plan has got"""
+    if plan_schema(plan_type) is None or not progress.lstrip().startswith("{"):
+        return progress
+    days = len(re.findall(r'"day"\s*:', progress))
+    return f"🧱 Building your structured plan... {days} day(s) drafted so far"
+
+def render_plan_progress():
+    """Each generating plan's text so far, redrawn as it streams in"""
+    if collect_plan_jobs():
+        # Full rerun so the panel shows the finished plan and polling stops once nothing is left
+        st.rerun()
+    queue = get_job_queue()
+    for plan_type, job_id in st.session_state.plan_jobs.items():
+        job = queue.get(job_id)
+        if job is None:
+            continue
+        if not job.progress:
+            st.info(f"⏳ Your {PLAN_LABELS[plan_type]} plan is being generated in the background. "
+                    "Feel free to keep exploring — it will appear here when ready.")
+            continue
+        with st.container(border=True):
+            st.caption(f"✍️ {PLAN_LABELS[plan_type]} plan, still writing · {job.elapsed():.0f}s")
+            st.markdown(job_progress_markdown(plan_type, job.progress))
+
+def plan_progress_panel():
+    """Partial plans inside the plan panel; the fragment only polls while this session has plans generating"""
+    poll = PROGRESS_POLL_SECONDS if st.session_state.plan_jobs else None
+    timed_fragment("plan_progress", run_every=poll)(render_plan_progress)()
+
+def plan_jobs_panel():
+    """Sidebar job status; the fragment only polls while this session has plans generating"""
+    poll = JOB_POLL_SECONDS if st.session_state.plan_jobs else None
+    timed_fragment("plan_jobs", run_every=poll)(render_plan_jobs)()
+
+def generate_ai_plan(plan_type, force_regenerate=False):
+    """Queue an AI-powered plan in the background, serving repeat requests from the plan cache"""
+    if not backend:
         st.error("❌ **AI Model Not Available**")
         st.error("Please configure your GEMINI_API_KEY to use AI-generated plans.")
         st.error("This app requires AI features to function properly.")
@@ -505,48 +662,282 @@ def generate_ai_plan(plan_type):
         st.error("Please complete your profile setup first.")
         return
     
+    cache_key = plan_cache_key(profile, plan_type, backend.config)
+    
+    if not force_regenerate:
+        cached = cached_plan(plan_type, cache_key)
+        if cached:
+            REGISTRY.inc("coachbot_plan_requests_total", {"plan_type": plan_type, "outcome": "cached"})
+            store_plan(plan_type, cached[0], structured=cached[1])
+            st.toast("⚡ Loaded your plan from cache")
+            rerun_fragment()
+    
     try:
-        # Create specialized prompt
-        prompt = create_training_prompt(profile, plan_type)
-        
-        # Add additional instructions for better output
-        prompt += "\n\nIMPORTANT: Make the output detailed, specific, and actionable. Use Markdown formatting with headers, bullet points, and proper structure. Provide comprehensive information without limiting word count."
-        
-        with st.spinner("🧠 AI Coach is creating your personalized plan..."):
-            # Generate content
-            response = model.generate_content(prompt)
-            
-            if not response or not response.text:
-                st.error("❌ **AI Generation Failed**")
-                st.error("The AI did not return any content. Please try again.")
-                return
-            
-            # Store the generated plan
-            st.session_state.generated_plan = response.text
-            st.session_state.plan_type = plan_type
-            st.session_state.workouts_generated += 1
-            
-            st.success("✅ **AI-Generated Plan Created Successfully!**")
-            st.info("Your personalized plan is ready below.")
-            st.rerun()
-            
-    except Exception as e:
-        st.error(f"❌ **AI Generation Error:** {str(e)}")
-        st.error("There was a problem generating your AI plan.")
-        st.info(f"Error details: {type(e).__name__}")
-        
-        # Try one more time with simpler prompt
+        submit_plan_job(profile, plan_type, cache_key, "plan")
+    except QueueFull:
+        st.warning("⏳ **Lots of athletes are generating plans right now.** Please try again in a minute.")
+        return
+    
+    # Full rerun so the sidebar starts polling the new job
+    st.rerun()
+
+def generate_all_plans(force_regenerate=False):
+    """Queue every plan type in the background; cached plans are added straight away"""
+    if not backend:
+        st.error("❌ **AI Model Not Available**")
+        st.error("Please configure your GEMINI_API_KEY to use AI-generated plans.")
+        return
+    
+    profile = st.session_state.user_profile
+    
+    from_cache = 0
+    for plan_type in PLAN_LABELS:
+        cache_key = plan_cache_key(profile, plan_type, backend.config)
+        cached = None if force_regenerate else cached_plan(plan_type, cache_key)
+        if cached:
+            REGISTRY.inc("coachbot_plan_requests_total", {"plan_type": plan_type, "outcome": "cached"})
+            store_plan(plan_type, cached[0], make_current=False, structured=cached[1])
+            from_cache += 1
+            continue
         try:
-            simple_prompt = f"Create a detailed {plan_type} plan for a {profile.get('sport', 'athlete')}. Provide comprehensive information with tables and detailed explanations."
-            response = model.generate_content(simple_prompt)
-            st.session_state.generated_plan = response.text
-            st.session_state.plan_type = plan_type
-            st.session_state.workouts_generated += 1
-            st.success("✅ Plan generated with fallback method!")
+            submit_plan_job(profile, plan_type, cache_key, "package")
+        except QueueFull:
+            st.session_state.plan_job_errors[plan_type] = (
+                "warning", "⏳ **Lots of athletes are generating plans right now.** Please try again in a minute.")
+    
+    if from_cache:
+        st.toast(f"⚡ {from_cache} plan(s) loaded from cache")
+    # Full rerun so the sidebar starts polling the queued jobs
+    st.rerun()
+
+def stale_plans():
+    """{plan_type: changed fields} for this session's plans generated from different profile values than now
+
+    Only the fields each plan's template reads are compared, so e.g. new allergies make the
+    nutrition plan stale but leave the workout, recovery, tactical and mental plans valid.
+    """
+    profile = st.session_state.user_profile
+    stale = {}
+    for plan_type in st.session_state.generated_plans:
+        basis = st.session_state.plan_basis.get(plan_type)
+        if basis is None:
+            continue
+        changed = changed_fields(basis, plan_basis(profile, plan_type))
+        if changed:
+            stale[plan_type] = sorted(changed, key=get_template(plan_type).fields.index)
+    return stale
+
+def describe_stale(fields):
+    return ", ".join(field_label(field).lower() for field in fields)
+
+def refresh_plans(plan_types):
+    """Bring plan_types up to date with the current profile: from the plan cache or as background jobs
+
+    Returns how many jobs were queued.
+    """
+    profile = st.session_state.user_profile
+    queued = 0
+    for plan_type in plan_types:
+        cache_key = plan_cache_key(profile, plan_type, backend.config)
+        make_current = st.session_state.get("plan_type") == plan_type and bool(st.session_state.generated_plan)
+        cached = cached_plan(plan_type, cache_key)
+        if cached:
+            REGISTRY.inc("coachbot_plan_requests_total", {"plan_type": plan_type, "outcome": "cached"})
+            store_plan(plan_type, cached[0], make_current=make_current, structured=cached[1])
+            continue
+        try:
+            submit_plan_job(profile, plan_type, cache_key, "plan" if make_current else "package")
+            queued += 1
+        except QueueFull:
+            st.session_state.plan_job_errors[plan_type] = (
+                "warning", "⏳ **Lots of athletes are generating plans right now.** Please try again in a minute.")
+    return queued
+
+def update_profile(new_profile):
+    """Replace and persist the profile, then mark only the plans whose template fields changed as stale
+
+    With auto-refresh on, the stale plans are regenerated in the background right away.
+    Returns the plan types the edit made stale.
+    """
+    changed = changed_fields(st.session_state.user_profile, new_profile)
+    st.session_state.user_profile = new_profile
+    persist_profile()
+    
+    plans = st.session_state.generated_plans
+    affected = [plan_type for plan_type in plan_types_reading(changed) if plan_type in plans]
+    for plan_type in plans:
+        result = "stale" if plan_type in affected else "still_valid"
+        REGISTRY.inc("coachbot_plan_invalidations_total", {"plan_type": plan_type, "result": result})
+    if not affected:
+        return affected
+    
+    names = ", ".join(PLAN_LABELS[plan_type] for plan_type in affected)
+    if st.session_state.auto_refresh_plans and backend:
+        queued = refresh_plans(affected)
+        st.toast(f"🔄 Updating {names} for your new profile")
+        if queued:
+            # Full rerun so the sidebar starts polling the refresh jobs
             st.rerun()
-        except:
-            st.error("❌ **Could not generate plan**")
-            st.error("Please check your API key and try again.")
+    else:
+        kept = len(plans) - len(affected)
+        st.info(f"🔄 This change affects your {names} plan(s)" +
+                (f"; your other {kept} plan(s) are still up to date." if kept else ".") +
+                " Update them from the Training Plan page.")
+    return affected
+
+def clear_current_plan():
+    st.session_state.generated_plan = None
+
+def regenerate_section(plan_type, plan, day_index, section, request):
+    """Ask the model for one section (or one whole day) of a structured plan and splice it in"""
+    prompt = render_section_prompt(st.session_state.user_profile, plan, day_index, section, request)
+    schema = DAY_SCHEMA if section is None else SECTION_SCHEMA
+    kind = f"{plan_type}_section"
+    REGISTRY.observe("coachbot_prompt_tokens", estimate_tokens(prompt), {"plan_type": kind}, TOKEN_BUCKETS)
+    label = plan.days[day_index].day + ("" if section is None else f" {section_name(section).lower()}")
+    
+    try:
+        with st.spinner(f"🧠 Rewriting {label}..."):
+            raw = record_plan_generation(kind, lambda: backend.generate(
+                prompt, timeout=SECTION_DEADLINE_SECONDS, response_schema=schema
+            ))
+            if section is None:
+                plan.replace_day(day_index, parse_json(raw))
+            else:
+                plan.replace_section(day_index, section, parse_json(raw))
+    except Exception as e:
+        level, message = describe_plan_error(e)
+        getattr(st, level)(message)
+        return
+    
+    # An edit updates this athlete's copy only; the shared plan cache keeps the original
+    plan_text = plan.to_markdown()
+    record_plan_output(kind, plan_text)
+    st.session_state.generated_plans[plan_type] = plan_text
+    st.session_state.structured_plans[plan_type] = plan.to_json()
+    if st.session_state.get("plan_type") == plan_type:
+        st.session_state.generated_plan = plan_text
+    get_store().save_plan(st.session_state.athlete_id, plan_type, plan_text, st.session_state.structured_plans[plan_type],
+                          st.session_state.plan_basis.get(plan_type))
+    st.toast(f"✅ Updated {label}")
+    rerun_fragment()
+
+def section_editor(plan_type, key):
+    """Pick a day and section of a structured plan and regenerate just that piece"""
+    structured = st.session_state.structured_plans.get(plan_type)
+    if not structured or not backend:
+        return
+    plan = WorkoutPlan.from_json(structured)
+    with st.expander("✏️ Change part of this plan"):
+        st.caption("Only the chosen part is rewritten, so it's much quicker than a whole new plan.")
+        col1, col2 = st.columns(2)
+        with col1:
+            day_index = st.selectbox("Day", range(len(plan.days)), format_func=lambda i: plan.days[i].label(),
+                                     key=f"{key}_section_day")
+        with col2:
+            section = st.selectbox("Part", [None, *SECTIONS], key=f"{key}_section_part",
+                                   format_func=lambda part: "📅 Whole day" if part is None else SECTIONS[part])
+        request = st.text_input("What should change? (optional)", key=f"{key}_section_request",
+                                placeholder="e.g. more mobility, no jumping, shorter")
+        if st.button("🔁 Regenerate this part", key=f"{key}_section_go", use_container_width=True):
+            regenerate_section(plan_type, plan, day_index, section, request)
+
+def display_plan_package():
+    """Show every generated plan in tabs with a PDF download per plan"""
+    plans = st.session_state.generated_plans
+    plan_types = [plan_type for plan_type in PLAN_LABELS if plan_type in plans]
+    
+    st.markdown("---")
+    st.markdown('<div class="main-header"><h2>📦 Your AI Plan Package</h2></div>', unsafe_allow_html=True)
+    
+    stale = stale_plans()
+    tabs = st.tabs([PLAN_LABELS[plan_type] + (" 🔄" if plan_type in stale else "") for plan_type in plan_types])
+    for tab, plan_type in zip(tabs, plan_types):
+        with tab:
+            st.markdown(plans[plan_type])
+            pdf_download_button(plans[plan_type], plan_type, key=f"package_{plan_type}")
+            listen_button(plans[plan_type], key=f"package_{plan_type}")
+            section_editor(plan_type, key=f"package_{plan_type}")
+
+def pdf_download_button(plan_text, plan_type, key):
+    """PDF download for a plan; rendering starts in the background as soon as the plan is shown"""
+    file_name = f"CoachBot_{plan_type.replace(' ', '_')}_Plan.pdf"
+    profile = st.session_state.user_profile
+    try:
+        # Non-blocking: returns bytes if rendered (or cached) already, otherwise queues the render
+        pdf_bytes = cached_pdf(plan_text, plan_type, profile)
+        if pdf_bytes is None and st.button("📥 Download Plan as PDF", key=f"{key}_pdf", use_container_width=True):
+            with st.spinner("📄 Preparing your PDF..."):
+                pdf_bytes = create_pdf(plan_text, plan_type, profile).getvalue()
+        if pdf_bytes is not None:
+            st.download_button(
+                label="⬇️ Download Plan as PDF",
+                data=pdf_bytes,
+                file_name=file_name,
+                mime="application/pdf",
+                key=f"{key}_download",
+                use_container_width=True
+            )
+    except Exception as e:
+        st.error(f"❌ **PDF Generation Error:** {str(e)}")
+        st.info("An error occurred while creating the PDF. Please try again.")
+
+@st.cache_resource
+def get_speech():
+    """Process-wide speech synthesis with an on-disk audio cache shared by every session"""
+    return SpeechSynthesizer(create_tts_backend(TTS_BACKEND), AudioCache(os.path.join(CACHE_DIR, "audio")), TTS_WORKERS)
+
+def start_listening(key, digest):
+    st.session_state.listening[key] = {"digest": digest, "autoplay": True}
+
+def stop_listening(key):
+    st.session_state.listening.pop(key, None)
+
+def listen_button(text, key):
+    """🔊 Read text aloud; the player appears once the first sentences are synthesized"""
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+    state = st.session_state.listening.get(key)
+    if not state or state["digest"] != digest:
+        st.button("🔊 Listen", key=f"{key}_listen", use_container_width=True, on_click=start_listening, args=(key, digest))
+        return
+    # Autoplay only on the run right after the click, not on every later rerun
+    autoplay = state.pop("autoplay", False)
+    try:
+        play_audio(text, key, autoplay)
+    except Exception as e:
+        st.error(f"🔇 **Audio unavailable:** {str(e)}")
+    st.button("⏹️ Close player", key=f"{key}_stop", use_container_width=True, on_click=stop_listening, args=(key,))
+
+def play_audio(text, key, autoplay):
+    """One player when every chunk is cached, otherwise a player per chunk as each one is ready"""
+    speech = get_speech()
+    mime = speech.backend.mime
+    started = time.perf_counter()
+    futures = speech.submit(text)
+    if not futures:
+        st.info("Nothing to read aloud here.")
+        return
+    
+    if all(future.done() for future in futures):
+        audio = speech.join([future.result() for future in futures])
+        st.audio(audio, format=mime, autoplay=autoplay)
+    else:
+        with st.spinner("🔊 Preparing audio..."):
+            first = futures[0].result(timeout=TTS_CHUNK_TIMEOUT)
+        REGISTRY.observe("coachbot_tts_first_audio_seconds", time.perf_counter() - started)
+        # Start playing the opening sentences while the rest are still being synthesized
+        st.caption(f"Part 1 of {len(futures)}")
+        st.audio(first, format=mime, autoplay=autoplay)
+        segments = [first]
+        for i, future in enumerate(futures[1:], 2):
+            segments.append(future.result(timeout=TTS_CHUNK_TIMEOUT))
+            st.caption(f"Part {i} of {len(futures)}")
+            st.audio(segments[-1], format=mime)
+        audio = speech.join(segments)
+    
+    extension = "mp3" if mime == "audio/mpeg" else "wav"
+    st.download_button("⬇️ Download audio", data=audio, file_name=f"CoachBot_{key}.{extension}", mime=mime,
+                       key=f"{key}_audio_download", use_container_width=True)
 
 # ---------------- PAGE FUNCTIONS ----------------
 
@@ -597,6 +988,28 @@ def dashboard_page():
         """)
     
     st.markdown("---")
+    
+    # AI System Status
+    st.subheader("🛰️ AI System Status")
+    if not backend:
+        st.error("❌ AI model not configured - add GEMINI_API_KEY to Streamlit secrets.")
+    else:
+        health = get_health_probe().status()
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            state_label = {"healthy": "✅ Online", "unhealthy": "❌ Unreachable"}.get(health['state'], "⏳ Checking")
+            st.metric(f"🤖 {backend.name.title()} API", state_label)
+        with col2:
+            st.metric("⏱️ Probe Latency", f"{health['latency_ms']} ms" if health['latency_ms'] is not None else "N/A")
+        with col3:
+            checked = datetime.fromtimestamp(health['checked_at']).strftime("%H:%M:%S") if health['checked_at'] else "N/A"
+            st.metric("🕒 Last Checked", checked)
+        if health['error']:
+            st.warning(f"Last probe error: {health['error']}")
+        resilience = backend.stats()
+        if resilience['breaker'] != "closed":
+            st.warning("⚡ Circuit breaker is open - AI requests are paused briefly while the service recovers.")
+        st.caption(f"🔁 {resilience['retries']} retried model calls since startup")
 
 
 def bmi_calculator_page():
@@ -629,6 +1042,7 @@ def bmi_calculator_page():
     # BMI Chart
     st.subheader("📊 BMI Reference Chart")
     
+    import pandas as pd
     bmi_data = pd.DataFrame({
         'Category': ['Underweight', 'Normal', 'Overweight', 'Obese'],
         'BMI Range': ['< 18.5', '18.5 - 24.9', '25 - 29.9', '≥ 30'],
@@ -637,6 +1051,9 @@ def bmi_calculator_page():
     
     st.dataframe(bmi_data, use_container_width=True, hide_index=True)
 
+def set_auto_refresh():
+    st.session_state.auto_refresh_plans = st.session_state.auto_refresh_toggle
+
 def profile_setup_page():
     st.markdown('<div class="main-header"><h1>👤 Profile Setup</h1></div>', unsafe_allow_html=True)
     
@@ -646,50 +1063,61 @@ def profile_setup_page():
         st.info("💡 Go to the BMI Calculator page and calculate your BMI before setting up your profile.")
         return
     
+    profile = st.session_state.user_profile
+    
+    def choose(label, options, field):
+        """Selectbox starting at the saved value, so editing one field keeps the others"""
+        saved = profile.get(field)
+        return st.selectbox(label, options, index=options.index(saved) if saved in options else 0)
+    
     col1, col2 = st.columns(2)
     
     with col1:
         st.subheader("🏆 Sport Details")
-        sport = st.selectbox("Select Sport", list(SPORT_CONFIG.keys()))
+        sport = choose("Select Sport", list(SPORT_CONFIG.keys()), 'sport')
         if sport:
             sport_config = SPORT_CONFIG[sport]
-            position = st.selectbox("Position/Role", sport_config["positions"])
+            position = choose("Position/Role", sport_config["positions"], 'position')
             
             st.subheader("📊 Fitness Information")
-            experience = st.selectbox("Training Experience", 
-                ["0-6 months", "6-12 months", "1-2 years", "2+ years"])
-            fitness_level = st.selectbox("Current Fitness Level", 
-                ["Beginner", "Intermediate", "Advanced"])
-            frequency = st.selectbox("Training Frequency", 
-                ["2 days/week", "3 days/week", "4 days/week", "5 days/week"])
-            duration = st.selectbox("Session Duration", 
-                ["30 minutes", "45 minutes", "60 minutes", "90 minutes"])
+            experience = choose("Training Experience", 
+                ["0-6 months", "6-12 months", "1-2 years", "2+ years"], 'experience')
+            fitness_level = choose("Current Fitness Level", 
+                ["Beginner", "Intermediate", "Advanced"], 'fitness_level')
+            frequency = choose("Training Frequency", 
+                ["2 days/week", "3 days/week", "4 days/week", "5 days/week"], 'frequency')
+            duration = choose("Session Duration", 
+                ["30 minutes", "45 minutes", "60 minutes", "90 minutes"], 'duration')
     
     with col2:
         st.subheader("🎯 Goals")
-        goal = st.selectbox("Primary Goal", 
+        goal = choose("Primary Goal", 
             ["Improve overall fitness", "Build strength", "Increase endurance", 
-             "Lose weight", "Gain muscle", "Recover from injury", "Improve technique"])
+             "Lose weight", "Gain muscle", "Recover from injury", "Improve technique"], 'goal')
         
-        intensity = st.selectbox("Intensity Preference", 
-            ["Low", "Moderate", "High", "Very High"])
+        intensity = choose("Intensity Preference", 
+            ["Low", "Moderate", "High", "Very High"], 'intensity')
         
         st.subheader("🏥 Health Information")
-        injury = st.text_area("Injury History (if any)", 
+        injury = st.text_area("Injury History (if any)", value=profile.get('injury', ''),
             placeholder="Describe any past or current injuries")
-        limitations = st.text_input("Physical Limitations", 
+        limitations = st.text_input("Physical Limitations", value=profile.get('limitations', ''),
             placeholder="Any exercises to avoid")
         
         st.subheader("🥗 Nutrition Preferences")
-        diet = st.selectbox("Diet Type", 
-            ["Balanced", "Vegetarian", "Vegan", "High Protein"])
-        allergies = st.text_input("Food Allergies", 
+        diet = choose("Diet Type", 
+            ["Balanced", "Vegetarian", "Vegan", "High Protein"], 'diet')
+        allergies = st.text_input("Food Allergies", value=profile.get('allergies', ''),
             placeholder="Any food allergies")
     
     # Save Profile Button
     st.markdown("---")
     col1, col2, col3 = st.columns([1, 2, 1])
     with col2:
+        # Own widget key: widget state is dropped on other pages, the preference shouldn't be
+        st.toggle("🔁 Update affected plans automatically", value=st.session_state.auto_refresh_plans,
+                  key="auto_refresh_toggle", on_change=set_auto_refresh,
+                  help="After a change, regenerate only the plans that use the changed details, in the background")
         if st.button("💾 Save Profile", use_container_width=True):
             user_data = {
                 'sport': sport,
@@ -706,19 +1134,18 @@ def profile_setup_page():
                 'allergies': allergies
             }
             
-            # Merge with existing profile (BMI data)
-            user_data.update(st.session_state.user_profile)
-            
-            st.session_state.user_profile = user_data
+            # Merge with existing profile (BMI data); the form's values replace the saved ones
+            update_profile({**st.session_state.user_profile, **user_data})
             st.success("✅ Profile saved successfully!")
-            st.info("🎉 Now you can generate your personalized training plan!")
+            if not st.session_state.generated_plans:
+                st.info("🎉 Now you can generate your personalized training plan!")
 
 def training_plan_page():
     try:
         st.markdown('<div class="main-header"><h1>💪 AI Training Plan Generator</h1></div>', unsafe_allow_html=True)
         
         # Check if API is available
-        if not model:
+        if not backend:
             st.error("❌ **AI Features Not Available**")
             st.error("This app requires a valid Google Generative AI API key.")
             st.error("Please configure your GEMINI_API_KEY in Streamlit secrets.")
@@ -750,38 +1177,82 @@ def training_plan_page():
         
         st.info("🤖 **All plans are AI-generated based on your profile**")
         
+        # Generating, showing and downloading plans reruns only this panel
+        plan_panel()
+    except Exception as e:
+        st.error(f"Error in training plan page: {str(e)}")
+        return
+
+@timed_fragment("plan_panel")
+def plan_panel():
+    """Plan generation buttons, the current plan with its PDF download, and the plan package"""
+    try:
         # Generate Options
         st.subheader("🎯 Generate Your AI Plan")
         
+        force_regenerate = st.checkbox("🔁 Force regenerate (ignore saved plans)", value=False)
+        cache_stats = get_plan_cache().stats()
+        flight_stats = get_single_flight().stats()
+        st.caption(f"⚡ Plan cache: {cache_stats['hits']} hits · {cache_stats['misses']} misses · "
+                   f"{flight_stats['coalesced']} shared generations")
+        
+        requested_plan = None
         col1, col2, col3 = st.columns(3)
         
         with col1:
             if st.button("🏋️ AI Workout Plan", use_container_width=True):
-                generate_ai_plan("workout")
+                requested_plan = "workout"
         
         with col2:
             if st.button("🥗 AI Nutrition Plan", use_container_width=True):
-                generate_ai_plan("nutrition")
+                requested_plan = "nutrition"
         
         with col3:
             if st.button("🏥 AI Recovery Plan", use_container_width=True):
-                generate_ai_plan("recovery")
+                requested_plan = "recovery"
         
         col1, col2 = st.columns(2)
         
         with col1:
             if st.button("🧠 AI Mental Training", use_container_width=True):
-                generate_ai_plan("mental")
+                requested_plan = "mental"
         
         with col2:
             if st.button("🎯 AI Tactical Tips", use_container_width=True):
-                generate_ai_plan("tactical")
+                requested_plan = "tactical"
+        
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col2:
+            generate_all = st.button("📦 Generate All Plans", use_container_width=True)
+        
+        # Generate full-width so the streamed plan isn't squeezed into a button column
+        if requested_plan:
+            generate_ai_plan(requested_plan, force_regenerate)
+        elif generate_all:
+            generate_all_plans(force_regenerate)
+        
+        # Plans still generating in the background (shown as they stream in), and any that failed
+        plan_progress_panel()
+        for plan_type, (level, message) in st.session_state.plan_job_errors.items():
+            getattr(st, level)(f"{PLAN_LABELS[plan_type]}: {message}")
+        
+        # Plans made before a profile edit that changed something their prompt uses
+        stale = {plan_type: fields for plan_type, fields in stale_plans().items()
+                 if plan_type not in st.session_state.plan_jobs}
+        if stale:
+            st.warning("🔄 **Out of date after your profile changes:** " + "; ".join(
+                f"{PLAN_LABELS[plan_type]} ({describe_stale(fields)})" for plan_type, fields in stale.items()))
+            if st.button(f"🔄 Update {len(stale)} Out-of-Date Plan(s)", use_container_width=True):
+                if refresh_plans(stale):
+                    st.rerun()
+                rerun_fragment()
         
         # Display generated plan
         if 'generated_plan' in st.session_state and st.session_state.generated_plan:
             st.markdown("---")
             st.markdown('<div class="main-header"><h2>🤖 Your AI-Generated Personalized Plan</h2></div>', unsafe_allow_html=True)
             st.markdown(st.session_state.generated_plan)
+            section_editor(st.session_state.get('plan_type'), key="current_plan")
             
             st.markdown("---")
             
@@ -789,27 +1260,18 @@ def training_plan_page():
             col1, col2, col3 = st.columns([1, 1, 1])
             with col2:
                 plan_type = st.session_state.get('plan_type', 'Workout Plan')
-                if st.button("📥 Download Plan as PDF", use_container_width=True):
-                    try:
-                        pdf_buffer = create_pdf(st.session_state.generated_plan, plan_type)
-                        st.download_button(
-                            label="⬇️ Click to Download PDF",
-                            data=pdf_buffer,
-                            file_name=f"CoachBot_{plan_type.replace(' ', '_')}_Plan.pdf",
-                            mime="application/pdf"
-                        )
-                    except Exception as e:
-                        st.error(f"❌ **PDF Generation Error:** {str(e)}")
-                        st.info("An error occurred while creating the PDF. Please try again.")
+                pdf_download_button(st.session_state.generated_plan, plan_type, key="current_plan")
+                listen_button(st.session_state.generated_plan, key="current_plan")
             
             col1, col2, col3 = st.columns([1, 2, 1])
             with col2:
-                if st.button("🔄 Generate New Plan", use_container_width=True):
-                    st.session_state.generated_plan = None
-                    st.rerun()
+                st.button("🔄 Generate New Plan", use_container_width=True, on_click=clear_current_plan)
+        
+        # Show the full package once more than one plan type has been generated
+        if len(st.session_state.generated_plans) > 1:
+            display_plan_package()
     except Exception as e:
         st.error(f"Error in training plan page: {str(e)}")
-        return
 
 def nutrition_page():
     try:
@@ -824,36 +1286,18 @@ def nutrition_page():
         st.subheader("📊 Your Nutritional Needs")
         
         # Calculate daily calories based on BMI and activity
-        weight = profile.get('weight', 65)
-        height = profile.get('height', 170)
-        age = profile.get('age', 15)
-        gender = profile.get('gender', 'Male')
-        
-        # Simple BMR calculation
-        if gender == "Male":
-            bmr = 10 * weight + 6.25 * height - 5 * age + 5
-        else:
-            bmr = 10 * weight + 6.25 * height - 5 * age - 161
-        
-        activity_multiplier = {
-            "2 days/week": 1.375,
-            "3 days/week": 1.55,
-            "4 days/week": 1.725,
-            "5 days/week": 1.9
-        }
-        
-        frequency = profile.get('frequency', '3 days/week')
-        tdee = bmr * activity_multiplier.get(frequency, 1.55)
+        needs = compute_nutrition(profile)
+        meal_calories = needs['meal_calories']
         
         col1, col2, col3, col4 = st.columns(4)
         with col1:
-            st.metric("🔥 BMR", f"{int(bmr)} cal")
+            st.metric("🔥 BMR", f"{needs['bmr']} cal")
         with col2:
-            st.metric("⚡ Daily Calories", f"{int(tdee)} cal")
+            st.metric("⚡ Daily Calories", f"{needs['tdee']} cal")
         with col3:
-            st.metric("🥩 Protein", f"{int((tdee * 0.3) / 4)}g")
+            st.metric("🥩 Protein", f"{needs['protein_g']}g")
         with col4:
-            st.metric("🍞 Carbs", f"{int((tdee * 0.45) / 4)}g")
+            st.metric("🍞 Carbs", f"{needs['carbs_g']}g")
         
         st.markdown("---")
         
@@ -864,7 +1308,7 @@ def nutrition_page():
             {
                 "name": "🌅 Breakfast",
                 "time": "7:00 AM",
-                "calories": int(tdee * 0.25),
+                "calories": meal_calories['breakfast'],
                 "suggestions": [
                     "Oatmeal with berries and nuts",
                     "Greek yogurt with honey and fruit",
@@ -875,7 +1319,7 @@ def nutrition_page():
             {
                 "name": "🥪 Lunch",
                 "time": "12:30 PM",
-                "calories": int(tdee * 0.30),
+                "calories": meal_calories['lunch'],
                 "suggestions": [
                     "Grilled chicken salad with quinoa",
                     "Turkey sandwich on whole grain bread",
@@ -886,7 +1330,7 @@ def nutrition_page():
             {
                 "name": "🍎 Snack",
                 "time": "3:30 PM",
-                "calories": int(tdee * 0.15),
+                "calories": meal_calories['snack'],
                 "suggestions": [
                     "Apple with almond butter",
                     "Greek yogurt with granola",
@@ -897,7 +1341,7 @@ def nutrition_page():
             {
                 "name": "🍝 Dinner",
                 "time": "7:00 PM",
-                "calories": int(tdee * 0.30),
+                "calories": meal_calories['dinner'],
                 "suggestions": [
                     "Grilled fish with vegetables",
                     "Lean beef stir-fry with brown rice",
@@ -943,11 +1387,124 @@ def nutrition_page():
         st.error(f"Error in nutrition page: {str(e)}")
         return
 
+def archive_old_messages():
+    """Keep at most CHAT_HISTORY_LIMIT messages in session state; older ones remain in the store"""
+    history = st.session_state.chat_history
+    overflow = len(history) - CHAT_HISTORY_LIMIT
+    if overflow > 0:
+        del history[:overflow]
+        st.session_state.chat_archived += overflow
+
+def load_older_messages():
+    st.session_state.chat_window += CHAT_WINDOW
+
+def visible_messages():
+    """The newest chat_window messages, reaching into the store once session history runs out"""
+    history = st.session_state.chat_history
+    window = st.session_state.chat_window
+    if window <= len(history):
+        return history[-window:]
+    archived = min(window - len(history), st.session_state.chat_archived)
+    older = get_store().load_chat_page(st.session_state.athlete_id, skip=len(history), limit=archived) if archived else []
+    return older + history[:]
+
+def summarize_conversation(summary, turns):
+    """Fold older chat turns into the rolling conversation summary"""
+    transcript = "\n".join(f"{'Athlete' if t['role'] == 'user' else 'Coach'}: {t['content']}" for t in turns)
+    prompt = f"""
+    Update the running summary of a coaching conversation with the new messages below.
+    Keep the athlete's questions, key advice given and any personal details they shared.
+    Reply with the updated summary only, under 120 words.
+    
+    CURRENT SUMMARY: {summary or 'None'}
+    
+    NEW MESSAGES:
+    {transcript}
+    """
+    with call_kind("summary"):
+        return backend.generate(prompt, timeout=CHAT_DEADLINE_SECONDS).strip()
+
+def get_coach_memory():
+    """Per-session conversation memory for the AI Coach"""
+    if 'coach_memory' not in st.session_state:
+        st.session_state.coach_memory = ConversationMemory(
+            count_tokens=backend.count_tokens,
+            summarize=summarize_conversation,
+            max_input_tokens=COACH_MAX_INPUT_TOKENS,
+            recent_turns=COACH_RECENT_TURNS
+        )
+        # Seed from restored history so a reloaded session keeps its context
+        history = st.session_state.chat_history
+        for question, answer in zip(history[::2], history[1::2]):
+            st.session_state.coach_memory.add_exchange(question['content'], answer['content'])
+    return st.session_state.coach_memory
+
+@st.cache_resource
+def get_answer_cache():
+    """Process-wide semantic cache of AI Coach answers"""
+    return AnswerCache(threshold=ANSWER_CACHE_THRESHOLD)
+
+def generate_coach_reply(question, chat_container):
+    """Ask the model with conversation memory, streaming the reply into a chat bubble"""
+    st.session_state.chat_history.append({"role": "user", "content": question})
+    
+    try:
+        memory = get_coach_memory()
+        memory.set_profile(st.session_state.user_profile)
+        answer_cache = get_answer_cache()
+        # lookup/store skip follow-ups ("what about that?") and one-word messages, which depend on
+        # earlier turns; standalone questions are shared at any point in a conversation
+        ai_response, similarity = answer_cache.lookup(st.session_state.user_profile, question)
+        from_cache = ai_response is not None
+        if similarity is not None:
+            REGISTRY.observe("coachbot_answer_cache_similarity", similarity, buckets=SIMILARITY_BUCKETS)
+        outcome = "skipped" if similarity is None else "hit" if from_cache else "miss"
+        REGISTRY.inc("coachbot_answer_cache_lookups_total", {"outcome": outcome})
+        
+        if from_cache:
+            st.toast(f"⚡ Answered from similar questions ({similarity:.0%} match)")
+        elif STREAM_RESPONSES:
+            context = memory.build_prompt(question)
+            with chat_container, call_kind("chat"):
+                st.markdown(bubble_html("user", question), unsafe_allow_html=True)
+                ai_response = stream_to_placeholder(context, st.empty(),
+                                                    render=lambda text: bubble_html("assistant", text),
+                                                    timeout=CHAT_DEADLINE_SECONDS)
+        else:
+            context = memory.build_prompt(question)
+            with st.spinner("🏋️ CoachBot is thinking..."), call_kind("chat"):
+                ai_response = backend.generate(context, timeout=CHAT_DEADLINE_SECONDS)
+        
+        if not ai_response:
+            raise Exception("No response from AI")
+        if not from_cache:
+            answer_cache.store(st.session_state.user_profile, question, ai_response)
+        
+        memory.add_exchange(question, ai_response)
+        st.session_state.chat_history.append({"role": "assistant", "content": ai_response})
+        get_store().append_chat(st.session_state.athlete_id, "user", question)
+        get_store().append_chat(st.session_state.athlete_id, "assistant", ai_response)
+        archive_old_messages()
+        st.success("✅ Response generated!")
+        rerun_fragment()
+        
+    except BackendUnavailable as e:
+        st.session_state.chat_history.pop()
+        st.warning(f"⏳ **CoachBot is busy right now.** {str(e)}")
+    except Exception as e:
+        st.error(f"❌ **AI Error:** {str(e)}")
+        st.error("There was a problem generating the response.")
+        st.info(f"Error type: {type(e).__name__}")
+        
+        # Remove the failed user message
+        st.session_state.chat_history.pop()
+        st.warning("Please try again or check your API configuration.")
+
 def ai_coach_page():
     st.markdown('<div class="main-header"><h1>💬 AI Coach Chat</h1></div>', unsafe_allow_html=True)
     
     # Check if API is configured
-    if not model:
+    if not backend:
         st.error("❌ **AI Coach Not Available**")
         st.error("This app requires a valid Google Generative AI API key to function.")
         st.error("Please configure your GEMINI_API_KEY in Streamlit secrets.")
@@ -961,6 +1518,12 @@ def ai_coach_page():
         """)
         return
     
+    # The transcript, input and quick questions rerun on their own
+    chat_panel()
+
+@timed_fragment("chat_panel")
+def chat_panel():
+    """AI Coach transcript, question box and quick questions"""
     # Chat History Display
     chat_container = st.container()
     
@@ -979,19 +1542,18 @@ def ai_coach_page():
             **How can I help you today?**
             """)
         else:
-            for message in st.session_state.chat_history:
-                if message['role'] == 'user':
-                    st.markdown(f"""
-                    <div style="background: #667eea; color: white; padding: 15px; border-radius: 10px; margin: 10px 0;">
-                        <strong>You:</strong> {message['content']}
-                    </div>
-                    """, unsafe_allow_html=True)
-                else:
-                    st.markdown(f"""
-                    <div style="background: white; padding: 15px; border-radius: 10px; margin: 10px 0; border-left: 4px solid #667eea;">
-                        <strong>🏋️ CoachBot:</strong> {message['content']}
-                    </div>
-                    """, unsafe_allow_html=True)
+            total = len(st.session_state.chat_history) + st.session_state.chat_archived
+            messages = visible_messages()
+            if len(messages) < total:
+                col1, col2 = st.columns([3, 1])
+                with col1:
+                    st.caption(f"💬 Showing the latest {len(messages)} of {total} messages")
+                with col2:
+                    st.button("⬆️ Load older", key="chat_load_older", use_container_width=True, on_click=load_older_messages)
+            # Bubbles are escaped and cached per message, and sent as a single element
+            st.markdown(window_html(messages), unsafe_allow_html=True)
+            if messages and messages[-1]["role"] == "assistant":
+                listen_button(messages[-1]["content"], key="chat_latest")
     
     st.markdown("---")
     
@@ -999,57 +1561,16 @@ def ai_coach_page():
     user_question = st.text_area("Ask your question:", 
         placeholder="e.g., How can I improve my sprint speed?", height=100)
     
+    send_clicked = False
     col1, col2 = st.columns([4, 1])
     with col2:
-        if st.button("Send 📤", use_container_width=True):
-            if user_question:
-                # Add user message
-                st.session_state.chat_history.append({"role": "user", "content": user_question})
-                
-                # Create enhanced context
-                user_profile = st.session_state.user_profile if st.session_state.user_profile else 'New user'
-                context = f"""
-                You are a friendly, knowledgeable, and encouraging youth sports coach and fitness expert.
-                
-                USER PROFILE: {user_profile}
-                
-                USER'S QUESTION: {user_question}
-                
-                INSTRUCTIONS:
-                1. Provide helpful, accurate, and age-appropriate advice
-                2. Be encouraging and motivating
-                3. Use emojis to make it engaging
-                4. Keep responses comprehensive but not too long
-                5. If relevant, reference their profile information (sport, position, goals, etc.)
-                6. Provide actionable and practical tips
-                7. Use proper formatting with bullet points and headers where appropriate
-                
-                Now, answer the user's question thoroughly and helpfully:
-                """
-                
-                try:
-                    with st.spinner("🏋️ CoachBot is thinking..."):
-                        response = model.generate_content(context)
-                        
-                        if not response or not response.text:
-                            raise Exception("No response from AI")
-                        
-                        ai_response = response.text
-                    
-                    st.session_state.chat_history.append({"role": "assistant", "content": ai_response})
-                    st.success("✅ Response generated!")
-                    st.rerun()
-                    
-                except Exception as e:
-                    st.error(f"❌ **AI Error:** {str(e)}")
-                    st.error("There was a problem generating the response.")
-                    st.info(f"Error type: {type(e).__name__}")
-                    
-                    # Remove the failed user message
-                    st.session_state.chat_history.pop()
-                    st.warning("Please try again or check your API configuration.")
-            else:
-                st.warning("Please enter a question before sending.")
+        send_clicked = st.button("Send 📤", use_container_width=True)
+    
+    if send_clicked:
+        if user_question:
+            generate_coach_reply(user_question, chat_container)
+        else:
+            st.warning("Please enter a question before sending.")
     
     # Quick Questions
     st.markdown("---")
@@ -1063,42 +1584,250 @@ def ai_coach_page():
         "How do I stay motivated to train?"
     ]
     
+    selected_question = None
     cols = st.columns(5)
     for i, question in enumerate(quick_questions):
         with cols[i]:
             if st.button(question, key=f"quick_{i}", use_container_width=True):
-                st.session_state.chat_history.append({"role": "user", "content": question})
-                
-                user_profile = st.session_state.user_profile if st.session_state.user_profile else 'New user'
-                context = f"""
-                You are a friendly youth sports coach.
-                Answer this question comprehensively: {question}
-                
-                User Profile: {user_profile}
-                
-                Be encouraging, practical, and age-appropriate. Use emojis.
-                """
-                
-                try:
-                    with st.spinner("🏋️ CoachBot is thinking..."):
-                        response = model.generate_content(context)
-                        
-                        if not response or not response.text:
-                            raise Exception("No response from AI")
-                        
-                        ai_response = response.text
-                    
-                    st.session_state.chat_history.append({"role": "assistant", "content": ai_response})
-                    st.success("✅ Response generated!")
-                    st.rerun()
-                    
-                except Exception as e:
-                    st.error(f"❌ **AI Error:** {str(e)}")
-                    st.session_state.chat_history.pop()
-                    st.warning("Please try again.")
+                selected_question = question
+    
+    answer_stats = get_answer_cache().stats()
+    if answer_stats['hits'] + answer_stats['misses']:
+        st.caption(f"⚡ Answer cache: {answer_stats['hit_rate']:.0%} of questions answered instantly "
+                   f"({answer_stats['hits']} of {answer_stats['hits'] + answer_stats['misses']})")
+    
+    if selected_question:
+        generate_coach_reply(selected_question, chat_container)
+
+@st.cache_data(show_spinner=False)
+def compute_roster_upload(file_bytes, file_name):
+    """Vectorized BMI/nutrition results for an uploaded roster, cached per file"""
+    from roster_engine import compute_roster_file
+    return compute_roster_file(BytesIO(file_bytes), file_name)
+
+def team_roster_page():
+    try:
+        st.markdown('<div class="main-header"><h1>👥 Team Roster Nutrition</h1></div>', unsafe_allow_html=True)
+        
+        st.info("""
+        📋 **Upload your whole squad at once** (CSV or Excel, one athlete per row).
+        
+        **Columns:** `weight` (kg), `height` (cm), `age`, plus optional `name`, `gender` (Male/Female)
+        and `frequency` (e.g. "3 days/week"). Missing values use the same defaults as the Nutrition page.
+        """)
+        
+        uploaded = st.file_uploader("Upload roster", type=["csv", "xlsx"])
+        if not uploaded:
+            return
+        
+        started = time.perf_counter()
+        results = compute_roster_upload(uploaded.getvalue(), uploaded.name)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        
+        if results.empty:
+            st.warning("⚠️ The uploaded file has no athletes.")
+            return
+        
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("👥 Athletes", f"{len(results):,}")
+        with col2:
+            st.metric("⚖️ Average BMI", f"{results['bmi'].mean():.1f}")
+        with col3:
+            st.metric("⚡ Avg Daily Calories", f"{int(results['tdee'].mean())} cal")
+        with col4:
+            st.metric("⏱️ Computed In", f"{elapsed_ms:.0f} ms")
+        
+        st.subheader("📊 BMI Categories")
+        st.dataframe(results['bmi_category'].value_counts().rename_axis('Category').reset_index(name='Athletes'),
+                     use_container_width=True, hide_index=True)
+        
+        st.subheader("🍽️ Nutrition Targets")
+        st.dataframe(results, use_container_width=True, hide_index=True)
+        
+        st.download_button(
+            label="⬇️ Download Results (CSV)",
+            data=results.to_csv(index=False).encode("utf-8"),
+            file_name="CoachBot_Roster_Nutrition.csv",
+            mime="text/csv"
+        )
+    except Exception as e:
+        st.error(f"Error in team roster page: {str(e)}")
+        return
 
 # ---------------- MAIN APP LOGIC ----------------
+def format_seconds(value):
+    """Human-friendly duration for metric tables"""
+    if value is None:
+        return "N/A"
+    return f"{value * 1000:.0f} ms" if value < 1 else f"{value:.2f} s"
+
+def admin_page():
+    st.markdown('<div class="main-header"><h1>🛠️ Admin & Metrics</h1></div>', unsafe_allow_html=True)
+    st.caption("Process-wide numbers since the app started; use them to capacity-plan the deployment.")
+    
+    import pandas as pd
+    
+    # Process resources
+    st.subheader("🖥️ Process")
+    process = REGISTRY.process_stats()
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("💾 Resident Memory", f"{process['rss_bytes'] / 1024 ** 2:.0f} MB")
+    with col2:
+        st.metric("⚙️ CPU", f"{process['cpu_percent']:.0f}%")
+    with col3:
+        st.metric("🧵 Threads", process['threads'])
+    with col4:
+        st.metric("⏱️ Uptime", f"{process['uptime_seconds'] / 60:.0f} min")
+    
+    sessions = REGISTRY.histogram_summary("coachbot_session_state_bytes")
+    if sessions:
+        st.caption(f"📦 Session state: median ~{sessions[0]['p50'] / 1024:.0f} KB, "
+                   f"p95 ~{sessions[0]['p95'] / 1024:.0f} KB (this session: {session_state_bytes(st.session_state) / 1024:.0f} KB, "
+                   f"budget {SESSION_MEMORY_BUDGET / 1024:.0f} KB)")
+    spill = get_spill_store().stats()
+    st.caption(f"🗄️ Spilled to disk: {spill['spilled']} values ({spill['spilled_bytes'] / 1024:.0f} KB compressed) · "
+               f"{spill['rehydrated']} read back · {spill['files']} files, {spill['disk_bytes'] / 1024:.0f} KB on disk")
+    bubbles = bubble_cache_stats()
+    st.caption(f"💬 Chat bubble cache: {bubbles['entries']} messages, {bubbles['bytes'] / 1024:.0f} KB "
+               f"(limit {BUBBLE_CACHE_BYTES / 1024:.0f} KB, shared by all sessions)")
+    
+    st.markdown("---")
+    
+    # Model calls
+    st.subheader("🤖 Model Calls")
+    calls = REGISTRY.histogram_summary("coachbot_llm_call_seconds")
+    if calls:
+        calls_df = pd.DataFrame(calls)
+        for column in ("mean", "p50", "p95", "p99"):
+            calls_df[column] = calls_df[column].map(format_seconds)
+        st.dataframe(calls_df, use_container_width=True, hide_index=True)
+    else:
+        st.info("No model calls yet.")
+    
+    tokens = REGISTRY.counters("coachbot_llm_tokens_total")
+    if tokens:
+        token_rows = {}
+        for key, value in tokens.items():
+            labels = dict(key)
+            token_rows.setdefault(labels["kind"], {"kind": labels["kind"], "input": 0, "output": 0})[labels["direction"]] = value
+        st.markdown("**🔢 Token Usage**")
+        st.dataframe(pd.DataFrame(list(token_rows.values())), use_container_width=True, hide_index=True)
+    
+    outcomes = REGISTRY.counters("coachbot_llm_calls_total")
+    failed = sum(value for key, value in outcomes.items() if dict(key)["outcome"] != "ok")
+    total = sum(outcomes.values())
+    if total:
+        st.caption(f"❌ Call error rate: {failed / total:.1%} ({failed} of {total})")
+    
+    st.markdown("---")
+    
+    # Plans by type
+    st.subheader("📋 Plans by Type")
+    plan_counts = REGISTRY.counters("coachbot_plan_requests_total")
+    if plan_counts:
+        latency = {row["plan_type"]: row for row in REGISTRY.histogram_summary("coachbot_plan_seconds")}
+        plan_rows = {}
+        for key, value in plan_counts.items():
+            labels = dict(key)
+            row = plan_rows.setdefault(labels["plan_type"], {"plan_type": labels["plan_type"], "ok": 0, "cached": 0, "error": 0, "cancelled": 0})
+            row[labels["outcome"]] = value
+        for plan_type, row in plan_rows.items():
+            attempted = row["ok"] + row["error"]
+            row["error_rate"] = f"{row['error'] / attempted:.1%}" if attempted else "N/A"
+            row["p50"] = format_seconds(latency.get(plan_type, {}).get("p50"))
+            row["p95"] = format_seconds(latency.get(plan_type, {}).get("p95"))
+        st.dataframe(pd.DataFrame(list(plan_rows.values())), use_container_width=True, hide_index=True)
+    else:
+        st.info("No plans requested yet.")
+    
+    cache_stats = get_plan_cache().stats()
+    flight_stats = get_single_flight().stats()
+    resilience = backend.stats() if backend else {"breaker": "N/A", "retries": 0}
+    st.caption(f"⚡ Plan cache hit rate {cache_stats['hit_rate']:.0%} · {flight_stats['coalesced']} shared generations · "
+               f"{resilience['retries']} retries · breaker {resilience['breaker']}")
+    job_stats = get_job_queue().stats()
+    queue_wait = REGISTRY.histogram_summary("coachbot_plan_queue_seconds")
+    wait_p95 = max((row["p95"] for row in queue_wait), default=None)
+    st.caption(f"⏳ Plan jobs: {job_stats['running']}/{job_stats['workers']} workers busy · {job_stats['queued']} waiting "
+               f"(limit {job_stats['max_pending']}) · {job_stats['cancelled']} cancelled · queue wait p95 {format_seconds(wait_p95)}")
+    
+    # Prompt budgets
+    st.markdown("**📝 Prompt Budgets**")
+    prompt_tokens = {row["plan_type"]: row for row in REGISTRY.histogram_summary("coachbot_prompt_tokens")}
+    plan_words = {row["plan_type"]: row for row in REGISTRY.histogram_summary("coachbot_plan_output_words")}
+    over_budget = {dict(key)["plan_type"]: value for key, value in REGISTRY.counters("coachbot_prompt_over_budget_total").items()}
+    budget_rows = []
+    for plan_type, template in TEMPLATES.items():
+        sample = render_prompt(plan_type, st.session_state.user_profile)
+        words_p50 = plan_words.get(plan_type, {}).get("p50")
+        budget_rows.append({
+            "template": f"{plan_type} ({template.version})",
+            "est_input_tokens": sample.tokens,
+            "est_token_budget": template.input_token_budget,
+            "over_budget": over_budget.get(plan_type, 0),
+            "est_prompt_p95": round(prompt_tokens[plan_type]["p95"]) if plan_type in prompt_tokens else None,
+            "output_words_p50": round(words_p50) if words_p50 is not None else None,
+            "word_budget": template.word_budget,
+        })
+    st.dataframe(pd.DataFrame(budget_rows), use_container_width=True, hide_index=True)
+    st.caption("est_input_tokens is this session's profile rendered now; the p50/p95 columns cover every generation. "
+               "Token figures are estimates (~4 characters per token), not the model's own count.")
+    
+    speech_stats = get_speech().stats()
+    st.caption(f"🔊 Audio ({speech_stats['backend']}): {speech_stats['synthesized']} chunks synthesized · "
+               f"{speech_stats['cache_hits']} served from cache · {speech_stats['errors']} errors")
+    
+    st.markdown("---")
+    
+    # AI Coach answer cache
+    st.subheader("💬 AI Coach Answer Cache")
+    answer_cache = get_answer_cache()
+    answer_stats = answer_cache.stats()
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("🎯 Hit Rate", f"{answer_stats['hit_rate']:.0%}")
+    with col2:
+        st.metric("💸 Model Calls Saved", answer_stats['hits'])
+    with col3:
+        st.metric("🗂️ Cached Answers", f"{answer_stats['entries']} in {answer_stats['buckets']} buckets")
+    # Read-only: the Admin page has no login, and the threshold applies to every session in the process
+    st.caption(f"🎚️ Similarity threshold: {answer_cache.threshold:.2f} (set with `COACHBOT_ANSWER_CACHE_THRESHOLD`; "
+               "lower saves more quota but risks answering a different question)")
+    similarity = REGISTRY.histogram_summary("coachbot_answer_cache_similarity")
+    if similarity:
+        st.caption(f"Best-match similarity: median {similarity[0]['p50']:.2f}, p95 {similarity[0]['p95']:.2f}")
+    
+    st.markdown("---")
+    
+    # Page reruns
+    st.subheader("📄 Page Reruns")
+    for metric, caption in (("coachbot_page_render_seconds", "Full script runs by page"),
+                            ("coachbot_fragment_render_seconds", "Fragment runs by region (includes runs inside a full page)")):
+        rows = REGISTRY.histogram_summary(metric)
+        if rows:
+            rows_df = pd.DataFrame(rows)
+            for column in ("mean", "p50", "p95", "p99"):
+                rows_df[column] = rows_df[column].map(format_seconds)
+            st.caption(caption)
+            st.dataframe(rows_df, use_container_width=True, hide_index=True)
+    
+    st.markdown("---")
+    
+    # Prometheus export
+    st.subheader("📤 Prometheus Export")
+    exporter = get_metrics_exporter()
+    written = datetime.fromtimestamp(exporter.last_written).strftime("%H:%M:%S") if exporter.last_written else "not yet"
+    st.caption(f"Written to `{exporter.path}` every {exporter.interval:.0f}s (last: {written})")
+    metrics_text = REGISTRY.render_prometheus()
+    st.download_button("⬇️ Download metrics.prom", metrics_text, file_name="metrics.prom", mime="text/plain")
+    with st.expander("👀 View raw metrics"):
+        st.code(metrics_text, language="text")
+
 def main():
+    # Rendered from main() because the sidebar's job panel needs the plan job helpers defined below it
+    sidebar_navigation()
     try:
         # Display the current page
         if st.session_state.page == 'Dashboard':
@@ -1113,9 +1842,18 @@ def main():
             nutrition_page()
         elif st.session_state.page == 'AI Coach':
             ai_coach_page()
+        elif st.session_state.page == 'Team Roster':
+            team_roster_page()
+        elif st.session_state.page == 'Admin':
+            admin_page()
     except Exception as e:
         st.error(f"An error occurred: {str(e)}")
         st.info("Please refresh the page and try again.")
+    finally:
+        # Also runs when a page ends its run early with st.rerun()
+        REGISTRY.observe("coachbot_page_render_seconds", time.perf_counter() - RERUN_STARTED,
+                         {"page": st.session_state.page}, RENDER_BUCKETS)
+        REGISTRY.observe("coachbot_session_state_bytes", enforce_memory_budget(), buckets=SIZE_BUCKETS)
 
 if __name__ == "__main__":
     main()
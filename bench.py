@@ -0,0 +1,270 @@
+"""Benchmarks for CoachBot hot paths
+
+Times prompt building, PDF rendering, nutrition math, full page reruns (via
+Streamlit's AppTest against the offline fake backend) and module import / cold start
+cost, and writes the results as JSON.
+
+Usage:
+    python bench.py --out bench_results.json
+    python bench.py --baseline bench_results.json --tolerance 0.25   # exit 1 on regressions
+    python bench.py --suite imports                                   # import-time report only
+"""
+import argparse
+import atexit
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# Page reruns must never reach a real model
+os.environ["COACHBOT_LLM_BACKEND"] = "fake"
+os.environ.setdefault("COACHBOT_FAKE_LATENCY", "0")
+os.environ.setdefault("COACHBOT_FAKE_FIRST_TOKEN", "0")
+# ...nor real athlete data: page runs write to a throwaway database and cache directory
+SCRATCH_DIR = tempfile.mkdtemp(prefix="coachbot-bench-")
+os.environ["COACHBOT_DB_PATH"] = os.path.join(SCRATCH_DIR, "bench.db")
+os.environ["COACHBOT_CACHE_DIR"] = os.path.join(SCRATCH_DIR, "cache")
+atexit.register(shutil.rmtree, SCRATCH_DIR, ignore_errors=True)
+
+from coachbot import PLAN_LABELS, compute_nutrition, create_training_prompt
+from prompts import render_prompt
+from pdf_export import render_pdf
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(ROOT, "app.py")
+
+# Our modules, timed in a fresh interpreter each
+APP_MODULES = ["coachbot", "llm_backend", "pdf_export", "plan_cache", "storage", "metrics", "chat_memory",
+               "roster_engine"]
+# Libraries that should only load on the code paths that need them
+HEAVY_MODULES = ["pandas", "numpy", "reportlab", "plotly", "gtts", "google.generativeai"]
+
+COLD_START_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+# Streamlit pulls some of these in itself (e.g. plotly for its chart theme); only count what the app adds
+preloaded = {m for m in sys.argv[2:] if m in sys.modules}
+at = AppTest.from_file(sys.argv[1], default_timeout=60)
+at.run()
+print(json.dumps({"ms": (time.perf_counter() - started) * 1000,
+                  "heavy": [m for m in sys.argv[2:] if m in sys.modules and m not in preloaded]}))
+"""
+
+SAMPLE_PROFILE = {
+    "sport": "Football", "position": "Midfielder", "age": 15, "weight": 58.0, "height": 168,
+    "bmi": 20.5, "bmi_category": "Normal Weight", "experience": "1-2 years", "fitness_level": "Intermediate",
+    "frequency": "4 days/week", "duration": "60 minutes", "goal": "Increase endurance", "intensity": "High",
+    "injury": "Mild ankle sprain last season", "limitations": "None", "diet": "Balanced", "allergies": "Peanuts",
+}
+
+PAGES = ["Dashboard", "BMI Calculator", "Profile Setup", "Training Plan", "Nutrition", "AI Coach"]
+# Chat lengths for the AI Coach page; its rerun time should not grow with the conversation
+CHAT_LENGTHS = [20, 200]
+
+
+def sample_plan(sections, bullets, tables=0, table_rows=8):
+    """Synthetic markdown plan shaped like real model output"""
+    lines = ["# 🏆 Your Personalized Plan"]
+    for s in range(sections):
+        lines.append(f"## Day {s + 1}: **Focus** block")
+        for b in range(bullets):
+            lines.append(f"- **Exercise {b + 1}:** 3 sets x 12 reps, *rest 60s*, keep your core tight")
+        for t in range(tables):
+            lines.append("| Exercise | Sets | Reps | Rest |")
+            lines.append("|----------|------|------|------|")
+            for r in range(table_rows):
+                lines.append(f"| Drill {r + 1} | 3 | 10 | 45s |")
+    return "\n".join(lines)
+
+
+PLANS = {
+    "small": sample_plan(sections=2, bullets=4),
+    "large": sample_plan(sections=30, bullets=15),
+    "tables": sample_plan(sections=7, bullets=2, tables=3),
+}
+
+
+def time_it(fn, repeat, warmup=1):
+    """Run fn repeatedly and return timing stats in milliseconds"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return summarize(samples)
+
+
+def summarize(samples):
+    """Timing stats for a list of millisecond samples"""
+    samples = sorted(samples)
+    return {
+        "repeat": len(samples),
+        "min_ms": round(samples[0], 4),
+        "median_ms": round(statistics.median(samples), 4),
+        "mean_ms": round(statistics.fmean(samples), 4),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 4),
+    }
+
+
+def bench_prompts(repeat):
+    results = {
+        f"prompt.create_training_prompt[{plan_type}]": time_it(
+            lambda: create_training_prompt(SAMPLE_PROFILE, plan_type), repeat * 20)
+        for plan_type in PLAN_LABELS
+    }
+
+    print("📝 Prompt token report (sample profile)", file=sys.stderr)
+    for plan_type in PLAN_LABELS:
+        rendered = render_prompt(plan_type, SAMPLE_PROFILE)
+        print(f"   {plan_type:12s} {rendered.tokens:5d} est. tokens (budget {rendered.template.input_token_budget}, "
+              f"output ~{rendered.template.word_budget} words)", file=sys.stderr)
+    return results
+
+
+def bench_pdf(repeat):
+    return {
+        # render_pdf, not create_pdf: the latter serves repeats from its LRU and would time a dict lookup
+        f"pdf.render_pdf[{name}]": time_it(lambda: render_pdf(text, "workout", SAMPLE_PROFILE), repeat)
+        for name, text in PLANS.items()
+    }
+
+
+def bench_nutrition(repeat):
+    return {"nutrition.compute_nutrition": time_it(lambda: compute_nutrition(SAMPLE_PROFILE), repeat * 200)}
+
+
+def bench_pages(repeat):
+    from streamlit.testing.v1 import AppTest
+
+    cases = [(page, page, 20) for page in PAGES]
+    cases += [(f"AI Coach, {n} messages", "AI Coach", n) for n in CHAT_LENGTHS if n != 20]
+
+    results = {}
+    for name, page, messages in cases:
+        at = AppTest.from_file(APP_PATH, default_timeout=60)
+        at.session_state["user_profile"] = dict(SAMPLE_PROFILE)
+        at.session_state["generated_plan"] = PLANS["tables"]
+        at.session_state["plan_type"] = "workout"
+        at.session_state["chat_history"] = [
+            {"role": "user" if i % 2 == 0 else "assistant", "content": f"Message {i} about training load"}
+            for i in range(messages)
+        ]
+        at.session_state["page"] = page
+        at.run()
+        if at.exception:
+            raise RuntimeError(f"{name} page raised: {at.exception[0].message}")
+        results[f"page.rerun[{name}]"] = time_it(at.run, repeat)
+    return results
+
+
+def import_time_ms(module):
+    """Cumulative import time of module in a fresh interpreter, from python -X importtime"""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    ).stderr
+    for line in reversed(stderr.splitlines()):
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == module:
+            return int(parts[1]) / 1000
+    raise RuntimeError(f"No importtime entry for {module}")
+
+
+def cold_start():
+    """First Dashboard run in a fresh interpreter: (milliseconds, heavy modules the app loaded)"""
+    stdout = subprocess.run(
+        [sys.executable, "-c", COLD_START_SCRIPT, APP_PATH, *HEAVY_MODULES],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    ).stdout
+    result = json.loads(stdout.strip().splitlines()[-1])
+    return result["ms"], result["heavy"]
+
+
+def bench_imports(repeat):
+    # Every sample is a new interpreter, so keep the sample count small
+    samples = max(3, repeat // 3)
+    results = {
+        f"import[{module}]": summarize([import_time_ms(module) for _ in range(samples)])
+        for module in APP_MODULES
+    }
+    runs = [cold_start() for _ in range(samples)]
+    results["import.cold_start[Dashboard]"] = summarize([ms for ms, _ in runs])
+
+    print("📦 Import-time report", file=sys.stderr)
+    for name, stats in sorted(results.items(), key=lambda item: -item[1]["median_ms"]):
+        print(f"   {name:40s} {stats['median_ms']:10.1f} ms", file=sys.stderr)
+    loaded = runs[-1][1]
+    print(f"   heavy modules loaded by a cold Dashboard run: {', '.join(loaded) or 'none'}", file=sys.stderr)
+    return results
+
+
+SUITES = {
+    "prompts": bench_prompts, "pdf": bench_pdf, "nutrition": bench_nutrition, "pages": bench_pages,
+    "imports": bench_imports,
+}
+
+
+def compare(results, baseline, tolerance):
+    """Return (name, baseline_ms, current_ms, ratio) for medians slower than baseline by > tolerance"""
+    regressions = []
+    for name, stats in results.items():
+        previous = baseline.get("results", {}).get(name)
+        if not previous or not previous["median_ms"]:
+            continue
+        ratio = stats["median_ms"] / previous["median_ms"]
+        if ratio > 1 + tolerance:
+            regressions.append((name, previous["median_ms"], stats["median_ms"], ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="CoachBot AI benchmark suite")
+    parser.add_argument("--out", default="bench_results.json", help="Where to write JSON results")
+    parser.add_argument("--baseline", help="Previous results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed median slowdown (0.25 = 25%%)")
+    parser.add_argument("--repeat", type=int, default=10, help="Base repetitions per benchmark")
+    parser.add_argument("--suite", action="append", choices=sorted(SUITES), help="Run only these suites")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for suite in args.suite or SUITES:
+        print(f"⏱️  {suite}...", file=sys.stderr)
+        results.update(SUITES[suite](args.repeat))
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    for name, stats in results.items():
+        print(f"{name:45s} median {stats['median_ms']:10.3f} ms   p95 {stats['p95_ms']:10.3f} ms")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for name, before, after, ratio in regressions:
+            print(f"❌ REGRESSION {name}: {before:.3f} ms -> {after:.3f} ms ({ratio:.2f}x)")
+        if regressions:
+            return 1
+        print("✅ No regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""Token-budgeted conversation memory for the AI Coach"""
+import hashlib
+import json
+
+from prompts import estimate_tokens
+
+# Profile fields worth sending to the coach, in the order they are encoded
+PROFILE_FIELDS = [
+    ("sport", "sport"), ("position", "position"), ("age", "age"), ("gender", "gender"),
+    ("weight", "kg"), ("height", "cm"), ("bmi", "bmi"), ("bmi_category", "bmi_cat"),
+    ("fitness_level", "level"), ("experience", "exp"), ("frequency", "freq"),
+    ("duration", "session"), ("goal", "goal"), ("intensity", "intensity"),
+    ("injury", "injury"), ("limitations", "limits"), ("diet", "diet"), ("allergies", "allergies"),
+]
+
+COACH_INSTRUCTIONS = """You are a friendly, knowledgeable, and encouraging youth sports coach and fitness expert.
+Give accurate, age-appropriate, actionable advice. Be motivating, use emojis, bullet points and headers where useful,
+reference the athlete's profile when relevant and keep answers comprehensive but not too long."""
+
+
+def encode_profile(profile):
+    """Compact one-line encoding of the filled-in profile fields"""
+    if not profile:
+        return "new user, no profile yet"
+    parts = []
+    for field, label in PROFILE_FIELDS:
+        value = profile.get(field)
+        if value not in (None, ""):
+            parts.append(f"{label}={' '.join(str(value).split())}")
+    return "; ".join(parts)
+
+
+class ConversationMemory:
+    """Keeps recent turns verbatim and folds older ones into a rolling summary
+
+    Turns are folded only once there are twice recent_turns of them, and then back down to
+    recent_turns, so the summarize call runs every few exchanges rather than on every one.
+    """
+
+    def __init__(self, count_tokens, summarize, max_input_tokens=2000, recent_turns=6):
+        self.count_tokens = count_tokens
+        self.summarize = summarize
+        self.max_input_tokens = max_input_tokens
+        self.recent_turns = recent_turns
+        self.summary = ""
+        self.turns = []
+        self._profile_hash = None
+        self._profile_block = ""
+
+    def set_profile(self, profile):
+        """Re-encode the profile only when it has changed since the last turn"""
+        profile_hash = hashlib.sha256(json.dumps(profile or {}, sort_keys=True, default=str).encode()).hexdigest()
+        if profile_hash != self._profile_hash:
+            self._profile_hash = profile_hash
+            self._profile_block = encode_profile(profile)
+
+    def add_exchange(self, question, answer):
+        """Record a completed question/answer pair"""
+        self.turns.append({"role": "user", "content": question})
+        self.turns.append({"role": "assistant", "content": answer})
+
+    def clear(self):
+        self.summary = ""
+        self.turns = []
+
+    def resident_bytes(self):
+        """Approximate memory held: the summary, recent turns and encoded profile (for the session budget)"""
+        texts = [self.summary, self._profile_block] + [turn["content"] for turn in self.turns]
+        return sum(len(text.encode("utf-8")) for text in texts) + 32 * len(self.turns)
+
+    def _render(self, question, turns=None):
+        turns = self.turns if turns is None else turns
+        sections = [COACH_INSTRUCTIONS, f"ATHLETE: {self._profile_block}"]
+        if self.summary:
+            sections.append(f"EARLIER IN THIS CHAT (summary): {self.summary}")
+        if turns:
+            lines = []
+            for turn in turns:
+                speaker = "Athlete" if turn["role"] == "user" else "Coach"
+                lines.append(f"{speaker}: {turn['content']}")
+            sections.append("RECENT MESSAGES:\n" + "\n".join(lines))
+        sections.append(f"Athlete: {question}\nCoach:")
+        return "\n\n".join(sections)
+
+    def _count(self, text):
+        try:
+            return self.count_tokens(text)
+        except Exception:
+            return estimate_tokens(text)
+
+    def _fold(self, count):
+        """Move the oldest `count` turns into the rolling summary"""
+        folded, self.turns = self.turns[:count], self.turns[count:]
+        try:
+            self.summary = self.summarize(self.summary, folded)
+        except Exception:
+            # Summarization is an optimisation; fall back to clipped excerpts
+            excerpts = [f"{t['role']}: {t['content'][:160]}" for t in folded]
+            self.summary = (self.summary + " " + " | ".join(excerpts)).strip()
+
+    def build_prompt(self, question):
+        """Prompt for the next turn, kept within max_input_tokens
+
+        count_tokens (a network call for some backends) runs once per turn; fitting the budget
+        works from estimate_tokens scaled to that count.
+        """
+        if len(self.turns) > 2 * self.recent_turns:
+            # Fold in pairs so the recent window always starts with an athlete turn
+            self._fold(len(self.turns) - self.recent_turns)
+
+        prompt = self._render(question)
+        tokens = self._count(prompt)
+        scale = max(tokens, 1) / estimate_tokens(prompt)
+        if tokens > self.max_input_tokens and self.turns:
+            # Fold just enough of the oldest pairs to fit, in a single summarize call
+            drop = 0
+            while drop < len(self.turns):
+                drop = min(drop + 2, len(self.turns))
+                if estimate_tokens(self._render(question, self.turns[drop:])) * scale <= self.max_input_tokens:
+                    break
+            self._fold(drop)
+            prompt = self._render(question)
+            tokens = estimate_tokens(prompt) * scale
+
+        if tokens > self.max_input_tokens and self.summary:
+            # Last resort: clip the summary to whatever room is left (~4 characters per estimated token)
+            overflow_chars = int((tokens - self.max_input_tokens) / scale * 4) + 1
+            self.summary = self.summary[:max(0, len(self.summary) - overflow_chars)]
+            prompt = self._render(question)
+        return prompt
@@ -0,0 +1,65 @@
+"""AI Coach chat bubbles: escaped HTML, cached per message so long chats don't rebuild it every rerun"""
+import hashlib
+import html
+import os
+import re
+import threading
+from collections import OrderedDict
+
+_BOLD = re.compile(r"\*\*(.+?)\*\*")
+
+# Bounded by size, not count: a few thousand long answers would otherwise pin tens of MB
+BUBBLE_CACHE_BYTES = int(os.environ.get("COACHBOT_BUBBLE_CACHE_KB", "4096")) * 1024
+
+_bubble_cache = OrderedDict()
+_bubble_cache_bytes = 0
+_lock = threading.Lock()
+
+BUBBLES = {
+    "user": ('<div style="background: #667eea; color: white; padding: 15px; border-radius: 10px; margin: 10px 0;">'
+             '<strong>You:</strong> {content}</div>'),
+    "assistant": ('<div style="background: white; padding: 15px; border-radius: 10px; margin: 10px 0; '
+                  'border-left: 4px solid #667eea;"><strong>🏋️ CoachBot:</strong> {content}</div>'),
+}
+
+
+def sanitize(content):
+    """Escape message text for HTML, keeping **bold** and line breaks"""
+    text = _BOLD.sub(r"<strong>\1</strong>", html.escape(content))
+    # One line of HTML: a blank line would end Streamlit's HTML block mid-bubble
+    return text.replace("\r\n", "\n").replace("\n", "<br>")
+
+
+def bubble_html(role, content):
+    """HTML chat bubble for one message (uncached; used while a reply is streaming)"""
+    return BUBBLES.get(role, BUBBLES["assistant"]).format(content=sanitize(content))
+
+
+def cached_bubble_html(role, content):
+    """bubble_html for finished messages; process-wide LRU keyed by a digest of the message"""
+    global _bubble_cache_bytes
+    key = (role, hashlib.sha256(content.encode("utf-8")).digest())
+    with _lock:
+        bubble = _bubble_cache.get(key)
+        if bubble is not None:
+            _bubble_cache.move_to_end(key)
+            return bubble
+    bubble = bubble_html(role, content)
+    with _lock:
+        if key not in _bubble_cache:
+            _bubble_cache[key] = bubble
+            _bubble_cache_bytes += len(bubble)
+            while _bubble_cache_bytes > BUBBLE_CACHE_BYTES and _bubble_cache:
+                _, evicted = _bubble_cache.popitem(last=False)
+                _bubble_cache_bytes -= len(evicted)
+    return bubble
+
+
+def bubble_cache_stats():
+    with _lock:
+        return {"entries": len(_bubble_cache), "bytes": _bubble_cache_bytes}
+
+
+def window_html(messages):
+    """One HTML block for a window of messages, so the page sends one element instead of one per message"""
+    return "".join(cached_bubble_html(message["role"], message["content"]) for message in messages)
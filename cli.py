@@ -0,0 +1,237 @@
+"""Headless batch generation of CoachBot plans for a whole roster
+
+Usage:
+    python cli.py generate roster.csv --out coachbot_output --concurrency 4 --rate-limit 30
+"""
+import json
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import click
+import pandas as pd
+from tqdm import tqdm
+
+from coachbot import (
+    CACHE_DIR, PLAN_LABELS, calculate_bmi, create_training_prompt, get_bmi_category, plan_cache_key, plan_schema,
+    render_plan_response
+)
+from llm_backend import create_backend
+from resilience import BackendUnavailable, ResilientBackend
+from pdf_export import create_pdf
+from plan_cache import PlanCache
+
+REQUIRED_COLUMNS = ["age", "weight", "height", "sport", "position"]
+NUMERIC_COLUMNS = ["age", "weight", "height"]
+
+
+class RateLimiter:
+    """Spaces out call start times so at most `per_minute` begin in any minute"""
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def slugify(text):
+    return re.sub(r"[^A-Za-z0-9]+", "_", str(text)).strip("_") or "athlete"
+
+
+def read_roster(path):
+    """Load a CSV or Excel roster with normalized column names"""
+    if path.lower().endswith((".xlsx", ".xlsm", ".xls")):
+        roster = pd.read_excel(path, engine="openpyxl")
+    else:
+        roster = pd.read_csv(path)
+    roster.columns = [re.sub(r"\s+", "_", str(c).strip().lower()) for c in roster.columns]
+    missing = [c for c in REQUIRED_COLUMNS if c not in roster.columns]
+    if missing:
+        raise click.UsageError(f"Roster is missing required columns: {', '.join(missing)}")
+    return roster
+
+
+def roster_profiles(roster):
+    """Yield (athlete_id, profile) with BMI filled in, skipping rows with bad data
+
+    IDs name each athlete's output folder and checkpoint entries, so they must be unique once slugified:
+    a repeated athlete_id is an error, and athletes identified only by a shared name get a row suffix.
+    """
+    seen = {}
+
+    def id_key(athlete_id):
+        # Folder names are case-insensitive on macOS and Windows
+        return slugify(athlete_id).lower()
+
+    for index, row in roster.iterrows():
+        profile = {key: value for key, value in row.items() if not pd.isna(value)}
+        try:
+            for column in NUMERIC_COLUMNS:
+                profile[column] = float(profile[column])
+        except (KeyError, ValueError):
+            click.echo(f"⚠️  Skipping row {index + 2}: missing or non-numeric {column}", err=True)
+            continue
+        profile["age"] = int(profile["age"])
+        profile["bmi"] = calculate_bmi(profile["weight"], profile["height"])
+        profile["bmi_category"], _ = get_bmi_category(profile["bmi"])
+        explicit = "athlete_id" in profile
+        athlete_id = str(profile.get("athlete_id") or profile.get("name") or f"athlete_{index + 1}")
+        if id_key(athlete_id) in seen:
+            if explicit:
+                raise click.UsageError(
+                    f"Rows {seen[id_key(athlete_id)]} and {index + 2} share athlete_id {athlete_id!r}; "
+                    "athlete IDs must be unique"
+                )
+            unique_id = f"{athlete_id}_row{index + 2}"
+            click.echo(f"⚠️  Row {index + 2}: {athlete_id!r} is already used by row {seen[id_key(athlete_id)]}; "
+                       f"writing it as {unique_id!r} (add an athlete_id column to choose IDs)", err=True)
+            athlete_id = unique_id
+            if id_key(athlete_id) in seen:
+                raise click.UsageError(f"Row {index + 2}: athlete ID {athlete_id!r} is already in use")
+        seen[id_key(athlete_id)] = index + 2
+        yield athlete_id, profile
+
+
+def load_checkpoint(path):
+    """Return the (athlete_id, plan_type) pairs already completed in a previous run"""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A crash mid-write can leave a partial last line
+                continue
+            if record.get("status") == "ok":
+                done.add((record["athlete_id"], record["plan_type"]))
+    return done
+
+
+def append_checkpoint(f, record):
+    f.write(json.dumps(record) + "\n")
+    f.flush()
+    os.fsync(f.fileno())
+
+
+@click.group()
+def cli():
+    """CoachBot AI batch tools"""
+
+
+@cli.command()
+@click.argument("roster_path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--out", "out_dir", default="coachbot_output", show_default=True, help="Output directory.")
+@click.option("--plans", default=",".join(PLAN_LABELS), show_default=True, help="Comma-separated plan types.")
+@click.option("--concurrency", default=4, show_default=True, help="Maximum simultaneous model calls.")
+@click.option("--rate-limit", default=30, show_default=True, help="Maximum model calls started per minute (0 = unlimited).")
+@click.option("--checkpoint", "checkpoint_path", default=None, help="Checkpoint file (default: <out>/checkpoint.jsonl).")
+@click.option("--pdf/--no-pdf", "write_pdf", default=True, show_default=True, help="Also write a PDF per plan.")
+@click.option("--cache/--no-cache", "use_cache", default=True, show_default=True, help="Reuse plans from the shared plan cache.")
+@click.option("--backend", "backend_name", type=click.Choice(["gemini", "fake"]), default="gemini", show_default=True,
+              help="LLM backend; 'fake' returns canned plans offline (see COACHBOT_FAKE_* env vars).")
+@click.option("--max-outage", default=300, show_default=True,
+              help="Seconds to keep waiting for the AI service while its circuit breaker is open before failing a plan.")
+@click.option("--api-key", envvar="GEMINI_API_KEY", help="Gemini API key (default: $GEMINI_API_KEY).")
+def generate(roster_path, out_dir, plans, concurrency, rate_limit, checkpoint_path, write_pdf, use_cache,
+             backend_name, max_outage, api_key):
+    """Generate plans for every athlete in ROSTER_PATH (CSV or Excel)."""
+    plan_types = [p.strip() for p in plans.split(",") if p.strip()]
+    unknown = [p for p in plan_types if p not in PLAN_LABELS]
+    if unknown:
+        raise click.UsageError(f"Unknown plan type(s): {', '.join(unknown)}")
+    if backend_name == "gemini" and not api_key:
+        raise click.UsageError("No API key: pass --api-key or set GEMINI_API_KEY.")
+
+    # Retries with backoff share one circuit breaker, so a rate-limited provider sheds the whole batch's load
+    backend = ResilientBackend(create_backend(backend_name, api_key))
+    plan_cache = PlanCache(os.path.join(CACHE_DIR, "plans")) if use_cache else None
+    limiter = RateLimiter(rate_limit)
+
+    os.makedirs(out_dir, exist_ok=True)
+    checkpoint_path = checkpoint_path or os.path.join(out_dir, "checkpoint.jsonl")
+    done = load_checkpoint(checkpoint_path)
+
+    jobs = [
+        (athlete_id, profile, plan_type)
+        for athlete_id, profile in roster_profiles(read_roster(roster_path))
+        for plan_type in plan_types
+        if (athlete_id, plan_type) not in done
+    ]
+    click.echo(f"📋 {len(jobs)} plan(s) to generate ({len(done)} already done per checkpoint)")
+
+    def generate_plan(profile, plan_type):
+        # Nobody is waiting on a page here: while the breaker is open, wait it out rather than fail the plan
+        give_up_at = time.monotonic() + max_outage
+        while True:
+            limiter.wait()
+            try:
+                return backend.generate(create_training_prompt(profile, plan_type),
+                                        response_schema=plan_schema(plan_type))
+            except BackendUnavailable as e:
+                # At least a second (plus jitter) so threads queued behind a half-open trial don't spin
+                delay = max(1.0, e.retry_after) + random.uniform(0, 1)
+                if time.monotonic() + delay > give_up_at:
+                    raise
+                time.sleep(delay)
+
+    def run_job(athlete_id, profile, plan_type):
+        cache_key = plan_cache_key(profile, plan_type, backend.config)
+        raw = plan_cache.get(cache_key) if plan_cache else None
+        fresh = not raw
+        if fresh:
+            raw = generate_plan(profile, plan_type)
+        # Structured plans come back as JSON and are validated and rendered to markdown here
+        plan_text, structured = render_plan_response(plan_type, raw)
+        if plan_cache and fresh:
+            plan_cache.set(cache_key, raw, plan_type)
+
+        athlete_dir = os.path.join(out_dir, slugify(athlete_id))
+        os.makedirs(athlete_dir, exist_ok=True)
+        base_path = os.path.join(athlete_dir, plan_type)
+        with open(base_path + ".md", "w", encoding="utf-8") as f:
+            f.write(plan_text)
+        if structured is not None:
+            with open(base_path + ".json", "w", encoding="utf-8") as f:
+                f.write(structured.to_json())
+        if write_pdf:
+            with open(base_path + ".pdf", "wb") as f:
+                f.write(create_pdf(plan_text, plan_type, profile).getvalue())
+        return base_path
+
+    failures = 0
+    with open(checkpoint_path, "a", encoding="utf-8") as checkpoint, \
+            ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = {executor.submit(run_job, *job): job for job in jobs}
+        for future in tqdm(as_completed(futures), total=len(futures), unit="plan"):
+            athlete_id, _, plan_type = futures[future]
+            record = {"athlete_id": athlete_id, "plan_type": plan_type, "finished_at": time.time()}
+            try:
+                record.update(status="ok", path=future.result())
+            except Exception as e:
+                failures += 1
+                record.update(status="error", error=f"{type(e).__name__}: {e}")
+            append_checkpoint(checkpoint, record)
+
+    click.echo(f"✅ {len(jobs) - failures} plan(s) written to {out_dir}")
+    if failures:
+        click.echo(f"❌ {failures} plan(s) failed; re-run the same command to retry them.", err=True)
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,134 @@
+"""Core CoachBot logic shared by the Streamlit app and the batch CLI (no Streamlit imports)"""
+import os
+
+from plan_cache import make_plan_key
+from prompts import get_template, render_prompt
+from workout_plan import WorkoutPlan
+
+MODEL_NAME = "gemini-2.5-flash"
+GENERATION_CONFIG = {
+    "temperature": 0.7,
+    "top_p": 0.8,
+    "top_k": 40,
+    "max_output_tokens": 8192  # Increased from 4000 to prevent truncation
+}
+
+CACHE_DIR = os.environ.get(
+    "COACHBOT_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".coachbot_cache")
+)
+DB_PATH = os.environ.get(
+    "COACHBOT_DB_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".coachbot_data", "coachbot.db")
+)
+
+SPORT_CONFIG = {
+    "Football": {
+        "icon": "⚽",
+        "positions": ["Forward", "Midfielder", "Defender", "Goalkeeper"],
+        "skills": ["Ball Control", "Passing", "Shooting", "Dribbling", "Defense", "Speed"],
+        "injuries": ["Ankle Sprain", "Knee Injury", "Hamstring", "Concussion", "Groin Strain"]
+    },
+    "Cricket": {
+        "icon": "🏏",
+        "positions": ["Batsman", "Bowler", "All-rounder", "Wicket-keeper"],
+        "skills": ["Batting", "Bowling", "Fielding", "Catching", "Running"],
+        "injuries": ["Shoulder Injury", "Back Pain", "Ankle Sprain", "Elbow Injury"]
+    },
+    "Basketball": {
+        "icon": "🏀",
+        "positions": ["Point Guard", "Shooting Guard", "Small Forward", "Power Forward", "Center"],
+        "skills": ["Shooting", "Dribbling", "Passing", "Rebounding", "Defense"],
+        "injuries": ["Knee Injury", "Ankle Sprain", "Wrist Injury", "Back Pain"]
+    },
+    "Athletics": {
+        "icon": "🏃‍♂️",
+        "positions": ["Sprinter", "Distance Runner", "Jumper", "Thrower"],
+        "skills": ["Speed", "Endurance", "Power", "Technique", "Strength"],
+        "injuries": ["Hamstring", "Shin Splints", "Knee Pain", "Stress Fracture"]
+    }
+}
+
+def calculate_bmi(weight, height_cm):
+    """Calculate BMI from weight (kg) and height (cm)"""
+    height_m = height_cm / 100
+    bmi = weight / (height_m ** 2)
+    return round(bmi, 1)
+
+# Upper BMI bound (exclusive), category and color class, in ascending order
+BMI_BANDS = [
+    (18.5, "Underweight", "bmi-underweight"),
+    (25, "Normal Weight", "bmi-normal"),
+    (30, "Overweight", "bmi-overweight"),
+    (float("inf"), "Obese", "bmi-obese"),
+]
+
+def get_bmi_category(bmi):
+    """Get BMI category and color class"""
+    for upper, category, css_class in BMI_BANDS:
+        if bmi < upper:
+            return category, css_class
+    return BMI_BANDS[-1][1], BMI_BANDS[-1][2]
+
+ACTIVITY_MULTIPLIERS = {
+    "2 days/week": 1.375,
+    "3 days/week": 1.55,
+    "4 days/week": 1.725,
+    "5 days/week": 1.9
+}
+
+# Protein / carb / fat share of daily calories, and the calorie split across meals
+MACRO_SPLIT = {"protein": 0.30, "carbs": 0.45, "fats": 0.25}
+MEAL_SPLIT = {"breakfast": 0.25, "lunch": 0.30, "snack": 0.15, "dinner": 0.30}
+
+def compute_nutrition(profile):
+    """BMR (Mifflin-St Jeor), TDEE, macro grams and per-meal calories for a profile"""
+    weight = profile.get('weight', 65)
+    height = profile.get('height', 170)
+    age = profile.get('age', 15)
+    gender = profile.get('gender', 'Male')
+    
+    if gender == "Male":
+        bmr = 10 * weight + 6.25 * height - 5 * age + 5
+    else:
+        bmr = 10 * weight + 6.25 * height - 5 * age - 161
+    
+    tdee = bmr * ACTIVITY_MULTIPLIERS.get(profile.get('frequency', '3 days/week'), 1.55)
+    
+    return {
+        'bmr': int(bmr),
+        'tdee': int(tdee),
+        'protein_g': int((tdee * MACRO_SPLIT['protein']) / 4),
+        'carbs_g': int((tdee * MACRO_SPLIT['carbs']) / 4),
+        'fats_g': int((tdee * MACRO_SPLIT['fats']) / 9),
+        'meal_calories': {meal: int(tdee * share) for meal, share in MEAL_SPLIT.items()},
+    }
+
+def create_training_prompt(user_data, focus_area="general"):
+    """Create specialized prompt based on focus area (unknown areas get the workout prompt)"""
+    return render_prompt(focus_area, user_data).text
+
+PLAN_LABELS = {
+    "workout": "🏋️ Workout",
+    "nutrition": "🥗 Nutrition",
+    "recovery": "🏥 Recovery",
+    "mental": "🧠 Mental Training",
+    "tactical": "🎯 Tactical Tips",
+}
+
+def plan_schema(plan_type):
+    """JSON schema a plan type is requested with, or None for free-form markdown plans"""
+    return get_template(plan_type).response_schema
+
+def render_plan_response(plan_type, raw):
+    """(markdown, WorkoutPlan or None) for a model response or cached plan; structured plans are validated"""
+    if plan_schema(plan_type) is None:
+        return raw, None
+    plan = WorkoutPlan.from_json(raw)
+    return plan.to_markdown(), plan
+
+def plan_cache_key(profile, plan_type, model_config):
+    """Cache key for a plan: prompt-relevant profile fields + plan type + backend config"""
+    template = get_template(plan_type)
+    # The template version retires cached plans whenever a prompt's wording changes
+    return make_plan_key(profile, plan_type, template.fields, {**model_config, "prompt": template.version})
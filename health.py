@@ -0,0 +1,53 @@
+"""Non-blocking health probe for the AI backend"""
+import threading
+import time
+
+
+class HealthProbe:
+    """Runs a probe callable in a background thread and caches its status with a TTL"""
+
+    def __init__(self, probe, ttl_seconds=300, failure_ttl_seconds=60):
+        self.probe = probe
+        self.ttl_seconds = ttl_seconds
+        self.failure_ttl_seconds = failure_ttl_seconds
+        self._lock = threading.Lock()
+        self._thread = None
+        self._status = {"state": "unknown", "latency_ms": None, "checked_at": None, "error": None}
+        self.refresh()
+
+    def _run(self):
+        started = time.perf_counter()
+        try:
+            self.probe()
+            status = {"state": "healthy", "error": None}
+        except Exception as e:
+            status = {"state": "unhealthy", "error": f"{type(e).__name__}: {e}"}
+        status["latency_ms"] = round((time.perf_counter() - started) * 1000)
+        status["checked_at"] = time.time()
+        with self._lock:
+            self._status = status
+
+    def _stale(self):
+        checked_at = self._status["checked_at"]
+        if checked_at is None:
+            return True
+        ttl = self.ttl_seconds if self._status["state"] == "healthy" else self.failure_ttl_seconds
+        return time.time() - checked_at > ttl
+
+    def refresh(self, force=False):
+        """Start a background probe unless one is running or the cached status is fresh"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            if not force and not self._stale():
+                return
+            self._thread = threading.Thread(target=self._run, name="coachbot-health-probe", daemon=True)
+            self._thread.start()
+
+    def status(self):
+        """Return the last known status without blocking; kicks off a re-probe when stale"""
+        self.refresh()
+        with self._lock:
+            status = dict(self._status)
+            status["checking"] = self._thread is not None and self._thread.is_alive()
+        return status
@@ -0,0 +1,143 @@
+"""Background jobs: a bounded worker pool for slow model calls, with job IDs, status polling and cancellation"""
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = {DONE, FAILED, CANCELLED}
+
+
+class QueueFull(Exception):
+    """Too many jobs are already waiting; the caller should ask the user to try again shortly"""
+
+
+class JobCancelled(Exception):
+    """Raised inside a job's work function once the job has been cancelled"""
+
+
+class Job:
+    """One unit of background work; status, progress and result are read by the polling UI"""
+
+    def __init__(self, kind, owner, label, meta=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.owner = owner
+        self.label = label
+        # Caller-defined context read back when the result is collected
+        self.meta = meta or {}
+        self.status = QUEUED
+        self.progress = ""
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._cancel = threading.Event()
+        self._future = None
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    @property
+    def done(self):
+        return self.status in FINISHED
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise JobCancelled(f"{self.label} was cancelled")
+
+    def report(self, progress):
+        """Publish partial output; also the point where a running job notices it was cancelled"""
+        self.check_cancelled()
+        self.progress = progress
+
+    def elapsed(self):
+        return (self.finished_at or time.time()) - self.created_at
+
+
+class JobQueue:
+    """Runs jobs on at most max_workers threads and refuses new work beyond max_pending waiting jobs
+
+    Cancellation is cooperative: queued jobs never start, running jobs stop at their next report().
+    Finished jobs are kept for keep_finished seconds so a session can collect them after navigating.
+    """
+
+    def __init__(self, max_workers=4, max_pending=32, keep_finished=1800):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.keep_finished = keep_finished
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="coachbot-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind, owner, label, fn, meta=None):
+        """Queue fn(job) and return the Job; raises QueueFull when the backlog is at its limit"""
+        with self._lock:
+            self._prune()
+            waiting = sum(1 for job in self._jobs.values() if job.status == QUEUED)
+            if waiting >= self.max_pending:
+                raise QueueFull(f"{waiting} jobs are already waiting")
+            job = Job(kind, owner, label, meta)
+            self._jobs[job.id] = job
+        job._future = self._executor.submit(self._run, job, fn)
+        return job
+
+    def _run(self, job, fn):
+        if job.cancelled:
+            job.status = CANCELLED
+            job.finished_at = time.time()
+            return
+        job.status = RUNNING
+        job.started_at = time.time()
+        try:
+            job.result = fn(job)
+            job.status = CANCELLED if job.cancelled else DONE
+        except JobCancelled:
+            job.status = CANCELLED
+        except Exception as e:
+            job.error = e
+            job.status = FAILED
+        finally:
+            job.finished_at = time.time()
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Request cancellation; returns False if the job is unknown or already finished"""
+        job = self.get(job_id)
+        if job is None or job.done:
+            return False
+        job._cancel.set()
+        if job._future is not None and job._future.cancel():
+            job.status = CANCELLED
+            job.finished_at = time.time()
+        return True
+
+    def position(self, job_id):
+        """1-based place in the queue for a waiting job, None once it has started"""
+        with self._lock:
+            waiting = sorted((job for job in self._jobs.values() if job.status == QUEUED), key=lambda job: job.created_at)
+        for i, job in enumerate(waiting, 1):
+            if job.id == job_id:
+                return i
+        return None
+
+    def _prune(self):
+        cutoff = time.time() - self.keep_finished
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.done and job.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+    def stats(self):
+        with self._lock:
+            counts = {status: 0 for status in (QUEUED, RUNNING, DONE, FAILED, CANCELLED)}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+        return {**counts, "workers": self.max_workers, "max_pending": self.max_pending}
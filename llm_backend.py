@@ -0,0 +1,225 @@
+"""Pluggable LLM backends: Gemini for production, a deterministic fake for offline load testing"""
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+from coachbot import MODEL_NAME, GENERATION_CONFIG
+from prompts import estimate_tokens
+
+
+class TransientBackendError(Exception):
+    """Temporary provider failure (overload, rate limit) that is safe to retry"""
+
+    code = 503
+
+
+class LLMBackend:
+    """Interface the app talks to; subclasses implement generate/stream/count_tokens"""
+
+    name = "base"
+    # Identifies the backend + settings in plan cache keys so outputs never mix
+    config = {}
+    # Optional callable(input_tokens, output_tokens), set by metrics instrumentation
+    usage_hook = None
+
+    def generate(self, prompt, timeout=None, response_schema=None):
+        """Return the full response text for prompt, giving up after timeout seconds
+
+        With response_schema (a JSON-schema dict) the response is a JSON document matching it.
+        """
+        raise NotImplementedError
+
+    def stream(self, prompt, timeout=None, response_schema=None):
+        """Yield response text pieces as they arrive (pieces of the JSON document with response_schema)"""
+        yield self.generate(prompt, timeout=timeout, response_schema=response_schema)
+
+    def count_tokens(self, text):
+        """Number of input tokens text would use"""
+        return estimate_tokens(text)
+
+    def _report_usage(self, input_tokens, output_tokens):
+        if self.usage_hook is not None:
+            self.usage_hook(input_tokens, output_tokens)
+
+
+class GeminiBackend(LLMBackend):
+    """Google Gemini via google.generativeai"""
+
+    name = "gemini"
+
+    def __init__(self, api_key, model_name=MODEL_NAME, generation_config=None):
+        self.api_key = api_key
+        self.model_name = model_name
+        self.generation_config = generation_config or GENERATION_CONFIG
+        self.config = {"model": model_name, **self.generation_config}
+        self._model = None
+        self._model_lock = threading.Lock()
+
+    @property
+    def model(self):
+        """The GenerativeModel, created on first use so startup never imports google.generativeai"""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    import google.generativeai as genai
+                    genai.configure(api_key=self.api_key)
+                    # Building the model makes no network calls
+                    self._model = genai.GenerativeModel(model_name=self.model_name,
+                                                        generation_config=self.generation_config)
+        return self._model
+
+    @staticmethod
+    def _request_options(timeout):
+        return {"timeout": timeout} if timeout else None
+
+    @staticmethod
+    def _gemini_schema(schema):
+        """Gemini takes an OpenAPI-style schema with upper-case type names and no minItems"""
+        converted = {"type": schema["type"].upper()}
+        if "properties" in schema:
+            converted["properties"] = {key: GeminiBackend._gemini_schema(value) for key, value in schema["properties"].items()}
+            converted["required"] = schema.get("required", [])
+        if "items" in schema:
+            converted["items"] = GeminiBackend._gemini_schema(schema["items"])
+        return converted
+
+    def _schema_config(self, response_schema):
+        if response_schema is None:
+            return None
+        return {"response_mime_type": "application/json", "response_schema": self._gemini_schema(response_schema)}
+
+    def generate(self, prompt, timeout=None, response_schema=None):
+        response = self.model.generate_content(prompt, generation_config=self._schema_config(response_schema),
+                                               request_options=self._request_options(timeout))
+        if not response or not response.text:
+            raise Exception("No response from AI")
+        self._report_usage_metadata(getattr(response, "usage_metadata", None))
+        return response.text
+
+    def _report_usage_metadata(self, usage):
+        if usage is not None:
+            self._report_usage(getattr(usage, "prompt_token_count", 0), getattr(usage, "candidates_token_count", 0))
+
+    def stream(self, prompt, timeout=None, response_schema=None):
+        usage = None
+        for chunk in self.model.generate_content(prompt, stream=True, generation_config=self._schema_config(response_schema),
+                                                 request_options=self._request_options(timeout)):
+            # Each chunk carries running totals; the last one covers the whole response
+            usage = getattr(chunk, "usage_metadata", None) or usage
+            try:
+                piece = chunk.text
+            except ValueError:
+                # Chunks without text parts (e.g. safety metadata) carry nothing to show
+                continue
+            if piece:
+                yield piece
+        self._report_usage_metadata(usage)
+
+    def count_tokens(self, text):
+        return self.model.count_tokens(text).total_tokens
+
+
+class FakeBackend(LLMBackend):
+    """Offline backend returning canned markdown with configurable latency and size"""
+
+    name = "fake"
+
+    def __init__(self, latency_seconds=1.0, first_token_seconds=0.2, response_words=300, chunks=20, error_rate=0.0):
+        self.latency_seconds = latency_seconds
+        self.first_token_seconds = min(first_token_seconds, latency_seconds)
+        self.response_words = response_words
+        self.chunks = max(1, chunks)
+        self.error_rate = error_rate
+        self.config = {"backend": "fake", "words": response_words}
+
+    @classmethod
+    def from_env(cls):
+        """Build from COACHBOT_FAKE_* environment variables"""
+        return cls(
+            latency_seconds=float(os.environ.get("COACHBOT_FAKE_LATENCY", 1.0)),
+            first_token_seconds=float(os.environ.get("COACHBOT_FAKE_FIRST_TOKEN", 0.2)),
+            response_words=int(os.environ.get("COACHBOT_FAKE_WORDS", 300)),
+            error_rate=float(os.environ.get("COACHBOT_FAKE_ERROR_RATE", 0.0)),
+        )
+
+    def _response(self, prompt):
+        # Deterministic per prompt so cache and coalescing behave as they would live
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+        lines = [
+            f"## 🏆 Your Plan ({digest})",
+            "",
+            "| Day | Focus | Sets x Reps | Rest |",
+            "|-----|-------|-------------|------|",
+            "| Mon | Speed | 4 x 30m | 90s |",
+            "| Wed | Strength | 3 x 10 | 60s |",
+            "| Fri | Endurance | 2 x 8 min | 120s |",
+            "",
+            "### 💪 Key Points",
+        ]
+        words = sum(len(line.split()) for line in lines)
+        n = 1
+        while words < self.response_words:
+            line = f"- **Tip {n}:** keep good form, stay hydrated and build intensity gradually week by week."
+            lines.append(line)
+            words += len(line.split())
+            n += 1
+        return "\n".join(lines)
+
+    def _json_response(self, schema, prompt):
+        """Deterministic JSON document shaped like schema (two items per list)"""
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+
+        def build(node, name, n):
+            if node["type"] == "object":
+                return {key: build(value, key, n) for key, value in node["properties"].items()}
+            if node["type"] == "array":
+                return [build(node["items"], name, i) for i in (1, 2)]
+            if node["type"] == "integer":
+                return 3 + n
+            return f"{name.replace('_', ' ').capitalize()} {n} ({digest})"
+
+        return json.dumps(build(schema, "plan", 1))
+
+    def _wait(self, seconds, timeout):
+        """Sleep like a slow provider would, honouring the caller's timeout"""
+        if timeout is not None and seconds > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"Fake backend timed out after {timeout:.1f}s")
+        time.sleep(seconds)
+
+    def _maybe_fail(self):
+        if self.error_rate and random.random() < self.error_rate:
+            raise TransientBackendError("Fake backend overloaded (simulated 503)")
+
+    def generate(self, prompt, timeout=None, response_schema=None):
+        self._maybe_fail()
+        self._wait(self.latency_seconds, timeout)
+        text = self._response(prompt) if response_schema is None else self._json_response(response_schema, prompt)
+        self._report_usage(estimate_tokens(prompt), estimate_tokens(text))
+        return text
+
+    def stream(self, prompt, timeout=None, response_schema=None):
+        self._maybe_fail()
+        text = self._response(prompt) if response_schema is None else self._json_response(response_schema, prompt)
+        self._wait(self.first_token_seconds, timeout)
+        step = max(1, len(text) // self.chunks)
+        pause = (self.latency_seconds - self.first_token_seconds) / self.chunks
+        for start in range(0, len(text), step):
+            if start:
+                time.sleep(pause)
+            yield text[start:start + step]
+        self._report_usage(estimate_tokens(prompt), estimate_tokens(text))
+
+
+def create_backend(name, api_key=None):
+    """Backend factory used by the app and CLI"""
+    if name == "fake":
+        return FakeBackend.from_env()
+    if name == "gemini":
+        if not api_key:
+            raise ValueError("The Gemini backend needs an API key")
+        return GeminiBackend(api_key)
+    raise ValueError(f"Unknown LLM backend: {name}")
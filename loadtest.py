@@ -0,0 +1,367 @@
+"""Concurrent-session load test for sizing CoachBot replicas
+
+Runs N simulated athletes in one process, each on its own thread with its own session, the
+way Streamlit serves real browser tabs. Process-wide resources (plan cache, job queue, SQLite
+store, PDF renderer) are shared between them as on a real server. Every athlete drives main()
+through a scripted journey: BMI -> profile -> plan -> AI Coach chat -> PDF. Model calls go to
+the offline fake backend with configurable latency. The report covers throughput, rerun
+latency percentiles, memory per session and CPU.
+
+Usage:
+    python loadtest.py --users 20
+    python loadtest.py --users 50 --ramp 30 --latency 2 --first-token 0.5 --out load.json
+    python loadtest.py --users 10 --iterations 3 --think 0     # back-to-back journeys, no pauses
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+# Everything runs against the fake backend; set before the app's modules are first imported
+os.environ["COACHBOT_LLM_BACKEND"] = "fake"
+os.environ["COACHBOT_TTS_BACKEND"] = "offline"
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(ROOT, "app.py")
+
+CHAT_QUESTIONS = [
+    "How do I improve my sprint speed?",
+    "What should I eat the night before a match?",
+    "How many rest days do I need each week?",
+]
+# How often a real browser re-polls plan job status (app.JOB_POLL_SECONDS)
+POLL_SECONDS = 1.0
+# Give up on a plan that hasn't arrived after this long
+PLAN_WAIT_LIMIT = 300
+
+
+def percentile(samples, q):
+    """Nearest-rank percentile of an already sorted list"""
+    if not samples:
+        return None
+    return samples[min(len(samples) - 1, max(0, int(round(q * len(samples) + 0.5)) - 1))]
+
+
+def latency_stats(samples):
+    """Count, mean and p50/p95/p99/max in milliseconds for a list of seconds"""
+    samples = sorted(samples)
+    if not samples:
+        return {"count": 0}
+    return {
+        "count": len(samples),
+        "mean_ms": round(sum(samples) / len(samples) * 1000, 2),
+        "p50_ms": round(percentile(samples, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(samples, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(samples, 0.99) * 1000, 2),
+        "max_ms": round(samples[-1] * 1000, 2),
+    }
+
+
+class Recorder:
+    """Thread-safe collection of rerun timings, plan waits and errors from every simulated athlete"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reruns = {}
+        self.plan_waits = []
+        self.errors = []
+        self.journeys = 0
+
+    def rerun(self, step, seconds):
+        with self._lock:
+            self.reruns.setdefault(step, []).append(seconds)
+
+    def plan_wait(self, seconds):
+        with self._lock:
+            self.plan_waits.append(seconds)
+
+    def error(self, user, step, message):
+        with self._lock:
+            self.errors.append({"user": user, "step": step, "error": message})
+
+    def journey_done(self):
+        with self._lock:
+            self.journeys += 1
+
+    def all_reruns(self):
+        with self._lock:
+            return [seconds for samples in self.reruns.values() for seconds in samples]
+
+
+def share_test_runtime():
+    """Let AppTest sessions run on concurrent threads
+
+    AppTest installs a mock Runtime singleton for each run and clears it (and restores its config
+    overrides) when the run ends, which pulls the runtime out from under other sessions still
+    running. Keep serving the most recent runtime instead (a real server has exactly one) and
+    set the config override once for the whole load test. Each run also gets a fresh script
+    cache and so recompiles app.py, which a server does once; share one cache as a server does.
+    """
+    from streamlit import config, logger
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import app_test, local_script_runner
+
+    script_cache = ScriptCache()
+    app_test.ScriptCache = local_script_runner.ScriptCache = lambda: script_cache
+
+    latest = {}
+
+    def instance(cls):
+        if cls._instance is not None:
+            latest["runtime"] = cls._instance
+        if "runtime" not in latest:
+            raise RuntimeError("Runtime hasn't been created!")
+        return latest["runtime"]
+
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(lambda cls: cls._instance is not None or "runtime" in latest)
+    config.set_option("global.appTest", True)
+    # Per-rerun deprecation and bare-mode warnings would drown the report
+    logger.set_log_level("ERROR")
+
+
+class StepFailed(Exception):
+    """A journey step raised in the app or couldn't find the widget it drives"""
+
+
+class SimulatedAthlete:
+    """One browser session walking through the app the way a new athlete would"""
+
+    def __init__(self, index, recorder, think_seconds, seed):
+        from streamlit.testing.v1 import AppTest
+
+        self.index = index
+        self.recorder = recorder
+        self.think_seconds = think_seconds
+        self.random = random.Random(seed + index)
+        self.at = AppTest.from_file(APP_PATH, default_timeout=PLAN_WAIT_LIMIT)
+        self.step = "start"
+
+    def think(self):
+        if self.think_seconds:
+            time.sleep(self.random.uniform(0.5, 1.5) * self.think_seconds)
+
+    def run(self, widget=None):
+        """One rerun: interact with widget (if any), run the script and record how long it took"""
+        started = time.perf_counter()
+        (widget or self.at).run()
+        self.recorder.rerun(self.step, time.perf_counter() - started)
+        if self.at.exception:
+            raise StepFailed(self.at.exception[0].message)
+
+    def button(self, label):
+        for button in self.at.button:
+            if button.label == label:
+                return button.click()
+        raise StepFailed(f"no '{label}' button on the {self.at.session_state.page} page")
+
+    def navigate(self, page):
+        self.step = f"navigate[{page}]"
+        self.run(self.at.button(key=f"nav_{page}").click())
+
+    def wait_for_plans(self, started):
+        """Poll like the sidebar fragment does until this session's background plans are collected"""
+        self.step = "poll_plan_jobs"
+        while self.at.session_state.plan_jobs:
+            if time.perf_counter() - started > PLAN_WAIT_LIMIT:
+                raise StepFailed(f"plan not ready after {PLAN_WAIT_LIMIT}s")
+            time.sleep(POLL_SECONDS)
+            self.run()
+        self.recorder.plan_wait(time.perf_counter() - started)
+
+    def journey(self):
+        self.step = "open_app"
+        self.run()
+        self.think()
+
+        # Distinct body measurements per athlete, so plans miss the shared cache as they would in a school
+        self.navigate("BMI Calculator")
+        self.at.number_input[0].set_value(round(self.random.uniform(40, 90), 1))
+        self.at.number_input[2].set_value(self.random.randint(11, 18))
+        self.step = "calculate_bmi"
+        self.run(self.button("Calculate BMI"))
+        self.think()
+
+        self.navigate("Profile Setup")
+        self.step = "save_profile"
+        self.run(self.button("💾 Save Profile"))
+        self.think()
+
+        self.navigate("Training Plan")
+        self.step = "request_plan"
+        requested = time.perf_counter()
+        self.run(self.button("🏋️ AI Workout Plan"))
+        self.wait_for_plans(requested)
+        self.think()
+
+        self.navigate("AI Coach")
+        for question in self.random.sample(CHAT_QUESTIONS, 2):
+            self.at.text_area[0].input(question)
+            self.step = "chat_message"
+            self.run(self.button("Send 📤"))
+            self.think()
+
+        self.navigate("Training Plan")
+        pdf_buttons = [button for button in self.at.button if button.label == "📥 Download Plan as PDF"]
+        if pdf_buttons:
+            # Background render not finished yet: the athlete asks for it and waits
+            self.step = "download_pdf"
+            self.run(pdf_buttons[0].click())
+        self.recorder.journey_done()
+
+    def session_bytes(self):
+        from metrics import session_state_bytes
+
+        return session_state_bytes(self.at.session_state)
+
+    def drive(self, iterations):
+        for _ in range(iterations):
+            try:
+                self.journey()
+            except Exception as e:
+                self.recorder.error(self.index, self.step, f"{type(e).__name__}: {e}")
+                return
+
+
+def run_load(users, iterations, ramp_seconds, think_seconds, seed):
+    import psutil
+
+    share_test_runtime()
+    process = psutil.Process(os.getpid())
+    recorder = Recorder()
+
+    # One warm-up session pays for imports and process-wide resources so they don't count per session
+    warmup = SimulatedAthlete(-1, Recorder(), 0, seed)
+    warmup.step = "warmup"
+    warmup.run()
+    baseline_rss = process.memory_info().rss
+
+    athletes = [SimulatedAthlete(i, recorder, think_seconds, seed) for i in range(users)]
+    threads = [
+        threading.Thread(target=athlete.drive, args=(iterations,), name=f"athlete-{i}", daemon=True)
+        for i, athlete in enumerate(athletes)
+    ]
+    peak_rss = baseline_rss
+    cpu_before = process.cpu_times()
+    started = time.perf_counter()
+    for i, thread in enumerate(threads):
+        thread.start()
+        if ramp_seconds and i < len(threads) - 1:
+            time.sleep(ramp_seconds / len(threads))
+    while any(thread.is_alive() for thread in threads):
+        peak_rss = max(peak_rss, process.memory_info().rss)
+        time.sleep(0.2)
+    elapsed = time.perf_counter() - started
+    cpu_after = process.cpu_times()
+    final_rss = process.memory_info().rss
+    peak_rss = max(peak_rss, final_rss)
+
+    cpu_seconds = (cpu_after.user - cpu_before.user) + (cpu_after.system - cpu_before.system)
+    session_bytes = [athlete.session_bytes() for athlete in athletes]
+    reruns = recorder.all_reruns()
+    return {
+        "users": users,
+        "iterations": iterations,
+        "duration_seconds": round(elapsed, 2),
+        "journeys_completed": recorder.journeys,
+        "errors": recorder.errors,
+        "throughput": {
+            "journeys_per_minute": round(recorder.journeys / elapsed * 60, 2),
+            "reruns_per_second": round(len(reruns) / elapsed, 2),
+        },
+        "rerun_latency": latency_stats(reruns),
+        "rerun_latency_by_step": {step: latency_stats(samples) for step, samples in sorted(recorder.reruns.items())},
+        "plan_wait": latency_stats(recorder.plan_waits),
+        "memory": {
+            "baseline_rss_mb": round(baseline_rss / 1e6, 1),
+            "peak_rss_mb": round(peak_rss / 1e6, 1),
+            "final_rss_mb": round(final_rss / 1e6, 1),
+            # Upper bound: also counts AppTest's copy of each session's element tree
+            "rss_per_session_mb": round((final_rss - baseline_rss) / users / 1e6, 2),
+            "session_state_kb_mean": round(sum(session_bytes) / len(session_bytes) / 1000, 1),
+            "session_state_kb_max": round(max(session_bytes) / 1000, 1),
+        },
+        "cpu": {
+            "cpu_seconds": round(cpu_seconds, 2),
+            # 100% = one core fully busy for the whole run
+            "cpu_percent": round(cpu_seconds / elapsed * 100, 1),
+            "cores_available": os.cpu_count(),
+            "threads_peak": process.num_threads(),
+        },
+    }
+
+
+def print_report(result):
+    latency = result["rerun_latency"]
+    print(f"👥 {result['users']} athletes x {result['iterations']} journey(s) in {result['duration_seconds']}s "
+          f"— {result['journeys_completed']} completed, {len(result['errors'])} failed")
+    print(f"🚀 Throughput: {result['throughput']['journeys_per_minute']} journeys/min · "
+          f"{result['throughput']['reruns_per_second']} reruns/s")
+    if latency["count"]:
+        print(f"⏱️  Rerun latency: p50 {latency['p50_ms']} ms · p95 {latency['p95_ms']} ms · "
+              f"p99 {latency['p99_ms']} ms · max {latency['max_ms']} ms ({latency['count']} reruns)")
+    for step, stats in result["rerun_latency_by_step"].items():
+        print(f"   {step:34s} p50 {stats['p50_ms']:9.1f} ms   p95 {stats['p95_ms']:9.1f} ms   "
+              f"p99 {stats['p99_ms']:9.1f} ms   n={stats['count']}")
+    if result["plan_wait"]["count"]:
+        print(f"🏋️ Plan ready after: p50 {result['plan_wait']['p50_ms'] / 1000:.1f}s · "
+              f"p95 {result['plan_wait']['p95_ms'] / 1000:.1f}s")
+    memory = result["memory"]
+    print(f"🧠 Memory: RSS {memory['baseline_rss_mb']} MB -> {memory['final_rss_mb']} MB "
+          f"(peak {memory['peak_rss_mb']} MB) · ~{memory['rss_per_session_mb']} MB per session · "
+          f"session state {memory['session_state_kb_mean']} KB mean / {memory['session_state_kb_max']} KB max")
+    cpu = result["cpu"]
+    print(f"🔥 CPU: {cpu['cpu_percent']}% of one core ({cpu['cpu_seconds']}s over the run, "
+          f"{cpu['cores_available']} cores available) · {cpu['threads_peak']} threads")
+    for error in result["errors"][:10]:
+        print(f"❌ athlete {error['user']} at {error['step']}: {error['error']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="CoachBot AI concurrent-session load test (offline)")
+    parser.add_argument("--users", type=int, default=10, help="Simultaneous simulated athletes")
+    parser.add_argument("--iterations", type=int, default=1, help="Journeys per athlete")
+    parser.add_argument("--ramp", type=float, default=5.0, help="Seconds over which athletes arrive")
+    parser.add_argument("--think", type=float, default=1.0, help="Average pause between actions, in seconds")
+    parser.add_argument("--latency", type=float, default=1.0, help="Fake model response time, in seconds")
+    parser.add_argument("--first-token", type=float, default=0.2, help="Fake model time to first streamed token")
+    parser.add_argument("--words", type=int, default=300, help="Words per fake model response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of fake model calls that fail")
+    parser.add_argument("--seed", type=int, default=7, help="Seed for the athletes' inputs and pauses")
+    parser.add_argument("--db", help="SQLite file for the simulated athletes (default: a throwaway temp file)")
+    parser.add_argument("--out", help="Also write the report as JSON")
+    args = parser.parse_args(argv)
+
+    # Simulated athletes must not end up next to real ones
+    os.environ["COACHBOT_DB_PATH"] = args.db or os.path.join(tempfile.mkdtemp(prefix="coachbot-load-"), "load.db")
+    os.environ["COACHBOT_FAKE_LATENCY"] = str(args.latency)
+    os.environ["COACHBOT_FAKE_FIRST_TOKEN"] = str(args.first_token)
+    os.environ["COACHBOT_FAKE_WORDS"] = str(args.words)
+    os.environ["COACHBOT_FAKE_ERROR_RATE"] = str(args.error_rate)
+
+    result = run_load(args.users, args.iterations, args.ramp, args.think, args.seed)
+    print_report(result)
+    if args.out:
+        report = {
+            "meta": {
+                "timestamp": datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "settings": vars(args),
+            },
+            "results": result,
+        }
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 1 if result["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,299 @@
+"""In-process metrics: counters and latency histograms, psutil process stats and a Prometheus text export"""
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from llm_backend import LLMBackend
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80)
+RENDER_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+SIZE_BUCKETS = (1_000, 10_000, 50_000, 100_000, 250_000, 500_000, 1_000_000, 5_000_000)
+TOKEN_BUCKETS = (50, 100, 150, 200, 250, 300, 400, 600, 1_000)
+WORD_BUCKETS = (100, 200, 300, 400, 500, 750, 1_000, 1_500, 2_500)
+SIMILARITY_BUCKETS = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 1.0)
+
+HELP = {
+    "coachbot_llm_call_seconds": "Latency of individual model calls (each retry attempt counts)",
+    "coachbot_llm_calls_total": "Model calls by operation, call kind and outcome",
+    "coachbot_llm_tokens_total": "Tokens reported by the model (input/output) by call kind",
+    "coachbot_plan_seconds": "End-to-end plan generation time including retries",
+    "coachbot_plan_requests_total": "Plan requests by plan type and outcome (ok, cached, error, cancelled)",
+    "coachbot_plan_invalidations_total": "Existing plans per profile edit by plan type, marked stale or still valid",
+    "coachbot_plan_queue_seconds": "Time a background plan job waited for a free worker",
+    "coachbot_prompt_tokens": "Estimated input tokens of each rendered plan prompt by plan type",
+    "coachbot_prompt_over_budget_total": "Plan prompts rendered above their template's input token budget",
+    "coachbot_plan_output_words": "Length in words of each generated plan by plan type",
+    "coachbot_page_render_seconds": "Duration of one script rerun by page",
+    "coachbot_fragment_render_seconds": "Duration of one fragment run by UI region",
+    "coachbot_answer_cache_lookups_total": "AI Coach answer cache lookups (hit, miss, skipped for follow-ups)",
+    "coachbot_answer_cache_similarity": "Best-match similarity for cacheable AI Coach questions",
+    "coachbot_tts_first_audio_seconds": "Time from pressing Listen to the first playable audio chunk (uncached)",
+    "coachbot_session_state_bytes": "Approximate resident size of a session's state after spilling, sampled per rerun",
+    "coachbot_session_spilled_bytes_total": "Compressed session state moved to the on-disk spill store",
+    "coachbot_session_over_budget_total": "Reruns that ended with a session above its memory budget",
+    "coachbot_process_resident_memory_bytes": "Resident set size of the app process",
+    "coachbot_process_cpu_percent": "Process CPU use since the previous sample",
+    "coachbot_process_threads": "Threads in the app process",
+    "coachbot_process_uptime_seconds": "Seconds since metrics collection started",
+}
+
+# Label attached to model calls made while it is set (plan type, "chat", "summary", ...)
+_call_kind = contextvars.ContextVar("coachbot_call_kind", default="other")
+
+
+@contextmanager
+def call_kind(kind):
+    """Tag model calls made inside the block so latency and tokens are broken down by caller"""
+    token = _call_kind.set(kind)
+    try:
+        yield
+    finally:
+        _call_kind.reset(token)
+
+
+def _label_key(labels):
+    return tuple(sorted((labels or {}).items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style"""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Estimate a quantile by linear interpolation inside the matching bucket"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            if seen + count >= rank and count:
+                if bound == float("inf"):
+                    return lower
+                return lower + (bound - lower) * (rank - seen) / count
+            seen += count
+            lower = bound
+        return lower
+
+
+class MetricsRegistry:
+    """Thread-safe counters and histograms keyed by metric name and label set"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._process = None
+        self.started_at = time.time()
+
+    def inc(self, name, labels=None, value=1):
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            key = _label_key(labels)
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name, value, labels=None, buckets=LATENCY_BUCKETS):
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            key = _label_key(labels)
+            if key not in series:
+                series[key] = Histogram(buckets)
+            series[key].observe(value)
+
+    @contextmanager
+    def timer(self, name, labels=None, buckets=LATENCY_BUCKETS):
+        """Observe the block's duration, even when it exits via an exception or st.rerun"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, labels, buckets)
+
+    def counters(self, name):
+        """{labels dict as tuple: value} for one counter"""
+        with self._lock:
+            return dict(self._counters.get(name, {}))
+
+    def histogram_summary(self, name, quantiles=(0.5, 0.95, 0.99)):
+        """Rows of labels + count, mean and quantiles for one histogram"""
+        with self._lock:
+            series = {key: hist for key, hist in self._histograms.get(name, {}).items()}
+            rows = []
+            for key, hist in sorted(series.items()):
+                row = dict(key)
+                row["count"] = hist.count
+                row["mean"] = hist.sum / hist.count if hist.count else None
+                for q in quantiles:
+                    row[f"p{int(q * 100)}"] = hist.quantile(q)
+                rows.append(row)
+        return rows
+
+    def process_stats(self):
+        """RSS, CPU and thread count for this process (psutil)"""
+        import psutil
+
+        if self._process is None:
+            self._process = psutil.Process(os.getpid())
+            # The first cpu_percent call only primes the counter
+            self._process.cpu_percent(None)
+        with self._process.oneshot():
+            return {
+                "rss_bytes": self._process.memory_info().rss,
+                "cpu_percent": self._process.cpu_percent(None),
+                "threads": self._process.num_threads(),
+                "uptime_seconds": time.time() - self.started_at,
+            }
+
+    def render_prometheus(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        process = self.process_stats()
+        for name, value in (
+            ("coachbot_process_resident_memory_bytes", process["rss_bytes"]),
+            ("coachbot_process_cpu_percent", process["cpu_percent"]),
+            ("coachbot_process_threads", process["threads"]),
+            ("coachbot_process_uptime_seconds", round(process["uptime_seconds"], 3)),
+        ):
+            lines += [f"# HELP {name} {HELP[name]}", f"# TYPE {name} gauge", f"{name} {value}"]
+
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+            for name, series in sorted(self._histograms.items()):
+                lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, hist in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(hist.buckets, hist.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(key, [('le', bound)])} {cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(key, [('le', '+Inf')])} {hist.count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {round(hist.sum, 6)}")
+                    lines.append(f"{name}_count{_format_labels(key)} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Atomically write the text export so scrapers never read a half-written file"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp_path, path)
+
+
+REGISTRY = MetricsRegistry()
+
+
+class MetricsExporter:
+    """Rewrites the Prometheus text file every interval seconds from a daemon thread"""
+
+    def __init__(self, path, interval=15.0, registry=REGISTRY):
+        self.path = path
+        self.interval = interval
+        self.registry = registry
+        self.last_written = None
+        self._thread = threading.Thread(target=self._run, name="coachbot-metrics-export", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.registry.write_prometheus(self.path)
+                self.last_written = time.time()
+            except Exception:
+                # Exporting is best effort; try again next interval
+                pass
+            time.sleep(self.interval)
+
+
+def session_state_bytes(state):
+    """Cheap estimate of how much a session holds: size of its JSON-serializable contents
+
+    Containers that compress or spill their contents (see session_memory) report what they keep resident.
+    """
+    total = 0
+    for key in list(state.keys()):
+        try:
+            value = state[key]
+            if hasattr(value, "resident_bytes"):
+                total += value.resident_bytes()
+                continue
+            total += len(json.dumps(value, default=str))
+        except Exception:
+            continue
+    return total
+
+
+class InstrumentedBackend(LLMBackend):
+    """Records latency, outcome and token usage of every call to the wrapped backend"""
+
+    def __init__(self, inner, registry=REGISTRY):
+        self.inner = inner
+        self.name = inner.name
+        self.config = inner.config
+        self.registry = registry
+        inner.usage_hook = self._record_usage
+
+    def _record_usage(self, input_tokens, output_tokens):
+        kind = _call_kind.get()
+        if input_tokens:
+            self.registry.inc("coachbot_llm_tokens_total", {"kind": kind, "direction": "input"}, input_tokens)
+        if output_tokens:
+            self.registry.inc("coachbot_llm_tokens_total", {"kind": kind, "direction": "output"}, output_tokens)
+
+    def _record_call(self, op, started, outcome):
+        labels = {"op": op, "kind": _call_kind.get()}
+        self.registry.observe("coachbot_llm_call_seconds", time.perf_counter() - started, labels)
+        self.registry.inc("coachbot_llm_calls_total", {**labels, "outcome": outcome})
+
+    def generate(self, prompt, timeout=None, response_schema=None):
+        started = time.perf_counter()
+        try:
+            result = self.inner.generate(prompt, timeout=timeout, response_schema=response_schema)
+        except Exception as e:
+            self._record_call("generate", started, type(e).__name__)
+            raise
+        self._record_call("generate", started, "ok")
+        return result
+
+    def stream(self, prompt, timeout=None, response_schema=None):
+        started = time.perf_counter()
+        try:
+            for piece in self.inner.stream(prompt, timeout=timeout, response_schema=response_schema):
+                yield piece
+        except Exception as e:
+            self._record_call("stream", started, type(e).__name__)
+            raise
+        self._record_call("stream", started, "ok")
+
+    def count_tokens(self, text):
+        return self.inner.count_tokens(text)
@@ -0,0 +1,320 @@
+"""PDF export for generated plans: markdown -> reportlab flowables, cached and rendered off-thread"""
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+# reportlab is imported inside the functions below so that importing this module (and
+# therefore starting the app) doesn't pay for it; it loads on the first PDF render.
+
+# 6.5 inches in points: the letter page width minus SimpleDocTemplate's default margins
+DEFAULT_CONTENT_WIDTH = 6.5 * 72
+
+# ---------------- STYLES (built once, on first use) ----------------
+
+
+@lru_cache(maxsize=None)
+def get_styles():
+    """Paragraph styles for every PDF element"""
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_CENTER
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+
+    base_styles = getSampleStyleSheet()
+    return {
+        "title": ParagraphStyle(
+            'CustomTitle',
+            parent=base_styles['Heading1'],
+            fontSize=24,
+            textColor=colors.HexColor('#667eea'),
+            alignment=TA_CENTER,
+            spaceAfter=30
+        ),
+        "heading": ParagraphStyle(
+            'CustomHeading',
+            parent=base_styles['Heading2'],
+            fontSize=16,
+            textColor=colors.HexColor('#764ba2'),
+            spaceAfter=12,
+            spaceBefore=20
+        ),
+        "subheading": ParagraphStyle(
+            'CustomSubheading',
+            parent=base_styles['Heading3'],
+            fontSize=13,
+            textColor=colors.HexColor('#764ba2'),
+            spaceAfter=8,
+            spaceBefore=12
+        ),
+        "body": ParagraphStyle(
+            'CustomBody',
+            parent=base_styles['BodyText'],
+            fontSize=11,
+            spaceAfter=12,
+            leading=14
+        ),
+        "bullet": ParagraphStyle(
+            'CustomBullet',
+            parent=base_styles['BodyText'],
+            fontSize=11,
+            spaceAfter=4,
+            leading=14
+        ),
+        "table_cell": ParagraphStyle(
+            'TableCell',
+            parent=base_styles['BodyText'],
+            fontSize=9,
+            leading=11
+        ),
+        "table_header": ParagraphStyle(
+            'TableHeader',
+            parent=base_styles['BodyText'],
+            fontName='Helvetica-Bold',
+            fontSize=9,
+            leading=11,
+            textColor=colors.whitesmoke
+        ),
+        "footer": ParagraphStyle(
+            'Footer',
+            parent=base_styles['Normal'],
+            fontSize=9,
+            textColor=colors.gray,
+            alignment=TA_CENTER
+        ),
+    }
+
+
+@lru_cache(maxsize=None)
+def get_table_styles():
+    """Table styles for the athlete profile and markdown tables in plans"""
+    from reportlab.lib import colors
+    from reportlab.platypus import TableStyle
+
+    return {
+        "profile": TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#667eea')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 12),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+        ]),
+        "plan": TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#667eea')),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f3f0fb')]),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#999999')),
+            ('TOPPADDING', (0, 0), (-1, -1), 4),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+        ]),
+    }
+
+# ---------------- MARKDOWN -> FLOWABLES ----------------
+
+_HEADING = re.compile(r"^(#{1,6})\s*(.*?)\s*#*$")
+_LIST_ITEM = re.compile(r"^(\s*)([-*+•]|\d+[.)])\s+(.*)$")
+_TABLE_SEPARATOR = re.compile(r"^\|?\s*:?-+:?\s*(\|\s*:?-+:?\s*)*\|?$")
+_RULE = re.compile(r"^(-{3,}|\*{3,}|_{3,})$")
+
+_INLINE_RULES = [
+    (re.compile(r"\*\*(.+?)\*\*"), r"<b>\1</b>"),
+    (re.compile(r"__(.+?)__"), r"<b>\1</b>"),
+    (re.compile(r"(?<![*\w])\*(?!\s)(.+?)(?<!\s)\*(?![*\w])"), r"<i>\1</i>"),
+    (re.compile(r"(?<![_\w])_(?!\s)(.+?)(?<!\s)_(?![_\w])"), r"<i>\1</i>"),
+    (re.compile(r"`([^`]+)`"), r'<font face="Courier">\1</font>'),
+]
+
+
+def inline_markup(text):
+    """Escape text for reportlab and convert **bold**, *italic* and `code`"""
+    text = escape(text)
+    for pattern, replacement in _INLINE_RULES:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def _split_row(line):
+    return [cell.strip() for cell in line.strip().strip("|").split("|")]
+
+
+def _build_table(rows, available_width):
+    """Render parsed pipe-table rows as a reportlab Table"""
+    from reportlab.platypus import Paragraph, Table
+
+    styles = get_styles()
+    columns = max(len(row) for row in rows)
+    data = []
+    for r, row in enumerate(rows):
+        style = styles["table_header"] if r == 0 else styles["table_cell"]
+        cells = row + [""] * (columns - len(row))
+        data.append([Paragraph(inline_markup(cell), style) for cell in cells])
+    table = Table(data, colWidths=[available_width / columns] * columns, repeatRows=1, hAlign='LEFT')
+    table.setStyle(get_table_styles()["plan"])
+    return table
+
+
+_bullet_styles = {}
+
+
+def _bullet_style(depth):
+    """Indented bullet style per nesting depth, created once and reused"""
+    if depth not in _bullet_styles:
+        from reportlab.lib.styles import ParagraphStyle
+
+        indent = 18 + depth * 14
+        _bullet_styles[depth] = ParagraphStyle(f"CustomBullet{depth}", parent=get_styles()["bullet"],
+                                               leftIndent=indent, bulletIndent=indent - 12)
+    return _bullet_styles[depth]
+
+
+def markdown_to_flowables(plan_text, available_width=DEFAULT_CONTENT_WIDTH):
+    """Convert model markdown (headers, nested lists, emphasis, pipe tables) into flowables"""
+    from reportlab.lib import colors
+    from reportlab.platypus import HRFlowable, Paragraph, Spacer
+
+    styles = get_styles()
+    story = []
+    lines = plan_text.splitlines()
+    i = 0
+    while i < len(lines):
+        raw = lines[i]
+        line = raw.strip()
+        i += 1
+        if not line:
+            continue
+
+        if line.startswith("|"):
+            rows = [] if _TABLE_SEPARATOR.match(line) else [_split_row(line)]
+            while i < len(lines) and lines[i].strip().startswith("|"):
+                if not _TABLE_SEPARATOR.match(lines[i].strip()):
+                    rows.append(_split_row(lines[i]))
+                i += 1
+            if rows:
+                story.append(_build_table(rows, available_width))
+                story.append(Spacer(1, 12))
+            continue
+
+        if _RULE.match(line):
+            story.append(HRFlowable(width="100%", thickness=0.5, color=colors.HexColor('#cccccc'),
+                                    spaceBefore=6, spaceAfter=6))
+            continue
+
+        heading = _HEADING.match(line)
+        if heading:
+            level = len(heading.group(1))
+            style = styles["title"] if level == 1 else styles["heading"] if level <= 3 else styles["subheading"]
+            story.append(Paragraph(inline_markup(heading.group(2)), style))
+            continue
+
+        item = _LIST_ITEM.match(raw)
+        if item:
+            depth = len(item.group(1).expandtabs(4)) // 2
+            marker = item.group(2)
+            bullet = marker if marker[0].isdigit() else "•" if depth == 0 else "◦"
+            story.append(Paragraph(inline_markup(item.group(3)), _bullet_style(depth), bulletText=bullet))
+            continue
+
+        story.append(Paragraph(inline_markup(line), styles["body"]))
+    return story
+
+
+def _profile_table(profile):
+    from reportlab.lib.units import inch
+    from reportlab.platypus import Table
+
+    profile_data = [
+        ["Sport", profile.get('sport', 'N/A')],
+        ["Position", profile.get('position', 'N/A')],
+        ["Age", f"{profile.get('age', 'N/A')} years"],
+        ["Fitness Level", profile.get('fitness_level', 'N/A')],
+        ["Goal", profile.get('goal', 'N/A')],
+        ["BMI", f"{profile.get('bmi', 'N/A')} ({profile.get('bmi_category', 'N/A')})"],
+    ]
+    profile_table = Table(profile_data, colWidths=[2*inch, 4*inch])
+    profile_table.setStyle(get_table_styles()["profile"])
+    return profile_table
+
+
+def render_pdf(plan_text, plan_type, profile=None):
+    """Render a plan to PDF bytes (uncached)"""
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer
+
+    styles = get_styles()
+    pdf_buffer = BytesIO()
+    doc = SimpleDocTemplate(pdf_buffer, pagesize=letter)
+
+    story = [Paragraph(f"CoachBot AI - {escape(str(plan_type))} Plan", styles["title"]), Spacer(1, 20)]
+
+    if profile:
+        story.append(Paragraph("Athlete Profile", styles["heading"]))
+        story.append(_profile_table(profile))
+        story.append(Spacer(1, 30))
+
+    story.append(Paragraph("Your Personalized Plan", styles["heading"]))
+    story.extend(markdown_to_flowables(plan_text, doc.width))
+
+    story.append(Spacer(1, 40))
+    story.append(Paragraph("Generated by CoachBot AI", styles["footer"]))
+
+    doc.build(story)
+    return pdf_buffer.getvalue()
+
+# ---------------- CACHE + BACKGROUND RENDERING ----------------
+
+PDF_CACHE_SIZE = 64
+
+_pdf_cache = OrderedDict()
+_pending = {}
+_lock = threading.Lock()
+_render_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="coachbot-pdf")
+
+
+def pdf_cache_key(plan_text, plan_type, profile=None):
+    payload = json.dumps([plan_text, plan_type, profile or {}], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _render_and_store(key, plan_text, plan_type, profile):
+    try:
+        pdf_bytes = render_pdf(plan_text, plan_type, profile)
+        with _lock:
+            _pdf_cache[key] = pdf_bytes
+            while len(_pdf_cache) > PDF_CACHE_SIZE:
+                _pdf_cache.popitem(last=False)
+        return pdf_bytes
+    finally:
+        with _lock:
+            _pending.pop(key, None)
+
+
+def submit_pdf(plan_text, plan_type, profile=None):
+    """Start rendering in a worker thread; returns a Future (already done on a cache hit)"""
+    key = pdf_cache_key(plan_text, plan_type, profile)
+    with _lock:
+        if key in _pdf_cache:
+            _pdf_cache.move_to_end(key)
+            done = Future()
+            done.set_result(_pdf_cache[key])
+            return done
+        if key not in _pending:
+            _pending[key] = _render_pool.submit(_render_and_store, key, plan_text, plan_type, dict(profile or {}))
+        return _pending[key]
+
+
+def cached_pdf(plan_text, plan_type, profile=None):
+    """Rendered PDF bytes if already available, else None (never blocks)"""
+    future = submit_pdf(plan_text, plan_type, profile)
+    return future.result() if future.done() and not future.exception() else None
+
+
+def create_pdf(plan_text, plan_type, profile=None):
+    """Create PDF from generated plan text, with an athlete profile table when given"""
+    return BytesIO(submit_pdf(plan_text, plan_type, profile).result())
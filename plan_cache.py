@@ -0,0 +1,162 @@
+"""Response cache for AI-generated plans (in-memory LRU + TTL, backed by disk)"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def _normalize(value):
+    """Normalize a profile value so cosmetic differences map to the same key"""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return round(float(value), 2)
+    return " ".join(str(value).split())
+
+
+def changed_fields(old, new):
+    """Profile fields whose normalized value differs, i.e. edits that would change a plan cache key"""
+    old, new = old or {}, new or {}
+    return {field for field in set(old) | set(new) if _normalize(old.get(field)) != _normalize(new.get(field))}
+
+
+def make_plan_key(profile, plan_type, fields, model_config):
+    """Hash the prompt-relevant profile fields, plan type and model config"""
+    payload = {
+        "plan_type": plan_type,
+        "profile": {field: _normalize(profile.get(field)) for field in sorted(fields)},
+        "model": model_config,
+    }
+    raw = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class PlanCache:
+    """Thread-safe LRU cache with TTL expiry and an on-disk backing store
+
+    The disk copy outlives the in-memory LRU (up to max_files plans); expired files and the least
+    recently used ones past max_files are pruned at startup and every prune_every writes.
+    """
+
+    def __init__(self, cache_dir, max_entries=256, ttl_seconds=7 * 24 * 3600, max_files=2000, prune_every=50):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_files = max_files
+        self.prune_every = prune_every
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._writes_since_prune = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self.prune()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _expired(self, entry):
+        return time.time() - entry["created"] > self.ttl_seconds
+
+    def _load_from_disk(self, key):
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _remember(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key):
+        """Return the cached plan text for key, or None on miss/expiry"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._load_from_disk(key)
+            if entry is None or self._expired(entry):
+                if entry is not None:
+                    self._discard(key)
+                self.misses += 1
+                return None
+            self._remember(key, entry)
+            self.hits += 1
+            try:
+                # The file's mtime is its last use, for pruning
+                os.utime(self._path(key))
+            except OSError:
+                pass
+            return entry["text"]
+
+    def set(self, key, text, plan_type=None):
+        """Store plan text in memory and persist it to disk"""
+        entry = {"created": time.time(), "plan_type": plan_type, "text": text}
+        with self._lock:
+            self._remember(key, entry)
+            tmp_path = self._path(key) + ".tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(entry, f)
+                os.replace(tmp_path, self._path(key))
+            except OSError:
+                # Disk persistence is best effort; the in-memory copy still serves hits
+                pass
+            self._writes_since_prune += 1
+            if self._writes_since_prune < self.prune_every:
+                return
+            self._writes_since_prune = 0
+        self.prune()
+
+    def prune(self):
+        """Delete expired plan files, leftover temp files and the least recently used past max_files
+
+        Returns how many files were removed.
+        """
+        now = time.time()
+        files = []
+        removed = 0
+        for entry in os.scandir(self.cache_dir):
+            try:
+                mtime = entry.stat().st_mtime
+                # A plan's file is written when created and touched when read, so this is a safe expiry check
+                if (entry.name.endswith(".tmp") and now - mtime > 3600) or \
+                        (entry.name.endswith(".json") and now - mtime > self.ttl_seconds):
+                    os.remove(entry.path)
+                    removed += 1
+                elif entry.name.endswith(".json"):
+                    files.append((mtime, entry.path))
+            except OSError:
+                continue
+        files.sort()
+        for _, path in files[:max(0, len(files) - self.max_files)]:
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                continue
+        return removed
+
+    def _discard(self, key):
+        self._entries.pop(key, None)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def stats(self):
+        """Return hit/miss counters for display"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "entries": len(self._entries),
+            }
@@ -0,0 +1,279 @@
+"""Plan prompt templates, compiled once at import and rendered on demand with token accounting"""
+import hashlib
+import json
+from dataclasses import asdict
+from functools import lru_cache
+
+from workout_plan import PLAN_SCHEMA, SECTIONS, section_name
+
+
+def estimate_tokens(text):
+    """Estimated token count (~4 characters per token), not the model's tokenizer
+
+    Template input budgets, the prompt-size metrics and the AI Coach memory fit are estimates built on this.
+    """
+    return len(text) // 4 + 1
+
+
+# One definition per profile line, shared by every template: (label, format, default)
+PROFILE_LINES = {
+    "age": ("Age", "{} years", None),
+    "sport": ("Sport", "{}", None),
+    "position": ("Position", "{}", None),
+    "weight": ("Weight", "{} kg", 65),
+    "height": ("Height", "{} cm", 170),
+    "bmi": ("BMI", "{}", "N/A"),
+    "bmi_category": ("BMI Category", "{}", "N/A"),
+    "fitness_level": ("Fitness Level", "{}", "Beginner"),
+    "experience": ("Experience", "{}", "0-6 months"),
+    "goal": ("Training Goal", "{}", "Improve overall fitness"),
+    "injury": ("Injury History", "{}", "None"),
+    "limitations": ("Current Limitations", "{}", "None"),
+    "frequency": ("Training Frequency", "{}", "3 days/week"),
+    "duration": ("Session Duration", "{}", "60 minutes"),
+    "diet": ("Diet Type", "{}", "Balanced"),
+    "allergies": ("Allergies", "{}", "None"),
+}
+
+OUTPUT_INSTRUCTIONS = (
+    "FORMAT: Markdown with headers and bullet points{table}. Be specific and actionable, "
+    "and keep it short{length} - no essays."
+)
+STRUCTURED_OUTPUT_INSTRUCTIONS = (
+    "FORMAT: JSON only, following the response schema. One entry per training day, 2-5 exercises per "
+    "section, notes under 12 words."
+)
+
+
+@lru_cache(maxsize=1024)
+def _profile_line(field, value, label=None):
+    default_label, fmt, _ = PROFILE_LINES[field]
+    return f"- {label or default_label}: {fmt.format(value)}"
+
+
+def render_profile_block(profile, fields, labels=None, defaults=None):
+    """ATHLETE PROFILE lines for the given fields; each line is built once per distinct value
+
+    labels and defaults override PROFILE_LINES for one template.
+    """
+    labels, defaults = labels or {}, defaults or {}
+    lines = []
+    for field in fields:
+        value = profile.get(field)
+        if value in (None, ""):
+            value = defaults.get(field, PROFILE_LINES[field][2])
+        lines.append(_profile_line(field, str(value), labels.get(field)))
+    return "\n".join(lines)
+
+
+class RenderedPrompt:
+    """Prompt text plus the accounting needed to watch its size"""
+
+    def __init__(self, template, text):
+        self.template = template
+        self.text = text
+        # Estimated, not counted by the model's tokenizer
+        self.tokens = estimate_tokens(text)
+
+    @property
+    def over_budget(self):
+        return self.tokens > self.template.input_token_budget
+
+
+class PromptTemplate:
+    """A plan prompt: role, the profile fields it reads, its tasks and its size budgets
+
+    input_token_budget is in estimated tokens (see estimate_tokens). word_budget sizes the output metrics
+    only; the prompt asks for word_range words when given, otherwise just for a short answer. labels and
+    defaults override PROFILE_LINES for this template's profile block.
+    """
+
+    def __init__(self, name, role, fields, tasks, guidance, word_budget=300, table=False, input_token_budget=250,
+                 response_schema=None, word_range=None, labels=None, defaults=None):
+        self.name = name
+        self.fields = tuple(fields)
+        self.labels = labels or {}
+        self.defaults = defaults or {}
+        self.word_budget = word_budget
+        self.input_token_budget = input_token_budget
+        # Templates with a schema ask for JSON, which the app validates and renders to markdown itself
+        self.response_schema = response_schema
+        numbered = "\n".join(f"{i}. {task}" for i, task in enumerate(tasks, 1))
+        if response_schema is not None:
+            output = STRUCTURED_OUTPUT_INSTRUCTIONS
+        else:
+            output = OUTPUT_INSTRUCTIONS.format(table=" and at least one table" if table else "",
+                                                length=f" (around {word_range} words)" if word_range else "")
+        # Everything static is joined now; rendering only fills in the sport and the profile block
+        self.source = f"{role}\n\nATHLETE PROFILE:\n{{profile}}\n\nTASK:\n{numbered}\n\n{guidance}\n{output}"
+        # Labels and defaults change the rendered text too, so they retire cached plans as well
+        overrides = json.dumps([self.labels, self.defaults], sort_keys=True)
+        self.version = hashlib.sha256((self.source + overrides).encode("utf-8")).hexdigest()[:12]
+
+    def render(self, profile):
+        profile = profile or {}
+        return RenderedPrompt(self, self.source.format(
+            sport=profile.get("sport") or "sports",
+            profile=render_profile_block(profile, self.fields, self.labels, self.defaults),
+        ))
+
+
+TEMPLATES = {
+    "workout": PromptTemplate(
+        "workout",
+        role="You are an elite youth sports coach specializing in {sport}.",
+        fields=["age", "sport", "position", "fitness_level", "experience", "bmi", "bmi_category", "goal", "injury",
+                "frequency", "duration"],
+        tasks=[
+            "For every training day: its focus and intensity (1-10)",
+            "Warm-up (10-15 minutes), main exercises and cool-down/stretching (10 minutes), "
+            "each exercise with sets, reps or time and rest",
+            "Safety precautions and form tips",
+        ],
+        guidance="Make it age-appropriate, safe and motivating.",
+        response_schema=PLAN_SCHEMA,
+    ),
+    "nutrition": PromptTemplate(
+        "nutrition",
+        role="You are a certified sports nutritionist for young athletes.",
+        fields=["age", "sport", "position", "weight", "height", "bmi", "bmi_category", "diet", "allergies", "goal"],
+        tasks=[
+            "Daily caloric needs estimation",
+            "Macronutrient breakdown (protein, carbs, fats)",
+            "Pre-workout meal suggestions",
+            "Post-workout recovery nutrition",
+            "Hydration guidelines",
+            "Sample one-day meal plan",
+            "Healthy snack options",
+        ],
+        guidance="Consider age-appropriate nutritional needs and BMI status. Put the meal plan in a table.",
+        table=True,
+        word_range="250-300",
+        defaults={"goal": "Improve performance"},
+    ),
+    "recovery": PromptTemplate(
+        "recovery",
+        role="You are a sports rehabilitation specialist.",
+        fields=["age", "sport", "position", "injury", "limitations"],
+        tasks=[
+            "Pre-training injury prevention exercises",
+            "Proper warm-up sequences",
+            "Recovery techniques after workouts",
+            "Stretching routines for {sport}",
+            "Warning signs to watch for",
+            "When to seek medical attention",
+            "Active recovery activities",
+        ],
+        guidance="Prioritize safety and proper technique.",
+    ),
+    "tactical": PromptTemplate(
+        "tactical",
+        role="You are an expert {sport} coach with tactical expertise.",
+        fields=["age", "sport", "position", "experience", "fitness_level"],
+        tasks=[
+            "Position-specific responsibilities",
+            "Decision-making drills",
+            "Game intelligence tips",
+            "Communication strategies",
+            "Reading the game",
+            "Mental preparation for competition",
+        ],
+        guidance="Make it practical and easy to understand for young athletes.",
+        labels={"fitness_level": "Skill Level"},
+        defaults={"experience": "Beginner"},
+    ),
+    "mental": PromptTemplate(
+        "mental",
+        role="You are a sports psychologist specializing in youth athletics.",
+        fields=["age", "sport", "position", "experience"],
+        tasks=[
+            "Goal-setting strategies",
+            "Visualization techniques",
+            "Pre-competition routines",
+            "Stress management tips",
+            "Motivation and focus exercises",
+            "Building confidence",
+            "Handling pressure situations",
+        ],
+        guidance="Make it age-appropriate and practical.",
+        defaults={"experience": "Beginner"},
+    ),
+}
+
+
+def get_template(plan_type):
+    return TEMPLATES.get(plan_type, TEMPLATES["workout"])
+
+
+def plan_types_reading(fields):
+    """Plan types whose template reads any of fields, i.e. the plans an edit to them makes stale"""
+    fields = set(fields)
+    return [name for name, template in TEMPLATES.items() if fields.intersection(template.fields)]
+
+
+def field_label(field):
+    """Human label for a profile field, as shown in prompts"""
+    return PROFILE_LINES[field][0] if field in PROFILE_LINES else field.replace("_", " ").capitalize()
+
+
+def render_prompt(plan_type, profile):
+    """Render only the requested template"""
+    return get_template(plan_type).render(profile)
+
+
+SECTION_PROMPT = (
+    "You are an elite youth sports coach specializing in {sport}. Rewrite one part of an athlete's "
+    "existing workout plan.\n\n"
+    "ATHLETE PROFILE:\n{profile}\n\n"
+    "DAY: {day}\n"
+    "REST OF THE DAY (avoid repeating): {others}\n"
+    "CURRENT {part}: {current}\n"
+    "CHANGE REQUESTED: {request}\n\n"
+    "Keep it age-appropriate and safe. FORMAT: JSON only, following the response schema; notes under 12 words."
+)
+SECTION_FIELDS = ("age", "sport", "position", "fitness_level", "injury", "duration")
+
+
+def _compact_json(data):
+    """JSON without empty fields or spaces, to keep section prompts small"""
+    def strip(value):
+        if isinstance(value, dict):
+            return {key: strip(item) for key, item in value.items() if item not in (None, "", [])}
+        if isinstance(value, list):
+            return [strip(item) for item in value]
+        return value
+    return json.dumps(strip(data), separators=(",", ":"), ensure_ascii=False)
+
+
+def render_section_prompt(profile, plan, day_index, section=None, request=""):
+    """Prompt for one section of one day (or the whole day when section is None) of a WorkoutPlan
+
+    Only that day's context is sent, so a targeted edit costs a fraction of a full plan.
+    """
+    profile = profile or {}
+    day = plan.days[day_index]
+    if section is None:
+        others = "; ".join(f"{other.day}: {other.focus}" for other in plan.days if other is not day) or "none"
+        part = "DAY"
+        current = _compact_json(asdict(day))
+    else:
+        others = "; ".join(
+            f"{section_name(other)}: " + ", ".join(exercise.name for exercise in getattr(day, other))
+            for other in SECTIONS if other != section
+        )
+        part = section_name(section).upper()
+        current = _compact_json([asdict(exercise) for exercise in getattr(day, section)])
+    return SECTION_PROMPT.format(
+        sport=profile.get("sport") or "sports",
+        profile=render_profile_block(profile, SECTION_FIELDS),
+        day=f"{day.label()} (intensity {day.intensity or 'N/A'}/10)",
+        others=others,
+        part=part,
+        current=current,
+        request=request.strip() or "A fresh alternative with different exercises",
+    )
+
+
+def output_words(text):
+    """Length of a generated plan in words, compared against the template's word_budget"""
+    return len(text.split())
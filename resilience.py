@@ -0,0 +1,218 @@
+"""Resilience for model calls: classified retries with backoff + jitter, a circuit breaker and deadlines"""
+import random
+import threading
+import time
+
+from llm_backend import LLMBackend
+
+# HTTP-style status codes worth retrying (rate limited, overloaded, gateway trouble)
+RETRYABLE_CODES = {408, 429, 500, 502, 503, 504}
+RETRYABLE_NAMES = {
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "InternalServerError",
+    "DeadlineExceeded", "GatewayTimeout", "BadGateway",
+}
+
+
+class BackendUnavailable(Exception):
+    """The circuit breaker is open; calls fail fast until retry_after seconds have passed"""
+
+    def __init__(self, retry_after):
+        self.retry_after = retry_after
+        super().__init__(f"AI service is temporarily unavailable; try again in {max(1, round(retry_after))}s")
+
+
+def is_retryable(error):
+    """True for transient provider/network failures, False for bad requests, auth and safety errors"""
+    if isinstance(error, (BackendUnavailable, TimeoutError)):
+        return False
+    if isinstance(error, ConnectionError):
+        return True
+    # google.api_core exceptions carry the HTTP status as .code; match by name to avoid importing it
+    code = getattr(error, "code", None)
+    if isinstance(code, int) and code in RETRYABLE_CODES:
+        return True
+    return type(error).__name__ in RETRYABLE_NAMES
+
+
+def is_rate_limited(error):
+    return getattr(error, "code", None) == 429 or type(error).__name__ in {"ResourceExhausted", "TooManyRequests"}
+
+
+class Deadline:
+    """Absolute time budget for one user action, shared by every attempt and backoff sleep"""
+
+    def __init__(self, seconds=None):
+        self.expires_at = None if seconds is None else time.monotonic() + seconds
+
+    def remaining(self):
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+
+class CircuitBreaker:
+    """Opens after consecutive transient failures; after reset_timeout one trial call is let through"""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    def before_call(self):
+        """Raise BackendUnavailable while open; allow a single half-open trial once the timeout passes"""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            waited = time.monotonic() - self._opened_at
+            if waited < self.reset_timeout or self._trial_in_flight:
+                raise BackendUnavailable(max(0.0, self.reset_timeout - waited))
+            self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def release(self):
+        """End a half-open trial that failed for a non-transient reason without judging the backend"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half_open"
+            return "open"
+
+
+class RetryBudget:
+    """Caps retries to a fraction of recent calls so a struggling provider isn't hit with extra load"""
+
+    def __init__(self, ratio=0.2, max_tokens=10.0):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self):
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class ResilientBackend(LLMBackend):
+    """Wraps a backend with retries, backoff with full jitter, a per-process circuit breaker and deadlines
+
+    The timeout passed to generate/stream is the deadline for the whole call, retries included;
+    each attempt gets whatever is left of it.
+    """
+
+    def __init__(self, inner, max_attempts=4, base_delay=0.5, max_delay=8.0,
+                 breaker=None, budget=None, sleep=time.sleep):
+        self.inner = inner
+        self.name = inner.name
+        self.config = inner.config
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker or CircuitBreaker()
+        self.budget = budget or RetryBudget()
+        self.sleep = sleep
+        self.retries = 0
+
+    def _backoff(self, attempt, error):
+        # Rate limits clear slower than blips, so start them from a longer base
+        base = self.base_delay * (4 if is_rate_limited(error) else 1)
+        return random.uniform(0, min(self.max_delay, base * 2 ** attempt))
+
+    def _attempts(self, deadline):
+        """Yield attempt numbers while the deadline and circuit breaker still allow another try"""
+        self.budget.deposit()
+        for attempt in range(self.max_attempts):
+            if deadline.expired():
+                raise TimeoutError("Deadline exceeded before the AI service responded")
+            self.breaker.before_call()
+            yield attempt
+
+    def _should_retry(self, attempt, error, deadline):
+        """Record the failure and decide whether to try again; sleeps the backoff when retrying"""
+        if not is_retryable(error):
+            self.breaker.release()
+            return False
+        self.breaker.record_failure()
+        if attempt + 1 >= self.max_attempts or not self.budget.withdraw():
+            return False
+        delay = self._backoff(attempt, error)
+        remaining = deadline.remaining()
+        if remaining is not None and delay >= remaining:
+            return False
+        self.retries += 1
+        self.sleep(delay)
+        return True
+
+    def generate(self, prompt, timeout=None, response_schema=None):
+        deadline = Deadline(timeout)
+        for attempt in self._attempts(deadline):
+            try:
+                result = self.inner.generate(prompt, timeout=deadline.remaining(), response_schema=response_schema)
+            except Exception as e:
+                if self._should_retry(attempt, e, deadline):
+                    continue
+                raise
+            except BaseException:
+                self.breaker.release()
+                raise
+            self.breaker.record_success()
+            return result
+
+    def stream(self, prompt, timeout=None, response_schema=None):
+        deadline = Deadline(timeout)
+        for attempt in self._attempts(deadline):
+            started = False
+            try:
+                for piece in self.inner.stream(prompt, timeout=deadline.remaining(), response_schema=response_schema):
+                    started = True
+                    yield piece
+            except Exception as e:
+                # Text already shown can't be taken back, so only retry failures before the first piece
+                if not started and self._should_retry(attempt, e, deadline):
+                    continue
+                if started and is_retryable(e):
+                    self.breaker.record_failure()
+                elif started:
+                    self.breaker.release()
+                raise
+            except BaseException:
+                # Consumer stopped reading (GeneratorExit) or the script was interrupted
+                self.breaker.release()
+                raise
+            self.breaker.record_success()
+            return
+
+    def count_tokens(self, text):
+        return self.inner.count_tokens(text)
+
+    def stats(self):
+        return {"breaker": self.breaker.state(), "retries": self.retries}
@@ -0,0 +1,88 @@
+"""Vectorized BMI and nutrition targets for a whole roster (pandas/NumPy)"""
+import numpy as np
+import pandas as pd
+
+from coachbot import ACTIVITY_MULTIPLIERS, BMI_BANDS, MACRO_SPLIT, MEAL_SPLIT
+
+# Same defaults compute_nutrition uses for missing profile values
+DEFAULTS = {"weight": 65.0, "height": 170.0, "age": 15.0, "gender": "Male", "frequency": "3 days/week"}
+NUMERIC_COLUMNS = ["weight", "height", "age"]
+
+CHUNK_ROWS = 50_000
+
+
+def _normalize_columns(df):
+    df.columns = [str(c).strip().lower().replace(" ", "_") for c in df.columns]
+    return df
+
+
+def read_roster_chunks(file, filename, chunk_rows=CHUNK_ROWS):
+    """Yield DataFrames of at most chunk_rows rows from a CSV or Excel roster"""
+    if filename.lower().endswith((".xlsx", ".xlsm")):
+        from openpyxl import load_workbook
+
+        # read_only streams rows instead of loading the whole workbook into memory
+        workbook = load_workbook(file, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                return
+            chunk = []
+            for row in rows:
+                chunk.append(row)
+                if len(chunk) >= chunk_rows:
+                    yield _normalize_columns(pd.DataFrame(chunk, columns=header))
+                    chunk = []
+            if chunk:
+                yield _normalize_columns(pd.DataFrame(chunk, columns=header))
+        finally:
+            workbook.close()
+    else:
+        for chunk in pd.read_csv(file, chunksize=chunk_rows):
+            yield _normalize_columns(chunk)
+
+
+def compute_roster(df):
+    """Add BMI, BMI category, BMR, TDEE, macro grams and per-meal calories column-wise"""
+    out = df.copy()
+    for column in NUMERIC_COLUMNS:
+        values = pd.to_numeric(out[column], errors="coerce") if column in out else pd.Series(np.nan, index=out.index)
+        out[column] = values.fillna(DEFAULTS[column]).to_numpy(dtype=float)
+    for column in ("gender", "frequency"):
+        if column not in out:
+            out[column] = DEFAULTS[column]
+        out[column] = out[column].fillna(DEFAULTS[column])
+
+    weight = out["weight"].to_numpy()
+    height = out["height"].to_numpy()
+    age = out["age"].to_numpy()
+
+    bmi = np.round(weight / (height / 100) ** 2, 1)
+    out["bmi"] = bmi
+    upper_bounds = np.array([band[0] for band in BMI_BANDS[:-1]])
+    categories = np.array([band[1] for band in BMI_BANDS])
+    out["bmi_category"] = categories[np.searchsorted(upper_bounds, bmi, side="right")]
+
+    is_male = (out["gender"].astype(str).str.strip().str.lower() == "male").to_numpy()
+    bmr = 10 * weight + 6.25 * height - 5 * age + np.where(is_male, 5, -161)
+    multiplier = out["frequency"].map(ACTIVITY_MULTIPLIERS).fillna(1.55).to_numpy(dtype=float)
+    tdee = bmr * multiplier
+
+    # astype(int) truncates like int() in compute_nutrition
+    out["bmr"] = bmr.astype(int)
+    out["tdee"] = tdee.astype(int)
+    out["protein_g"] = (tdee * MACRO_SPLIT["protein"] / 4).astype(int)
+    out["carbs_g"] = (tdee * MACRO_SPLIT["carbs"] / 4).astype(int)
+    out["fats_g"] = (tdee * MACRO_SPLIT["fats"] / 9).astype(int)
+    for meal, share in MEAL_SPLIT.items():
+        out[f"{meal}_kcal"] = (tdee * share).astype(int)
+    return out
+
+
+def compute_roster_file(file, filename, chunk_rows=CHUNK_ROWS):
+    """Read a roster file chunk by chunk and return the combined results"""
+    results = [compute_roster(chunk) for chunk in read_roster_chunks(file, filename, chunk_rows)]
+    if not results:
+        return pd.DataFrame()
+    return pd.concat(results, ignore_index=True)
@@ -0,0 +1,300 @@
+"""Per-session memory budget: compressed chat turns and plans, spilled to local disk when a session is over budget
+
+ChatHistory and PlanTexts stand in for the list of chat messages and the dicts of plan texts in
+session state. They behave like the plain list/dict (reads return ordinary strings), but keep
+older messages and every plan zlib-compressed. When a session's resident size passes its budget,
+spill_cold_state() moves the coldest compressed values to a SpillStore on local disk, keeping only
+a digest in memory, and reading one of them back brings it into memory again.
+"""
+import hashlib
+import os
+import threading
+import time
+import zlib
+from collections.abc import MutableMapping, MutableSequence
+
+COMPRESS_LEVEL = 6
+# Shorter strings aren't worth compressing: zlib's header and the object outweigh the savings
+MIN_COMPRESS_CHARS = 256
+# What a spilled value still costs in memory (its digest and wrapper), for accounting
+SPILLED_BYTES = 96
+MISSING_TEXT = "⚠️ This content was archived and is no longer available."
+
+
+class Packed:
+    """A string held zlib-compressed in memory"""
+
+    __slots__ = ("data", "length")
+
+    def __init__(self, text):
+        raw = text.encode("utf-8")
+        self.data = zlib.compress(raw, COMPRESS_LEVEL)
+        self.length = len(raw)
+
+    def text(self):
+        return zlib.decompress(self.data).decode("utf-8")
+
+    def resident_bytes(self):
+        return len(self.data)
+
+
+class Spilled:
+    """A compressed string moved to a SpillStore; only its digest stays in memory"""
+
+    __slots__ = ("store", "digest", "length")
+
+    def __init__(self, store, digest, length):
+        self.store = store
+        self.digest = digest
+        self.length = length
+
+    def text(self):
+        data = self.store.read(self.digest)
+        # The file can be pruned under a very old session; say so rather than break the page
+        return MISSING_TEXT if data is None else zlib.decompress(data).decode("utf-8")
+
+    def resident_bytes(self):
+        return SPILLED_BYTES
+
+
+def _pack(text):
+    return Packed(text) if isinstance(text, str) and len(text) >= MIN_COMPRESS_CHARS else text
+
+
+def _text(value):
+    return value if isinstance(value, str) or value is None else value.text()
+
+
+def _resident(value):
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    return value.resident_bytes() if value is not None else 0
+
+
+class SpillStore:
+    """Compressed session values on local disk, one file per content hash
+
+    Identical values (e.g. the same cached plan in many sessions) share a file. Files not read
+    or written for max_age seconds are pruned, so abandoned sessions don't fill the disk.
+    """
+
+    def __init__(self, directory, max_age=7 * 24 * 3600):
+        self.directory = directory
+        self.max_age = max_age
+        self.spilled = 0
+        self.spilled_bytes = 0
+        self.rehydrated = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, digest):
+        return os.path.join(self.directory, f"{digest}.z")
+
+    def write(self, packed):
+        """Persist a Packed value and return the Spilled stand-in; None if the disk write failed"""
+        digest = hashlib.sha256(packed.data).hexdigest()
+        path = self._path(digest)
+        try:
+            if os.path.exists(path):
+                os.utime(path)
+            else:
+                tmp_path = f"{path}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(packed.data)
+                os.replace(tmp_path, path)
+        except OSError:
+            return None
+        with self._lock:
+            self.spilled += 1
+            self.spilled_bytes += len(packed.data)
+        return Spilled(self, digest, packed.length)
+
+    def read(self, digest):
+        try:
+            with open(self._path(digest), "rb") as f:
+                data = f.read()
+            os.utime(self._path(digest))
+        except OSError:
+            return None
+        with self._lock:
+            self.rehydrated += 1
+        return data
+
+    def prune(self):
+        """Delete files untouched for max_age seconds; returns how many were removed"""
+        cutoff = time.time() - self.max_age
+        removed = 0
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                continue
+        return removed
+
+    def stats(self):
+        files = [entry for entry in os.scandir(self.directory) if entry.name.endswith(".z")]
+        with self._lock:
+            return {
+                "files": len(files),
+                "disk_bytes": sum(entry.stat().st_size for entry in files),
+                "spilled": self.spilled,
+                "spilled_bytes": self.spilled_bytes,
+                "rehydrated": self.rehydrated,
+            }
+
+
+class ChatHistory(MutableSequence):
+    """Chat messages ({"role", "content"}) with all but the newest hot_messages held compressed
+
+    Indexing and slicing return plain message dicts, so code written against a list of dicts
+    works unchanged; a returned dict is a copy, so assign it back to change a message.
+    """
+
+    # Spilled before plans: old turns are read far less often than plans are shown
+    spill_priority = 0
+
+    def __init__(self, messages=(), hot_messages=20):
+        self.hot_messages = hot_messages
+        self._entries = []
+        for message in messages:
+            self._entries.append(self._entry(message))
+        self._compress_cold()
+
+    @staticmethod
+    def _entry(message):
+        meta = {key: value for key, value in message.items() if key != "content"}
+        return [meta, message.get("content")]
+
+    def _message(self, entry):
+        if isinstance(entry[1], Spilled):
+            # Rehydrate: a message read again is likely to be read again soon
+            text = entry[1].text()
+            entry[1] = _pack(text)
+        else:
+            text = _text(entry[1])
+        return {**entry[0], "content": text}
+
+    def _compress_cold(self):
+        for entry in self._entries[:max(0, len(self._entries) - self.hot_messages)]:
+            if isinstance(entry[1], str):
+                entry[1] = _pack(entry[1])
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._message(entry) for entry in self._entries[index]]
+        return self._message(self._entries[index])
+
+    def __setitem__(self, index, message):
+        if isinstance(index, slice):
+            self._entries[index] = [self._entry(item) for item in message]
+        else:
+            self._entries[index] = self._entry(message)
+        self._compress_cold()
+
+    def __delitem__(self, index):
+        del self._entries[index]
+
+    def insert(self, index, message):
+        self._entries.insert(index, self._entry(message))
+        self._compress_cold()
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __repr__(self):
+        return f"ChatHistory({len(self)} messages, {self.resident_bytes()} bytes resident)"
+
+    def resident_bytes(self):
+        return sum(_resident(content) + 32 for _, content in self._entries)
+
+    def spill(self, store, target):
+        """Move the oldest compressed messages to store until about target bytes are freed"""
+        freed = 0
+        for entry in self._entries[:max(0, len(self._entries) - self.hot_messages)]:
+            if freed >= target:
+                break
+            # A value no bigger than its Spilled stand-in frees nothing and costs a disk read later
+            if isinstance(entry[1], Packed) and entry[1].resident_bytes() > SPILLED_BYTES:
+                spilled = store.write(entry[1])
+                if spilled is not None:
+                    freed += entry[1].resident_bytes() - SPILLED_BYTES
+                    entry[1] = spilled
+        return freed
+
+
+class PlanTexts(MutableMapping):
+    """plan_type -> plan text (markdown or JSON), compressed from the moment it is stored
+
+    Reads return plain strings. Spilling picks the plans read least recently.
+    """
+
+    spill_priority = 1
+
+    def __init__(self, plans=None):
+        self._values = {}
+        self._read_at = {}
+        for key, text in (plans or {}).items():
+            self[key] = text
+
+    def __getitem__(self, key):
+        value = self._values[key]
+        self._read_at[key] = time.monotonic()
+        if isinstance(value, Spilled):
+            text = value.text()
+            self._values[key] = _pack(text)
+            return text
+        return _text(value)
+
+    def __setitem__(self, key, text):
+        self._values[key] = _pack(text)
+        self._read_at[key] = time.monotonic()
+
+    def __delitem__(self, key):
+        del self._values[key]
+        self._read_at.pop(key, None)
+
+    def __contains__(self, key):
+        # Without this, `in` would go through __getitem__ and decompress (or rehydrate) the plan
+        return key in self._values
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __repr__(self):
+        return f"PlanTexts({list(self._values)}, {self.resident_bytes()} bytes resident)"
+
+    def resident_bytes(self):
+        return sum(_resident(value) + 64 for value in self._values.values())
+
+    def spill(self, store, target):
+        """Move the least recently read compressed plans to store until about target bytes are freed"""
+        freed = 0
+        for key in sorted(self._values, key=lambda key: self._read_at.get(key, 0)):
+            if freed >= target:
+                break
+            value = self._values[key]
+            if isinstance(value, Packed) and value.resident_bytes() > SPILLED_BYTES:
+                spilled = store.write(value)
+                if spilled is not None:
+                    freed += value.resident_bytes() - SPILLED_BYTES
+                    self._values[key] = spilled
+        return freed
+
+
+def spill_cold_state(containers, excess, store):
+    """Spill from containers (chat before plans) until excess bytes are freed; returns bytes freed"""
+    freed = 0
+    for container in sorted(containers, key=lambda container: container.spill_priority):
+        if freed >= excess:
+            break
+        freed += container.spill(store, excess - freed)
+    return freed
@@ -0,0 +1,61 @@
+"""Process-wide single-flight: concurrent identical requests share one in-flight call"""
+import threading
+
+
+class InterruptedFlight(Exception):
+    """The leading call was stopped (e.g. its session went away) before producing a result"""
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesces calls with the same key: one caller runs fn, the rest wait for its result"""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key, fn, timeout=None):
+        """Run fn once per key at a time; returns (result, shared) where shared means we waited on another caller"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+
+        if leader:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+                raise
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+            return call.result, False
+
+        if not call.done.wait(timeout):
+            raise TimeoutError(f"Timed out after {timeout}s waiting for an identical in-flight request")
+        if call.error is not None:
+            if isinstance(call.error, Exception):
+                raise call.error
+            # Control-flow exceptions (script stop/rerun) belong to the leader's thread only
+            raise InterruptedFlight("The shared generation was interrupted; please try again")
+        return call.result, True
+
+    def stats(self):
+        with self._lock:
+            return {"executed": self.executed, "coalesced": self.coalesced, "in_flight": len(self._calls)}
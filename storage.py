@@ -0,0 +1,285 @@
+"""SQLite persistence for athlete profiles, generated plans and chat history"""
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from sqlalchemy import (
+    Column, Float, ForeignKey, Index, Integer, MetaData, String, Table, Text, create_engine, event, func,
+    insert, select
+)
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger(__name__)
+
+metadata = MetaData()
+
+athletes = Table(
+    "athletes", metadata,
+    Column("id", String(32), primary_key=True),
+    Column("profile_json", Text, nullable=False, default="{}"),
+    Column("workouts_generated", Integer, nullable=False, default=0),
+    Column("updated_at", Float, nullable=False),
+)
+
+plans = Table(
+    "plans", metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("athlete_id", String(32), ForeignKey("athletes.id"), nullable=False),
+    Column("plan_type", String(32), nullable=False),
+    Column("plan_text", Text, nullable=False),
+    Column("created_at", Float, nullable=False),
+    # The profile values the plan was generated from (app.plan_basis), so staleness survives a reload
+    Column("basis_json", Text, nullable=True),
+    Index("ix_plans_athlete_type_created", "athlete_id", "plan_type", "created_at"),
+)
+
+# Structured (JSON) form of a plan, saved alongside its markdown with the same created_at
+plan_structures = Table(
+    "plan_structures", metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("athlete_id", String(32), ForeignKey("athletes.id"), nullable=False),
+    Column("plan_type", String(32), nullable=False),
+    Column("plan_json", Text, nullable=False),
+    Column("created_at", Float, nullable=False),
+    Index("ix_plan_structures_athlete_type_created", "athlete_id", "plan_type", "created_at"),
+)
+
+chat_messages = Table(
+    "chat_messages", metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("athlete_id", String(32), ForeignKey("athletes.id"), nullable=False),
+    Column("role", String(16), nullable=False),
+    Column("content", Text, nullable=False),
+    Column("created_at", Float, nullable=False),
+    Index("ix_chat_athlete_id", "athlete_id", "id"),
+)
+
+
+def _configure_sqlite(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    # WAL lets readers proceed while the flusher writes; NORMAL sync is safe under WAL
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+def _add_missing_columns(engine):
+    """create_all only creates missing tables; add columns introduced since an existing database was made"""
+    with engine.begin() as conn:
+        existing = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info(plans)")}
+        if "basis_json" not in existing:
+            conn.exec_driver_sql("ALTER TABLE plans ADD COLUMN basis_json TEXT")
+
+
+# A batch that fails this many flushes is written row by row, and rows that still fail are quarantined
+MAX_FLUSH_ATTEMPTS = 3
+QUARANTINE_SIZE = 1000
+
+
+class Store:
+    """Pooled SQLite store; writes are queued and flushed in batches by a background thread"""
+
+    def __init__(self, db_path, flush_interval=0.5, max_batch=200):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.engine = create_engine(
+            f"sqlite:///{db_path}",
+            poolclass=QueuePool,
+            pool_size=5,
+            max_overflow=10,
+            connect_args={"check_same_thread": False},
+        )
+        event.listen(self.engine, "connect", _configure_sqlite)
+        metadata.create_all(self.engine)
+        _add_missing_columns(self.engine)
+
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._pending = []
+        # Writes that kept failing, kept (bounded) for inspection instead of blocking every later batch
+        self.quarantined = deque(maxlen=QUARANTINE_SIZE)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, name="coachbot-store-flush", daemon=True)
+        self._flusher.start()
+        atexit.register(self.flush)
+
+    # ---------------- WRITES (batched) ----------------
+
+    def _enqueue(self, kind, row):
+        with self._lock:
+            self._pending.append((kind, row, 0))
+            if len(self._pending) >= self.max_batch:
+                self._wake.set()
+
+    def _flush_loop(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                # Keep the flusher alive; failed batches are retried on the next tick
+                pass
+
+    @staticmethod
+    def _write(conn, batch):
+        # Plans/chat can arrive before a profile is saved; make sure the athlete row exists
+        athlete_ids = {row["athlete_id"] for kind, row, _ in batch if kind != "athlete"}
+        for athlete_id in athlete_ids:
+            conn.execute(sqlite_insert(athletes).values(
+                id=athlete_id, profile_json="{}", workouts_generated=0, updated_at=time.time()
+            ).on_conflict_do_nothing())
+        for kind, row, _ in batch:
+            if kind == "athlete":
+                stmt = sqlite_insert(athletes).values(**row)
+                conn.execute(stmt.on_conflict_do_update(
+                    index_elements=[athletes.c.id],
+                    set_={key: stmt.excluded[key] for key in row if key != "id"},
+                ))
+            elif kind == "plan":
+                conn.execute(insert(plans).values(**row))
+            elif kind == "plan_structure":
+                conn.execute(insert(plan_structures).values(**row))
+            elif kind == "chat":
+                conn.execute(insert(chat_messages).values(**row))
+
+    def flush(self):
+        """Write every queued change in one transaction
+
+        A failed batch is re-queued; once it has failed MAX_FLUSH_ATTEMPTS times its rows are written
+        one at a time and those that still fail are moved to self.quarantined.
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return
+            try:
+                with self.engine.begin() as conn:
+                    self._write(conn, batch)
+            except Exception:
+                batch = [(kind, row, attempts + 1) for kind, row, attempts in batch]
+                retry = [entry for entry in batch if entry[2] < MAX_FLUSH_ATTEMPTS]
+                exhausted = [entry for entry in batch if entry[2] >= MAX_FLUSH_ATTEMPTS]
+                for entry in exhausted:
+                    # One bad row shouldn't take the rest of its batch with it
+                    try:
+                        with self.engine.begin() as conn:
+                            self._write(conn, [entry])
+                    except Exception:
+                        self.quarantined.append(entry[:2])
+                with self._lock:
+                    self._pending = retry + self._pending
+                raise
+
+    def save_profile(self, athlete_id, profile, workouts_generated=0):
+        self._enqueue("athlete", {
+            "id": athlete_id,
+            "profile_json": json.dumps(profile or {}, default=str),
+            "workouts_generated": workouts_generated,
+            "updated_at": time.time(),
+        })
+
+    def save_plan(self, athlete_id, plan_type, plan_text, plan_json=None, basis=None):
+        created_at = time.time()
+        self._enqueue("plan", {
+            "athlete_id": athlete_id, "plan_type": plan_type, "plan_text": plan_text, "created_at": created_at,
+            "basis_json": json.dumps(basis, default=str) if basis is not None else None,
+        })
+        if plan_json is not None:
+            self._enqueue("plan_structure", {
+                "athlete_id": athlete_id, "plan_type": plan_type, "plan_json": plan_json, "created_at": created_at,
+            })
+
+    def append_chat(self, athlete_id, role, content):
+        self._enqueue("chat", {
+            "athlete_id": athlete_id, "role": role, "content": content, "created_at": time.time(),
+        })
+
+    # ---------------- READS ----------------
+
+    def _flush_before_read(self):
+        """Flush so a read sees this process's queued writes; a failing write must not fail the read
+
+        The failed batch stays queued (or is quarantined) by flush() itself.
+        """
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Could not flush queued writes before a read; reading what is already saved")
+
+    def load_session(self, athlete_id, chat_limit=None):
+        """Everything needed to restore a session, or None for an unknown athlete
+
+        With chat_limit only the most recent messages are loaded; chat_total has the full count.
+        """
+        self._flush_before_read()
+        with self.engine.connect() as conn:
+            athlete = conn.execute(select(athletes).where(athletes.c.id == athlete_id)).mappings().first()
+            if athlete is None:
+                return None
+            # Only the newest row of each plan type; older versions stay in the table as history
+            latest_ids = (
+                select(func.max(plans.c.id))
+                .where(plans.c.athlete_id == athlete_id)
+                .group_by(plans.c.plan_type)
+            )
+            plan_rows = conn.execute(
+                select(plans.c.plan_type, plans.c.plan_text, plans.c.created_at, plans.c.basis_json)
+                .where(plans.c.id.in_(latest_ids))
+                .order_by(plans.c.created_at)
+            ).all()
+            # Only a structure saved with the latest markdown still describes that plan
+            structure_rows = conn.execute(
+                select(plan_structures.c.plan_type, plan_structures.c.plan_json)
+                .join(plans, (plans.c.athlete_id == plan_structures.c.athlete_id)
+                      & (plans.c.plan_type == plan_structures.c.plan_type)
+                      & (plans.c.created_at == plan_structures.c.created_at))
+                .where(plans.c.id.in_(latest_ids))
+                .order_by(plan_structures.c.id)
+            ).all()
+            chat_total = conn.execute(
+                select(func.count()).select_from(chat_messages).where(chat_messages.c.athlete_id == athlete_id)
+            ).scalar_one()
+            chat_rows = self._chat_rows(conn, athlete_id, skip=0, limit=chat_limit)
+
+        return {
+            "profile": json.loads(athlete["profile_json"]),
+            "workouts_generated": athlete["workouts_generated"],
+            "plans": {plan_type: plan_text for plan_type, plan_text, _, _ in plan_rows},
+            "structured_plans": dict(structure_rows),
+            # Plans saved before bases were stored have none: their basis is unknown
+            "plan_basis": {
+                plan_type: json.loads(basis_json) for plan_type, _, _, basis_json in plan_rows if basis_json
+            },
+            "latest_plan": (plan_rows[-1][0], plan_rows[-1][1]) if plan_rows else None,
+            "chat_history": [{"role": role, "content": content} for role, content in chat_rows],
+            "chat_total": chat_total,
+        }
+
+    @staticmethod
+    def _chat_rows(conn, athlete_id, skip, limit):
+        """Oldest-first chat rows, skipping the newest `skip` messages and keeping at most `limit`"""
+        query = (
+            select(chat_messages.c.role, chat_messages.c.content)
+            .where(chat_messages.c.athlete_id == athlete_id)
+            .order_by(chat_messages.c.id.desc())
+            .offset(skip)
+        )
+        if limit is not None:
+            query = query.limit(limit)
+        return list(reversed(conn.execute(query).all()))
+
+    def load_chat_page(self, athlete_id, skip, limit):
+        """Archived chat messages older than the newest `skip`, oldest first"""
+        self._flush_before_read()
+        with self.engine.connect() as conn:
+            rows = self._chat_rows(conn, athlete_id, skip, limit)
+        return [{"role": role, "content": content} for role, content in rows]
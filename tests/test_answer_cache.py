@@ -0,0 +1,43 @@
+from answer_cache import AnswerCache, age_band, bucket_key, is_cacheable
+
+PROFILE = {"sport": "Football", "position": "Striker", "age": 15, "injury": "Knee injury", "allergies": "Peanuts"}
+QUESTION = "what should I eat before training"
+
+
+def test_follow_ups_and_short_messages_are_not_cacheable():
+    assert is_cacheable(QUESTION)
+    assert not is_cacheable("what about that before training")
+    assert not is_cacheable("thanks")
+
+
+def test_age_bands():
+    assert [age_band(age) for age in (10, 12, 16, 20, None)] == ["under-12", "12-14", "15-17", "18+", "any-age"]
+
+
+def test_personal_details_are_normalized_into_the_key():
+    assert bucket_key(PROFILE) == bucket_key({**PROFILE, "injury": "knee  injury.", "allergies": "peanuts"})
+    assert bucket_key({**PROFILE, "allergies": "Peanuts, shellfish"}) == \
+        bucket_key({**PROFILE, "allergies": "shellfish and peanuts"})
+    assert bucket_key({**PROFILE, "injury": "None"}) == bucket_key({**PROFILE, "injury": ""})
+    assert bucket_key(PROFILE) != bucket_key({**PROFILE, "allergies": "shellfish"})
+
+
+def test_answers_are_shared_only_within_a_bucket():
+    cache = AnswerCache(threshold=0.8)
+    cache.store(PROFILE, QUESTION, "Eat carbs two hours before.")
+    assert cache.lookup(PROFILE, "What should I eat before training?")[0] == "Eat carbs two hours before."
+    assert cache.lookup({**PROFILE, "injury": "Ankle sprain"}, QUESTION)[0] is None
+    assert cache.lookup(PROFILE, "what about that before training") == (None, None)
+    assert cache.stats()["hits"] == 1
+
+
+def test_least_recently_used_buckets_are_evicted():
+    cache = AnswerCache(threshold=0.8, max_buckets=2)
+    profiles = [{**PROFILE, "injury": injury} for injury in ("knee", "ankle", "wrist")]
+    cache.store(profiles[0], QUESTION, "first")
+    cache.store(profiles[1], QUESTION, "second")
+    cache.lookup(profiles[0], QUESTION)
+    cache.store(profiles[2], QUESTION, "third")
+    assert cache.stats()["buckets"] == 2
+    assert cache.lookup(profiles[0], QUESTION)[0] == "first"
+    assert cache.lookup(profiles[1], QUESTION)[0] is None
@@ -0,0 +1,70 @@
+from chat_memory import ConversationMemory, encode_profile
+from prompts import estimate_tokens
+
+
+class Calls:
+    def __init__(self):
+        self.count_tokens = 0
+        self.summarize = 0
+
+    def counter(self, text):
+        self.count_tokens += 1
+        return estimate_tokens(text)
+
+    def summarizer(self, summary, turns):
+        self.summarize += 1
+        return (summary + f" [{len(turns)} turns]").strip()
+
+
+def chat(memory, exchanges):
+    for i in range(exchanges):
+        memory.build_prompt(f"question {i}")
+        memory.add_exchange(f"question {i}", f"answer {i}")
+
+
+def test_folds_with_hysteresis():
+    calls = Calls()
+    memory = ConversationMemory(calls.counter, calls.summarizer, max_input_tokens=10_000, recent_turns=6)
+    chat(memory, 12)
+    # Folded only when the 8th and 12th questions saw 14 messages, each time back down to 6
+    assert calls.summarize == 2
+    assert memory.summary == "[8 turns] [8 turns]"
+    assert len(memory.turns) == 8
+    memory.build_prompt("next")
+    assert calls.summarize == 2
+
+
+def test_counts_tokens_once_per_turn():
+    calls = Calls()
+    memory = ConversationMemory(calls.counter, calls.summarizer, max_input_tokens=150, recent_turns=6)
+    memory.add_exchange("q " * 200, "a " * 200)
+    memory.add_exchange("short", "reply")
+    prompt = memory.build_prompt("next question")
+    assert calls.count_tokens == 1
+    assert calls.summarize == 1
+    assert memory.turns == [{"role": "user", "content": "short"}, {"role": "assistant", "content": "reply"}]
+    assert "RECENT MESSAGES:\nAthlete: short" in prompt
+
+
+def test_clips_summary_as_last_resort():
+    memory = ConversationMemory(estimate_tokens, lambda summary, turns: summary + " more",
+                                max_input_tokens=200, recent_turns=2)
+    memory.summary = "s" * 2000
+    memory.add_exchange("q", "a")
+    prompt = memory.build_prompt("next")
+    assert memory.turns == []
+    assert estimate_tokens(prompt) <= 201
+
+
+def test_failed_summarize_falls_back_to_excerpts():
+    def broken(summary, turns):
+        raise RuntimeError("model down")
+
+    memory = ConversationMemory(estimate_tokens, broken, recent_turns=2)
+    chat(memory, 4)
+    assert memory.summary == "user: question 0 | assistant: answer 0 | user: question 1 | assistant: answer 1"
+
+
+def test_encode_profile_skips_empty_fields():
+    assert encode_profile({"sport": "Football", "age": 14, "injury": ""}) == "sport=Football; age=14"
+    assert encode_profile({}) == "new user, no profile yet"
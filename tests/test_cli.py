@@ -0,0 +1,74 @@
+import time
+
+import pytest
+from click.testing import CliRunner
+
+import cli
+from llm_backend import LLMBackend, TransientBackendError
+from resilience import CircuitBreaker, ResilientBackend
+
+ROSTER = "name,age,weight,height,sport,position\n{rows}"
+ROW = "{name},14,50,160,Football,Striker\n"
+
+
+class Flaky(LLMBackend):
+    name = "flaky"
+
+    def __init__(self, failures):
+        self.failures = failures
+
+    def generate(self, prompt, timeout=None, response_schema=None):
+        if self.failures:
+            self.failures -= 1
+            raise TransientBackendError()
+        return "## Plan\n\nRest well."
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A fake clock shared by the breaker and the CLI's outage wait, so nothing really sleeps"""
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(time, "sleep", lambda seconds: now.__setitem__(0, now[0] + seconds))
+    return now
+
+
+def run(tmp_path, monkeypatch, names, backend, *args):
+    roster = tmp_path / "roster.csv"
+    roster.write_text(ROSTER.format(rows="".join(ROW.format(name=name) for name in names)))
+    monkeypatch.setattr(cli, "create_backend", lambda name, api_key: backend)
+    monkeypatch.setattr(cli, "ResilientBackend", lambda inner: ResilientBackend(
+        inner, max_attempts=1, breaker=CircuitBreaker(failure_threshold=1, reset_timeout=30.0)))
+    return CliRunner().invoke(cli.cli, [
+        "generate", str(roster), "--out", str(tmp_path / "out"), "--backend", "fake", "--plans", "recovery",
+        "--no-pdf", "--no-cache", "--concurrency", "1", "--rate-limit", "0", *args,
+    ])
+
+
+def test_waits_for_an_open_breaker_instead_of_failing(tmp_path, monkeypatch, clock):
+    result = run(tmp_path, monkeypatch, ["Ann", "Bo", "Cy"], Flaky(failures=1))
+    # The first plan trips the breaker; the rest wait for it and succeed
+    assert "❌ 1 plan(s) failed" in result.output
+    assert sorted(path.name for path in (tmp_path / "out").iterdir()) == ["Bo", "Cy", "checkpoint.jsonl"]
+
+
+def test_gives_up_after_max_outage(tmp_path, monkeypatch, clock):
+    result = run(tmp_path, monkeypatch, ["Ann", "Bo"], Flaky(failures=1), "--max-outage", "5")
+    assert result.exit_code == 1
+    assert "❌ 2 plan(s) failed" in result.output
+
+
+def test_duplicate_names_get_unique_ids(tmp_path, monkeypatch):
+    result = run(tmp_path, monkeypatch, ["John Smith", "john-smith"], Flaky(failures=0))
+    assert result.exit_code == 0, result.output
+    assert sorted(path.name for path in (tmp_path / "out").iterdir()) == \
+        ["John_Smith", "checkpoint.jsonl", "john_smith_row3"]
+
+
+def test_duplicate_athlete_ids_are_rejected(tmp_path):
+    roster = tmp_path / "roster.csv"
+    roster.write_text("athlete_id,age,weight,height,sport,position\nA1,14,50,160,Football,Striker\n"
+                      "A1,15,55,165,Football,Goalkeeper\n")
+    result = CliRunner().invoke(cli.cli, ["generate", str(roster), "--out", str(tmp_path / "out"), "--backend", "fake"])
+    assert result.exit_code == 2
+    assert "share athlete_id 'A1'" in result.output
@@ -0,0 +1,55 @@
+import os
+import time
+
+from plan_cache import PlanCache, changed_fields, make_plan_key
+
+
+def age(path, seconds):
+    stamp = time.time() - seconds
+    os.utime(path, (stamp, stamp))
+
+
+def test_keys_ignore_cosmetic_differences_and_unused_fields():
+    key = make_plan_key({"sport": "Football", "age": 14}, "workout", ["sport", "age"], {"model": "m"})
+    assert key == make_plan_key({"sport": " Football ", "age": 14.0, "diet": "Vegan"}, "workout",
+                                ["sport", "age"], {"model": "m"})
+    assert key != make_plan_key({"sport": "Football", "age": 15}, "workout", ["sport", "age"], {"model": "m"})
+    assert changed_fields({"sport": "Football", "age": 14}, {"sport": "Football ", "age": 15}) == {"age"}
+
+
+def test_serves_from_disk_after_memory_eviction(tmp_path):
+    cache = PlanCache(str(tmp_path), max_entries=1)
+    cache.set("a", "plan a")
+    cache.set("b", "plan b")
+    assert cache.get("a") == "plan a"
+    assert PlanCache(str(tmp_path)).get("b") == "plan b"
+
+
+def test_expired_plans_are_misses_and_removed(tmp_path):
+    cache = PlanCache(str(tmp_path), ttl_seconds=60)
+    cache.set("a", "plan a")
+    cache._entries["a"]["created"] -= 120
+    assert cache.get("a") is None
+    assert not os.path.exists(tmp_path / "a.json")
+
+
+def test_startup_prunes_expired_and_least_recently_used_files(tmp_path):
+    cache = PlanCache(str(tmp_path), ttl_seconds=3600)
+    for key in "abcd":
+        cache.set(key, f"plan {key}")
+    age(tmp_path / "a.json", 7200)  # expired
+    age(tmp_path / "b.json", 300)   # least recently used
+    age(tmp_path / "c.json", 200)
+    (tmp_path / "x.json.tmp").write_text("{")
+    age(tmp_path / "x.json.tmp", 7200)
+    PlanCache(str(tmp_path), ttl_seconds=3600, max_files=2)
+    assert sorted(os.listdir(tmp_path)) == ["c.json", "d.json"]
+
+
+def test_writes_prune_periodically(tmp_path):
+    cache = PlanCache(str(tmp_path), max_files=3, prune_every=5)
+    for index in range(5):
+        cache.set(f"k{index}", "plan")
+        age(tmp_path / f"k{index}.json", 100 - index)
+    assert len(os.listdir(tmp_path)) == 3
+    assert cache.get("k4") == "plan"
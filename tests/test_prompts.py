@@ -0,0 +1,33 @@
+from prompts import TEMPLATES, estimate_tokens, plan_types_reading, render_prompt
+
+PROFILE = {"sport": "Football", "age": 14, "position": "Striker"}
+
+
+def test_templates_keep_their_original_labels_and_defaults():
+    assert "- Training Goal: Improve performance" in render_prompt("nutrition", PROFILE).text
+    assert "- Skill Level: Beginner" in render_prompt("tactical", PROFILE).text
+    assert "- Experience: Beginner" in render_prompt("mental", PROFILE).text
+    assert "- Experience: 0-6 months" in render_prompt("workout", PROFILE).text
+
+
+def test_only_workout_and_nutrition_ask_for_a_word_count():
+    assert "around 250-300 words" in render_prompt("nutrition", PROFILE).text
+    for plan_type in ("recovery", "tactical", "mental"):
+        text = render_prompt(plan_type, PROFILE).text
+        assert "words" not in text and "keep it short - no essays" in text
+
+
+def test_sport_and_profile_are_filled_in():
+    text = render_prompt("recovery", {**PROFILE, "injury": "Sprained ankle"}).text
+    assert "Stretching routines for Football" in text
+    assert "- Injury History: Sprained ankle" in text
+    assert "{" not in text
+
+
+def test_plan_types_reading():
+    assert plan_types_reading(["allergies"]) == ["nutrition"]
+    assert plan_types_reading(["position"]) == list(TEMPLATES)
+
+
+def test_estimate_tokens_is_four_characters_per_token():
+    assert estimate_tokens("x" * 400) == 101
@@ -0,0 +1,162 @@
+import pytest
+
+from llm_backend import LLMBackend, TransientBackendError
+from resilience import (
+    BackendUnavailable, CircuitBreaker, Deadline, ResilientBackend, RetryBudget, is_retryable
+)
+
+
+class Clock:
+    """Stands in for time.monotonic so breaker and deadline tests don't sleep"""
+
+    def __init__(self, monkeypatch):
+        self.now = 1000.0
+        monkeypatch.setattr("resilience.time.monotonic", lambda: self.now)
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class Scripted(LLMBackend):
+    """Raises or returns each scripted outcome in turn"""
+
+    name = "scripted"
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+        self.timeouts = []
+
+    def generate(self, prompt, timeout=None, response_schema=None):
+        self.calls += 1
+        self.timeouts.append(timeout)
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+class BadRequest(Exception):
+    code = 400
+
+
+def test_classifies_errors():
+    assert is_retryable(TransientBackendError())
+    assert is_retryable(ConnectionError())
+    assert not is_retryable(BadRequest())
+    assert not is_retryable(BackendUnavailable(1))
+    assert not is_retryable(TimeoutError())
+
+
+def test_retries_transient_errors_with_jittered_backoff(monkeypatch):
+    monkeypatch.setattr("resilience.random.uniform", lambda low, high: high)
+    delays = []
+    backend = ResilientBackend(Scripted(TransientBackendError(), TransientBackendError(), "plan"),
+                               base_delay=0.5, max_delay=8.0, sleep=delays.append)
+    assert backend.generate("prompt") == "plan"
+    # Full jitter draws from [0, base * 2**attempt]; patched to the upper bound here
+    assert delays == [0.5, 1.0]
+    assert backend.retries == 2
+    assert backend.breaker.state() == "closed"
+
+
+def test_jitter_stays_within_the_cap(monkeypatch):
+    bounds = []
+    monkeypatch.setattr("resilience.random.uniform", lambda low, high: bounds.append((low, high)) or 0.0)
+    backend = ResilientBackend(Scripted(), base_delay=0.5, max_delay=8.0)
+    backend._backoff(10, TransientBackendError())
+    backend._backoff(0, type("TooManyRequests", (Exception,), {})())
+    assert bounds == [(0, 8.0), (0, 2.0)]
+
+
+def test_does_not_retry_bad_requests():
+    inner = Scripted(BadRequest())
+    with pytest.raises(BadRequest):
+        ResilientBackend(inner, sleep=lambda seconds: None).generate("prompt")
+    assert inner.calls == 1
+
+
+def test_retry_budget_limits_retries():
+    budget = RetryBudget(ratio=0.0, max_tokens=1.0)
+    inner = Scripted(*[TransientBackendError()] * 4)
+    backend = ResilientBackend(inner, budget=budget, sleep=lambda seconds: None)
+    with pytest.raises(TransientBackendError):
+        backend.generate("prompt")
+    assert inner.calls == 2
+
+
+def test_breaker_opens_fails_fast_and_recovers_through_half_open(monkeypatch):
+    clock = Clock(monkeypatch)
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30.0)
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state() == "open"
+    with pytest.raises(BackendUnavailable) as unavailable:
+        breaker.before_call()
+    assert unavailable.value.retry_after == 30.0
+
+    clock.sleep(30.0)
+    assert breaker.state() == "half_open"
+    breaker.before_call()  # the single trial call
+    with pytest.raises(BackendUnavailable):
+        breaker.before_call()  # everyone else waits for the trial
+    breaker.record_success()
+    assert breaker.state() == "closed"
+    breaker.before_call()
+
+
+def test_failed_half_open_trial_reopens(monkeypatch):
+    clock = Clock(monkeypatch)
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10.0)
+    breaker.before_call()
+    breaker.record_failure()
+    clock.sleep(10.0)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state() == "open"
+    with pytest.raises(BackendUnavailable) as unavailable:
+        breaker.before_call()
+    assert unavailable.value.retry_after == 10.0
+
+
+def test_released_trial_lets_the_next_call_through(monkeypatch):
+    clock = Clock(monkeypatch)
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10.0)
+    breaker.record_failure()
+    clock.sleep(10.0)
+    breaker.before_call()
+    breaker.release()
+    breaker.before_call()
+
+
+def test_open_breaker_fails_calls_without_reaching_the_backend():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60.0)
+    inner = Scripted(TransientBackendError(), "plan")
+    backend = ResilientBackend(inner, max_attempts=1, breaker=breaker)
+    with pytest.raises(TransientBackendError):
+        backend.generate("prompt")
+    with pytest.raises(BackendUnavailable):
+        backend.generate("prompt")
+    assert inner.calls == 1
+
+
+def test_deadline_covers_attempts_and_backoff(monkeypatch):
+    clock = Clock(monkeypatch)
+    monkeypatch.setattr("resilience.random.uniform", lambda low, high: high)
+    inner = Scripted(TransientBackendError(), TransientBackendError(), "plan")
+    backend = ResilientBackend(inner, base_delay=2.0, max_delay=8.0, sleep=clock.sleep)
+    # First backoff (2s) fits in the 3s deadline, the second (4s) doesn't
+    with pytest.raises(TransientBackendError):
+        backend.generate("prompt", timeout=3.0)
+    assert inner.calls == 2
+    assert inner.timeouts == [3.0, 1.0]
+
+
+def test_deadline_remaining_and_expiry(monkeypatch):
+    clock = Clock(monkeypatch)
+    deadline = Deadline(5.0)
+    assert deadline.remaining() == 5.0
+    clock.sleep(6.0)
+    assert deadline.expired() and deadline.remaining() == 0.0
+    assert Deadline().remaining() is None and not Deadline().expired()
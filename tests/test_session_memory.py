@@ -0,0 +1,76 @@
+import base64
+import os
+
+from session_memory import (
+    MISSING_TEXT, SPILLED_BYTES, ChatHistory, Packed, PlanTexts, SpillStore, Spilled, spill_cold_state
+)
+
+
+def noise(size):
+    """Text that doesn't compress, so packed values are bigger than a spilled stand-in"""
+    return base64.b64encode(os.urandom(size)).decode()
+
+
+def messages(count, size=600):
+    return [{"role": "user" if i % 2 == 0 else "assistant", "content": f"{i} " + noise(size)} for i in range(count)]
+
+
+def test_chat_history_behaves_like_a_list_and_compresses_old_messages():
+    original = messages(6)
+    history = ChatHistory(original, hot_messages=2)
+    assert list(history) == original
+    assert history[-1] == original[-1]
+    assert history[1:3] == original[1:3]
+    assert [type(content).__name__ for _, content in history._entries] == ["Packed"] * 4 + ["str"] * 2
+    history.append({"role": "user", "content": "short"})
+    assert isinstance(history._entries[4][1], Packed)
+    assert history[-1] == {"role": "user", "content": "short"}
+
+
+def test_spilled_messages_read_back_and_stay_in_memory(tmp_path):
+    store = SpillStore(str(tmp_path))
+    original = messages(6)
+    history = ChatHistory(original, hot_messages=2)
+    before = history.resident_bytes()
+    freed = history.spill(store, target=10 ** 9)
+    assert freed > 0 and history.resident_bytes() == before - freed
+    assert isinstance(history._entries[0][1], Spilled)
+    assert history[0] == original[0]
+    assert isinstance(history._entries[0][1], Packed)
+    assert store.stats()["rehydrated"] == 1
+
+
+def test_values_no_larger_than_a_spilled_stand_in_stay_put(tmp_path):
+    store = SpillStore(str(tmp_path))
+    plans = PlanTexts({"workout": "rest " * 200})
+    assert plans._values["workout"].resident_bytes() <= SPILLED_BYTES
+    assert plans.spill(store, target=10 ** 9) == 0
+    assert store.stats()["files"] == 0
+
+
+def test_plans_spill_least_recently_read_first(tmp_path):
+    store = SpillStore(str(tmp_path))
+    plans = PlanTexts({"workout": noise(3000), "nutrition": noise(3000)})
+    plans["workout"]
+    plans.spill(store, target=1)
+    assert isinstance(plans._values["nutrition"], Spilled)
+    assert isinstance(plans._values["workout"], Packed)
+    assert "nutrition" in plans and isinstance(plans._values["nutrition"], Spilled)
+
+
+def test_spill_cold_state_takes_chat_before_plans(tmp_path):
+    store = SpillStore(str(tmp_path))
+    history = ChatHistory(messages(6), hot_messages=2)
+    plans = PlanTexts({"workout": noise(3000)})
+    spill_cold_state([plans, history], excess=500, store=store)
+    assert isinstance(history._entries[0][1], Spilled)
+    assert isinstance(plans._values["workout"], Packed)
+
+
+def test_pruned_files_read_as_missing_text(tmp_path):
+    store = SpillStore(str(tmp_path), max_age=0)
+    plans = PlanTexts({"workout": noise(3000)})
+    plans.spill(store, target=10 ** 9)
+    os.utime(next(tmp_path.iterdir()), (0, 0))
+    assert store.prune() == 1
+    assert plans["workout"] == MISSING_TEXT
@@ -0,0 +1,117 @@
+import threading
+import time
+
+import pytest
+
+from singleflight import InterruptedFlight, SingleFlight
+
+
+def run_in_thread(target):
+    thread = threading.Thread(target=target)
+    thread.start()
+    return thread
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def slow():
+        calls.append(1)
+        release.wait(5)
+        return "plan"
+
+    threads = [run_in_thread(lambda: results.append(flight.do("key", slow))) for _ in range(4)]
+    while flight.stats()["coalesced"] < 3:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert sorted(results) == [("plan", False)] + [("plan", True)] * 3
+    assert flight.stats() == {"executed": 1, "coalesced": 3, "in_flight": 0}
+
+
+def test_errors_reach_waiters_and_the_key_is_freed():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def failing():
+        started.set()
+        release.wait(5)
+        raise ValueError("bad output")
+
+    leader = run_in_thread(lambda: pytest.raises(ValueError, flight.do, "key", failing))
+    started.wait(5)
+    errors = []
+
+    def wait():
+        try:
+            flight.do("key", lambda: "unused")
+        except ValueError as e:
+            errors.append(e)
+
+    waiter = run_in_thread(wait)
+    while flight.stats()["coalesced"] < 1:
+        time.sleep(0.01)
+    release.set()
+    leader.join()
+    waiter.join()
+    assert [str(e) for e in errors] == ["bad output"]
+    assert flight.do("key", lambda: "fresh") == ("fresh", False)
+
+
+def test_control_flow_exceptions_become_interrupted_flight_for_waiters():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def interrupted():
+        started.set()
+        release.wait(5)
+        raise KeyboardInterrupt
+
+    def lead():
+        try:
+            flight.do("key", interrupted)
+        except KeyboardInterrupt:
+            pass
+
+    leader = run_in_thread(lead)
+    started.wait(5)
+    errors = []
+
+    def wait():
+        try:
+            flight.do("key", lambda: "unused")
+        except InterruptedFlight as e:
+            errors.append(e)
+
+    waiter = run_in_thread(wait)
+    while flight.stats()["coalesced"] < 1:
+        time.sleep(0.01)
+    release.set()
+    leader.join()
+    waiter.join()
+    assert len(errors) == 1
+
+
+def test_waiters_time_out():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+        return "plan"
+
+    leader = run_in_thread(lambda: flight.do("key", slow))
+    started.wait(5)
+    with pytest.raises(TimeoutError):
+        flight.do("key", lambda: "unused", timeout=0.05)
+    release.set()
+    leader.join()
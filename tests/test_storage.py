@@ -0,0 +1,80 @@
+import json
+
+import pytest
+
+import storage
+from storage import Store
+
+
+@pytest.fixture
+def store(tmp_path):
+    # A long interval keeps the background flusher out of the way; tests flush explicitly
+    return Store(str(tmp_path / "coachbot.db"), flush_interval=3600)
+
+
+def bad_plan(store):
+    """Queue a plan row that violates NOT NULL, so every flush of it fails"""
+    store._enqueue("plan", {"athlete_id": "a1", "plan_type": "workout", "plan_text": None, "created_at": 1.0})
+
+
+def test_reads_succeed_when_a_queued_write_fails(store, caplog):
+    store.save_profile("a1", {"sport": "Football"})
+    store.flush()
+    bad_plan(store)
+    saved = store.load_session("a1")
+    assert saved["profile"] == {"sport": "Football"}
+    assert store.load_chat_page("a1", skip=0, limit=10) == []
+    assert "Could not flush queued writes" in caplog.text
+    assert len(store._pending) == 1
+    store._pending.clear()  # or the atexit flush retries it
+
+
+def test_failing_rows_are_quarantined_without_blocking_the_batch(store):
+    store.save_plan("a1", "workout", "good plan")
+    bad_plan(store)
+    for _ in range(storage.MAX_FLUSH_ATTEMPTS):
+        with pytest.raises(Exception):
+            store.flush()
+    assert store._pending == []
+    assert [kind for kind, row in store.quarantined] == ["plan"]
+    assert store.load_session("a1")["plans"] == {"workout": "good plan"}
+
+
+def test_session_round_trip(store):
+    store.save_profile("a1", {"sport": "Football"}, workouts_generated=2)
+    store.save_plan("a1", "workout", "old workout", basis={"goal": "Speed"})
+    store.save_plan("a1", "nutrition", "nutrition", '{"days": []}', basis={"diet": "Vegan"})
+    store.save_plan("a1", "workout", "new workout", '{"days": [1]}', basis={"goal": "Strength"})
+    for i in range(5):
+        store.append_chat("a1", "user" if i % 2 == 0 else "assistant", f"message {i}")
+    saved = store.load_session("a1", chat_limit=2)
+    assert saved["profile"] == {"sport": "Football"}
+    assert saved["workouts_generated"] == 2
+    assert saved["plans"] == {"nutrition": "nutrition", "workout": "new workout"}
+    assert saved["structured_plans"] == {"nutrition": '{"days": []}', "workout": '{"days": [1]}'}
+    assert saved["plan_basis"] == {"nutrition": {"diet": "Vegan"}, "workout": {"goal": "Strength"}}
+    assert saved["latest_plan"] == ("workout", "new workout")
+    assert [m["content"] for m in saved["chat_history"]] == ["message 3", "message 4"]
+    assert saved["chat_total"] == 5
+    assert [m["content"] for m in store.load_chat_page("a1", skip=2, limit=2)] == ["message 1", "message 2"]
+    assert store.load_session("unknown") is None
+
+
+def test_structure_from_an_older_plan_is_not_restored(store):
+    store.save_plan("a1", "workout", "structured", '{"days": [1]}')
+    store.save_plan("a1", "workout", "edited as markdown")
+    assert store.load_session("a1")["structured_plans"] == {}
+
+
+def test_adds_basis_column_to_existing_databases(tmp_path):
+    import sqlite3
+
+    path = tmp_path / "old.db"
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE plans (id INTEGER PRIMARY KEY AUTOINCREMENT, athlete_id VARCHAR(32) NOT NULL, "
+                 "plan_type VARCHAR(32) NOT NULL, plan_text TEXT NOT NULL, created_at FLOAT NOT NULL)")
+    conn.commit()
+    conn.close()
+    store = Store(str(path), flush_interval=3600)
+    store.save_plan("a1", "workout", "plan", basis={"goal": "Speed"})
+    assert store.load_session("a1")["plan_basis"] == {"workout": {"goal": "Speed"}}
@@ -0,0 +1,59 @@
+import json
+import re
+
+import pytest
+
+from workout_plan import PlanValidationError, WorkoutPlan, parse_json
+
+PLAN = {
+    "title": "Speed Week",
+    "days": [{
+        "day": "Monday", "focus": "Acceleration", "intensity": "7",
+        "warm_up": [{"name": "Jog", "reps": "5 min"}],
+        "main": [{"name": "Sprints", "sets": 6.0, "reps": "20 m", "rest": "90 s", "extra": "dropped"}],
+        "cool_down": [{"name": "Stretch | hold", "reps": "10 min"}],
+    }],
+    "safety_tips": ["Stop if anything hurts"],
+}
+
+
+def test_parses_fenced_json_and_coerces_numbers():
+    plan = WorkoutPlan.from_json("Here you go:\n```json\n" + json.dumps(PLAN) + "\n```")
+    day = plan.days[0]
+    assert day.intensity == 7
+    assert day.main[0].sets == 6
+    assert not hasattr(day.main[0], "extra")
+    assert WorkoutPlan.from_json(plan.to_json()) == plan
+
+
+def test_markdown_has_a_table_per_section():
+    markdown = WorkoutPlan.from_dict(PLAN).to_markdown()
+    assert "## 📅 Monday — Acceleration (Intensity 7/10)" in markdown
+    assert markdown.count("| Exercise | Sets | Reps / Time | Rest | Notes |") == 3
+    assert "| Stretch / hold |" in markdown
+    assert "- Stop if anything hurts" in markdown
+
+
+@pytest.mark.parametrize("data, message", [
+    ({**PLAN, "days": []}, "plan.days needs at least 1 item(s)"),
+    ({**PLAN, "title": ""}, "plan.title is missing"),
+    ({**PLAN, "days": [{**PLAN["days"][0], "intensity": True}]}, "plan.days[0].intensity should be a whole number"),
+])
+def test_validation_names_the_offending_field(data, message):
+    with pytest.raises(PlanValidationError, match=re.escape(message)):
+        WorkoutPlan.from_dict(data)
+
+
+def test_non_json_output_is_a_validation_error():
+    with pytest.raises(PlanValidationError):
+        parse_json("Sorry, I can't help with that")
+
+
+def test_replace_section_and_day():
+    plan = WorkoutPlan.from_dict(PLAN)
+    plan.replace_section(0, "main", {"exercises": [{"name": "Hill sprints", "sets": "4"}]})
+    assert [(e.name, e.sets) for e in plan.days[0].main] == [("Hill sprints", 4)]
+    with pytest.raises(PlanValidationError):
+        plan.replace_section(0, "main", {"exercises": []})
+    plan.replace_day(0, {**PLAN["days"][0], "focus": "Agility"})
+    assert plan.days[0].label() == "Monday — Agility"
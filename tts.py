@@ -0,0 +1,279 @@
+"""Spoken plans and answers: markdown -> sentence chunks, synthesized in parallel and cached on disk by text hash
+
+gTTS is imported on first synthesis. OfflineTTSBackend writes silent WAV audio of roughly
+spoken length so the feature can be exercised without network access.
+"""
+import hashlib
+import json
+import os
+import re
+import struct
+import threading
+import time
+import wave
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from io import BytesIO
+
+# The first chunk is kept short so playback starts quickly; later chunks are larger so
+# there are fewer requests and fewer joins
+FIRST_CHUNK_CHARS = 200
+MAX_CHUNK_CHARS = 600
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_EMOJI = re.compile("[\U0001F000-\U0001FAFF\u2600-\u27BF\u2B00-\u2BFF\uFE0F\u200D]")
+
+
+def speakable_text(markdown):
+    """Plain sentences from plan/answer markdown: no symbols, emoji, links or table pipes"""
+    lines = []
+    for line in markdown.splitlines():
+        line = line.strip()
+        if not line or re.fullmatch(r"\|?[\s:|-]+\|?", line) or line.startswith("```"):
+            continue
+        if line.startswith("|"):
+            # Table row -> "cell, cell, cell."
+            line = ", ".join(cell.strip() for cell in line.strip("|").split("|") if cell.strip())
+        line = re.sub(r"^#{1,6}\s*", "", line)
+        line = re.sub(r"^(?:[-*+]|\d+[.)])\s+", "", line)
+        line = re.sub(r"\[([^\]]+)\]\([^)]*\)", r"\1", line)
+        line = re.sub(r"[*_`~>]", "", line)
+        line = _EMOJI.sub("", line).strip()
+        if not line:
+            continue
+        # Headers and bullets rarely end in punctuation; give each its own sentence
+        lines.append(line if line[-1] in ".!?:" else line + ".")
+    return " ".join(lines)
+
+
+def _split_long(sentence, max_chars):
+    """Break a sentence longer than max_chars at commas, then at spaces"""
+    pieces = []
+    current = ""
+    for word in re.split(r"(?<=,)\s+|\s+", sentence):
+        if current and len(current) + 1 + len(word) > max_chars:
+            pieces.append(current)
+            current = word
+        else:
+            current = f"{current} {word}" if current else word
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_chunks(text, first_chars=FIRST_CHUNK_CHARS, max_chars=MAX_CHUNK_CHARS):
+    """Sentence-bounded chunks: the first up to first_chars, the rest up to max_chars"""
+    chunks = []
+    current = ""
+    for sentence in _SENTENCE_END.split(text):
+        limit = max_chars if chunks else first_chars
+        for piece in _split_long(sentence, limit) if len(sentence) > limit else [sentence]:
+            limit = max_chars if chunks else first_chars
+            if current and len(current) + 1 + len(piece) > limit:
+                chunks.append(current)
+                current = piece
+            else:
+                current = f"{current} {piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+# ---------------- BACKENDS ----------------
+
+
+class TTSBackend:
+    """Interface for speech synthesis; subclasses return audio bytes for one chunk of text"""
+
+    name = "base"
+    mime = "audio/mpeg"
+    # Identifies the backend + settings in audio cache keys
+    config = {}
+
+    def synthesize(self, text):
+        raise NotImplementedError
+
+    def join(self, segments):
+        """One playable file from consecutive segments"""
+        # MP3 is a stream of self-contained frames, so segments concatenate as-is
+        return b"".join(segments)
+
+
+class GTTSBackend(TTSBackend):
+    """Google Translate text-to-speech via gTTS (needs network access)"""
+
+    name = "gtts"
+
+    def __init__(self, lang="en", tld="com", slow=False):
+        self.lang = lang
+        self.tld = tld
+        self.slow = slow
+        self.config = {"backend": "gtts", "lang": lang, "tld": tld, "slow": slow}
+
+    def synthesize(self, text):
+        from gtts import gTTS
+
+        buffer = BytesIO()
+        gTTS(text, lang=self.lang, tld=self.tld, slow=self.slow).write_to_fp(buffer)
+        return buffer.getvalue()
+
+
+class OfflineTTSBackend(TTSBackend):
+    """Silent WAV of roughly spoken length, with optional latency; for tests and offline demos"""
+
+    name = "offline"
+    mime = "audio/wav"
+    SAMPLE_RATE = 4000
+    SECONDS_PER_WORD = 0.3
+
+    def __init__(self, latency_seconds=0.0):
+        self.latency_seconds = latency_seconds
+        self.config = {"backend": "offline"}
+
+    @classmethod
+    def from_env(cls):
+        return cls(latency_seconds=float(os.environ.get("COACHBOT_FAKE_TTS_LATENCY", 0.0)))
+
+    def _wav(self, frames):
+        buffer = BytesIO()
+        with wave.open(buffer, "wb") as out:
+            out.setnchannels(1)
+            out.setsampwidth(1)
+            out.setframerate(self.SAMPLE_RATE)
+            out.writeframes(frames)
+        return buffer.getvalue()
+
+    def synthesize(self, text):
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        samples = int(len(text.split()) * self.SECONDS_PER_WORD * self.SAMPLE_RATE)
+        # 8-bit WAV is unsigned, so 128 is silence
+        return self._wav(struct.pack("B", 128) * samples)
+
+    def join(self, segments):
+        frames = b""
+        for segment in segments:
+            with wave.open(BytesIO(segment), "rb") as part:
+                frames += part.readframes(part.getnframes())
+        return self._wav(frames)
+
+
+def create_tts_backend(name):
+    """TTS backend factory; COACHBOT_TTS_BACKEND picks one in the app"""
+    if name == "gtts":
+        return GTTSBackend(lang=os.environ.get("COACHBOT_TTS_LANG", "en"))
+    if name == "offline":
+        return OfflineTTSBackend.from_env()
+    raise ValueError(f"Unknown TTS backend: {name}")
+
+
+# ---------------- CACHE + PARALLEL SYNTHESIS ----------------
+
+
+class AudioCache:
+    """Audio segments by text hash: a small in-memory LRU in front of one file per segment"""
+
+    def __init__(self, cache_dir, memory_items=64):
+        self.cache_dir = cache_dir
+        self.memory_items = memory_items
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.audio")
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        try:
+            with open(self._path(key), "rb") as f:
+                audio = f.read()
+        except OSError:
+            return None
+        self._remember(key, audio)
+        return audio
+
+    def _remember(self, key, audio):
+        with self._lock:
+            self._entries[key] = audio
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.memory_items:
+                self._entries.popitem(last=False)
+
+    def set(self, key, audio):
+        self._remember(key, audio)
+        tmp_path = f"{self._path(key)}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(audio)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            # Disk persistence is best effort; the in-memory copy still serves hits
+            pass
+
+
+class SpeechSynthesizer:
+    """Synthesizes chunks on a worker pool; identical chunks share one cached or in-flight result"""
+
+    def __init__(self, backend, cache, max_workers=4):
+        self.backend = backend
+        self.cache = cache
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="coachbot-tts")
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.synthesized = 0
+        self.cache_hits = 0
+        self.errors = 0
+
+    def segment_key(self, chunk):
+        payload = json.dumps([self.backend.config, chunk], sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _synthesize_and_store(self, key, chunk):
+        try:
+            audio = self.backend.synthesize(chunk)
+            self.cache.set(key, audio)
+            with self._lock:
+                self.synthesized += 1
+            return audio
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+    def submit_chunk(self, chunk):
+        """Future for one chunk's audio (already done on a cache hit)"""
+        key = self.segment_key(chunk)
+        audio = self.cache.get(key)
+        with self._lock:
+            if audio is not None:
+                self.cache_hits += 1
+                done = Future()
+                done.set_result(audio)
+                return done
+            if key not in self._pending:
+                self._pending[key] = self._pool.submit(self._synthesize_and_store, key, chunk)
+            return self._pending[key]
+
+    def submit(self, markdown):
+        """Futures for every chunk of markdown's spoken text, in playback order; all start at once"""
+        return [self.submit_chunk(chunk) for chunk in split_chunks(speakable_text(markdown))]
+
+    def join(self, segments):
+        return self.backend.join(segments)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": self.backend.name,
+                "synthesized": self.synthesized,
+                "cache_hits": self.cache_hits,
+                "errors": self.errors,
+                "in_flight": len(self._pending),
+            }
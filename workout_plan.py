@@ -0,0 +1,196 @@
+"""Structured workout plans: JSON schema, validation into dataclasses and local markdown rendering
+
+Workout plans are requested as JSON matching PLAN_SCHEMA (days -> warm-up/main/cool-down ->
+exercises), so one section can be regenerated without asking for the whole plan again.
+"""
+import json
+import re
+from dataclasses import asdict, dataclass, field
+
+SECTIONS = {"warm_up": "🔥 Warm-up", "main": "💪 Main Workout", "cool_down": "🧘 Cool-down"}
+
+_STRING = {"type": "string"}
+EXERCISE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "name": _STRING,
+        "sets": {"type": "integer"},
+        "reps": _STRING,
+        "rest": _STRING,
+        "notes": _STRING,
+    },
+    "required": ["name"],
+}
+_EXERCISES = {"type": "array", "items": EXERCISE_SCHEMA}
+SECTION_SCHEMA = {
+    "type": "object",
+    "properties": {"exercises": {**_EXERCISES, "minItems": 1}},
+    "required": ["exercises"],
+}
+DAY_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "day": _STRING,
+        "focus": _STRING,
+        "intensity": {"type": "integer"},
+        "warm_up": _EXERCISES,
+        "main": _EXERCISES,
+        "cool_down": _EXERCISES,
+    },
+    "required": ["day", "focus", "warm_up", "main", "cool_down"],
+}
+PLAN_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "title": _STRING,
+        "summary": _STRING,
+        "days": {"type": "array", "items": DAY_SCHEMA, "minItems": 1},
+        "safety_tips": {"type": "array", "items": _STRING},
+    },
+    "required": ["title", "days"],
+}
+
+
+def section_name(section):
+    """'Warm-up' for 'warm_up' (the heading without its emoji)"""
+    return SECTIONS[section].split(" ", 1)[1]
+
+
+class PlanValidationError(ValueError):
+    """Model output that doesn't match the plan schema; the message names the offending field"""
+
+
+def parse_json(text):
+    """JSON object from model output, tolerating code fences or text around it"""
+    text = re.sub(r"^\s*```(?:json)?|```\s*$", "", text.strip())
+    start, end = text.find("{"), text.rfind("}")
+    if start < 0 or end < start:
+        raise PlanValidationError("The AI response did not contain a JSON object")
+    try:
+        return json.loads(text[start:end + 1])
+    except json.JSONDecodeError as e:
+        raise PlanValidationError(f"The AI response was not valid JSON ({e.msg})") from e
+
+
+def validate(data, schema, path="plan"):
+    """Check data against schema and return a cleaned copy (unknown keys dropped, numeric strings coerced)"""
+    kind = schema["type"]
+    if kind == "object":
+        if not isinstance(data, dict):
+            raise PlanValidationError(f"{path} should be an object")
+        for key in schema.get("required", []):
+            if data.get(key) in (None, ""):
+                raise PlanValidationError(f"{path}.{key} is missing")
+        return {
+            key: validate(data[key], sub_schema, f"{path}.{key}")
+            for key, sub_schema in schema["properties"].items()
+            if data.get(key) is not None
+        }
+    if kind == "array":
+        if not isinstance(data, list):
+            raise PlanValidationError(f"{path} should be a list")
+        if len(data) < schema.get("minItems", 0):
+            raise PlanValidationError(f"{path} needs at least {schema['minItems']} item(s)")
+        return [validate(item, schema["items"], f"{path}[{i}]") for i, item in enumerate(data)]
+    if kind == "integer":
+        if isinstance(data, bool):
+            raise PlanValidationError(f"{path} should be a whole number")
+        if isinstance(data, float) and data.is_integer():
+            return int(data)
+        if isinstance(data, str) and data.strip().isdigit():
+            return int(data)
+        if not isinstance(data, int):
+            raise PlanValidationError(f"{path} should be a whole number")
+        return data
+    if not isinstance(data, (str, int, float)) or isinstance(data, bool):
+        raise PlanValidationError(f"{path} should be text")
+    return str(data).strip()
+
+
+@dataclass(slots=True)
+class Exercise:
+    name: str
+    sets: int = None
+    reps: str = ""
+    rest: str = ""
+    notes: str = ""
+
+
+@dataclass(slots=True)
+class Day:
+    day: str
+    focus: str
+    warm_up: list
+    main: list
+    cool_down: list
+    intensity: int = None
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            day=data["day"], focus=data["focus"], intensity=data.get("intensity"),
+            **{section: [Exercise(**exercise) for exercise in data[section]] for section in SECTIONS},
+        )
+
+    def label(self):
+        return f"{self.day} — {self.focus}"
+
+
+@dataclass(slots=True)
+class WorkoutPlan:
+    title: str
+    days: list
+    summary: str = ""
+    safety_tips: list = field(default_factory=list)
+
+    @classmethod
+    def from_dict(cls, data):
+        """Validate a plan dict (e.g. parsed model output) and build the dataclasses"""
+        data = validate(data, PLAN_SCHEMA)
+        return cls(
+            title=data["title"], summary=data.get("summary", ""), safety_tips=data.get("safety_tips", []),
+            days=[Day.from_dict(day) for day in data["days"]],
+        )
+
+    @classmethod
+    def from_json(cls, text):
+        return cls.from_dict(parse_json(text))
+
+    def to_dict(self):
+        return asdict(self)
+
+    def to_json(self):
+        """Compact JSON, used for storage and as context in section prompts"""
+        return json.dumps(self.to_dict(), separators=(",", ":"), ensure_ascii=False)
+
+    def replace_section(self, day_index, section, section_data):
+        """Swap one day's warm-up/main/cool-down for validated model output"""
+        data = validate(section_data, SECTION_SCHEMA, f"days[{day_index}].{section}")
+        setattr(self.days[day_index], section, [Exercise(**exercise) for exercise in data["exercises"]])
+
+    def replace_day(self, day_index, day_data):
+        self.days[day_index] = Day.from_dict(validate(day_data, DAY_SCHEMA, f"days[{day_index}]"))
+
+    def to_markdown(self):
+        """Render locally to the same markdown shape the rest of the app (display, PDF, audio) uses"""
+        lines = [f"# 🏋️ {self.title}", ""]
+        if self.summary:
+            lines += [self.summary, ""]
+        for day in self.days:
+            intensity = f" (Intensity {day.intensity}/10)" if day.intensity else ""
+            lines += [f"## 📅 {day.label()}{intensity}", ""]
+            for section, heading in SECTIONS.items():
+                if not getattr(day, section):
+                    continue
+                lines += [
+                    f"### {heading}", "",
+                    "| Exercise | Sets | Reps / Time | Rest | Notes |",
+                    "|----------|------|-------------|------|-------|",
+                ]
+                for exercise in getattr(day, section):
+                    cells = [exercise.name, exercise.sets or "", exercise.reps, exercise.rest, exercise.notes]
+                    lines.append("| " + " | ".join(str(cell).replace("|", "/") for cell in cells) + " |")
+                lines.append("")
+        if self.safety_tips:
+            lines += ["## ⚠️ Safety Tips", ""] + [f"- {tip}" for tip in self.safety_tips]
+        return "\n".join(lines).strip() + "\n"